@@ -1,36 +1,124 @@
-from flask import Flask, render_template, request, redirect, url_for
+import os
+from flask import Flask, render_template, request, redirect, url_for, make_response
+from markupsafe import Markup
+from flask_sqlalchemy.pagination import SelectPagination
+from sqlalchemy import delete as sql_delete, func, insert, not_, select, update
 from models import db, Todo
-from prometheus_client import make_wsgi_app, Counter, Histogram
+from cache import FragmentCache, TableVersion, VersionedCount
+from database import (is_sqlite_file, write_engine_options, configure_write_engine,
+                      create_read_engine, read_session)
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
+import metrics
+import profiler
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///todos.db'
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///todos.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# SQLite connection pools (see database.py): a small one for writes and a
+# larger read-only one for page reads
+WRITE_POOL_SIZE = int(os.environ.get('TODO_WRITE_POOL_SIZE', '2'))
+READ_POOL_SIZE = int(os.environ.get('TODO_READ_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.environ.get('TODO_POOL_TIMEOUT', '30'))
+BUSY_TIMEOUT_MS = int(os.environ.get('TODO_BUSY_TIMEOUT_MS', '5000'))
+if is_sqlite_file(DATABASE_URL):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = write_engine_options(
+        WRITE_POOL_SIZE, POOL_TIMEOUT, BUSY_TIMEOUT_MS
+    )
+
+# Index page: todos per page and how many rendered pages/rows to keep
+PAGE_SIZE = int(os.environ.get('TODO_PAGE_SIZE', '50'))
+PAGE_CACHE_SIZE = int(os.environ.get('TODO_PAGE_CACHE_SIZE', '128'))
+ROW_CACHE_SIZE = int(os.environ.get('TODO_ROW_CACHE_SIZE', '4096'))
+
 db.init_app(app)
 
-# Prometheus metrics
-REQUEST_COUNT = Counter('app_requests_total', 'Total app requests', ['method', 'endpoint', 'http_status'])
-REQUEST_LATENCY = Histogram('app_request_latency_seconds', 'Request latency', ['method', 'endpoint'])
+# Prometheus metrics (see metrics.py)
+metrics.init_app(app)
+# Sampling profiler on /debug, only when PROFILER_TOKEN is set (see profiler.py)
+profiler.init_app(app)
 
 with app.app_context():
+    # Per-statement timing and N+1 detection on /metrics
+    metrics.instrument_engine(db.engine)
+    metrics.instrument_session(db.session)
+    if is_sqlite_file(DATABASE_URL):
+        configure_write_engine(db.engine)
     db.create_all()
+    # create_all() skips tables that already exist, so add indexes added since
+    for index in Todo.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
 
-@app.before_request
-def before_request():
-    request.start_time = time.time()
+    # Read routes use read-only snapshot connections; other databases
+    # just share the write engine
+    if is_sqlite_file(DATABASE_URL):
+        read_engine = create_read_engine(
+            db.engine.url.database, READ_POOL_SIZE, POOL_TIMEOUT, BUSY_TIMEOUT_MS
+        )
+        metrics.instrument_engine(read_engine)
+    else:
+        read_engine = db.engine
 
-@app.after_request
-def after_request(response):
-    request_latency = time.time() - request.start_time
-    REQUEST_COUNT.labels(request.method, request.path, response.status_code).inc()
-    REQUEST_LATENCY.labels(request.method, request.path).observe(request_latency)
-    return response
+# Bumped by every write route; shared by all worker processes
+table_version = TableVersion(
+    os.environ.get('TODO_VERSION_FILE', os.path.join(app.instance_path, 'todos.version'))
+)
+# Number of todos at the current version, so /add can redirect to the last
+# page without counting the table again
+todo_count = VersionedCount()
+page_cache = FragmentCache('page', PAGE_CACHE_SIZE)
+row_cache = FragmentCache('row', ROW_CACHE_SIZE)
+
+# Columns the fragment routes read back with RETURNING
+TODO_COLUMNS = (Todo.id, Todo.title, Todo.completed, Todo.created_at)
+
+def remaining_count(session):
+    return session.scalar(select(func.count()).select_from(Todo).where(Todo.completed.is_(False)))
+
+def bump_version(added=0):
+    """Bump the table version after a commit, carrying the todo count over"""
+    version = table_version.bump()
+    todo_count.carry(version, added)
+    return version
+
+def render_row(todo, page):
+    """HTML for one todo, reused for as long as the row itself is unchanged"""
+    key = (page, todo.id, todo.title, todo.completed)
+    html = row_cache.get(key)
+    if html is None:
+        html = Markup(render_template('_todo_row.html', todo=todo, page=page))
+        row_cache.set(key, html)
+    return html
 
 @app.route('/')
 def index():
-    todos = Todo.query.all()
-    return render_template('index.html', todos=todos)
+    page = request.args.get('page', 1, type=int)
+
+    # Read the version before the rows, so a page is never cached under a
+    # version newer than its data
+    key = (table_version.current(), page)
+    html = page_cache.get(key)
+    if html is None:
+        with read_session(read_engine) as session:
+            pagination = SelectPagination(
+                select=select(Todo).order_by(Todo.created_at, Todo.id), session=session,
+                page=page, per_page=PAGE_SIZE, max_per_page=PAGE_SIZE, error_out=False
+            )
+            remaining = remaining_count(session)
+            todo_count.set(key[0], pagination.total)
+            rows = [render_row(todo, pagination.page) for todo in pagination.items]
+        html = render_template('index.html', rows=rows, pagination=pagination, remaining=remaining)
+        page_cache.set(key, html)
+    return html
+
+def last_page(version):
+    """The last page at `version`, counting rows only if no page was rendered there"""
+    count = todo_count.get(version)
+    if count is None:
+        count = Todo.query.count()
+        todo_count.set(version, count)
+    return max(1, -(-count // PAGE_SIZE))
 
 @app.route('/add', methods=['POST'])
 def add():
@@ -39,6 +127,9 @@ def add():
         new_todo = Todo(title=title)
         db.session.add(new_todo)
         db.session.commit()
+        version = bump_version(added=1)
+        # New todos sort last, so show the last page
+        return redirect(url_for('index', page=last_page(version)))
     return redirect(url_for('index'))
 
 @app.route('/toggle/<int:id>')
@@ -47,7 +138,8 @@ def toggle(id):
     if todo:
         todo.completed = not todo.completed
         db.session.commit()
-    return redirect(url_for('index'))
+        bump_version()
+    return redirect(url_for('index', page=request.args.get('page', type=int)))
 
 @app.route('/delete/<int:id>')
 def delete(id):
@@ -55,13 +147,68 @@ def delete(id):
     if todo:
         db.session.delete(todo)
         db.session.commit()
-    return redirect(url_for('index'))
+        bump_version(added=-1)
+    return redirect(url_for('index', page=request.args.get('page', type=int)))
+
+# Fragment routes: the same changes as add/toggle/delete in one
+# INSERT/UPDATE/DELETE ... RETURNING, answered with just the changed row's
+# HTML. static/todo.js calls them and swaps the row in place; without
+# JavaScript the page keeps using the redirect routes above.
+
+def fragment_response(html, status=200):
+    """Row HTML plus the new remaining count for the page's badge"""
+    response = make_response(html, status)
+    with read_session(read_engine) as session:
+        response.headers['X-Remaining'] = str(remaining_count(session))
+    return response
+
+@app.route('/fragments/add', methods=['POST'])
+def add_fragment():
+    title = request.form.get('title')
+    if not title:
+        return 'Title is required', 400
+
+    todo = db.session.execute(
+        insert(Todo).values(title=title).returning(*TODO_COLUMNS)
+    ).one()
+    db.session.commit()
+    # The new row sorts onto the last page; X-Page tells the script which
+    # one, so it can go there instead when another page is showing
+    page = last_page(bump_version(added=1))
+    response = fragment_response(render_row(todo, page), 201)
+    response.headers['X-Page'] = str(page)
+    return response
+
+@app.route('/fragments/toggle/<int:id>', methods=['POST'])
+def toggle_fragment(id):
+    todo = db.session.execute(
+        update(Todo).where(Todo.id == id).values(completed=not_(Todo.completed))
+        .returning(*TODO_COLUMNS).execution_options(synchronize_session=False)
+    ).one_or_none()
+    if todo is None:
+        return 'Todo not found', 404
+
+    db.session.commit()
+    bump_version()
+    return fragment_response(render_row(todo, request.args.get('page', type=int)))
+
+@app.route('/fragments/delete/<int:id>', methods=['POST'])
+def delete_fragment(id):
+    deleted = db.session.execute(
+        sql_delete(Todo).where(Todo.id == id)
+        .returning(Todo.id).execution_options(synchronize_session=False)
+    ).one_or_none()
+    if deleted is None:
+        return 'Todo not found', 404
+
+    db.session.commit()
+    bump_version(added=-1)
+    return fragment_response('')
 
 # Add prometheus wsgi middleware
 app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {
-    '/metrics': make_wsgi_app()
+    '/metrics': metrics.metrics_app()
 })
 
 if __name__ == '__main__':
-    import time
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+Rendered-HTML cache for the Flask Todo app
+
+Pages are cached under the table version, which the write routes bump
+after every commit, so an unchanged page is served without touching
+SQLAlchemy or Jinja. Row fragments are keyed by the row's own content
+and never go stale.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from metrics import FRAGMENT_CACHE_HITS, FRAGMENT_CACHE_MISSES, FRAGMENT_CACHE_EVICTIONS
+
+# The table version: one unsigned 64-bit integer
+VERSION_FORMAT = struct.Struct('<Q')
+
+class TableVersion:
+    """Version of the todo table, shared by every worker process.
+
+    A 64-bit counter in a small file that every process memory-maps:
+    write routes increment it after committing, under a POSIX record lock
+    so concurrent bumps from different workers never hand out the same
+    number, and readers load it from the mapping without a system call or
+    any database access. Unlike a timestamp, the counter only ever goes
+    up, so two writes in the same clock tick still get different versions.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with self._file_lock():
+                if os.fstat(self._fd).st_size < VERSION_FORMAT.size:
+                    # New file (or an empty one from an older release): start at 0
+                    os.ftruncate(self._fd, VERSION_FORMAT.size)
+            self._map = mmap.mmap(self._fd, VERSION_FORMAT.size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    @contextmanager
+    def _file_lock(self):
+        # lockf locks belong to the process, so they also exclude workers
+        # forked with this file already open; the thread lock covers the
+        # threads of one process, which lockf does not
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def current(self):
+        return VERSION_FORMAT.unpack_from(self._map)[0]
+
+    def bump(self):
+        """Increment the version; returns the new one"""
+        with self._file_lock():
+            version = VERSION_FORMAT.unpack_from(self._map)[0] + 1
+            VERSION_FORMAT.pack_into(self._map, 0, version)
+        return version
+
+class VersionedCount:
+    """A row count together with the table version it was read at.
+
+    After a write bumps the version, carry() moves the count forward by the
+    write's change in rows, but only when the bump produced the very next
+    version: otherwise another write (possibly in another worker) came in
+    between and the count is forgotten until it is read again.
+    """
+
+    def __init__(self):
+        self._value = (None, 0)
+        self._lock = threading.Lock()
+
+    def get(self, version):
+        """The count at this version, or None if it isn't known"""
+        known_version, count = self._value
+        return count if known_version == version else None
+
+    def set(self, version, count):
+        self._value = (version, count)
+
+    def carry(self, version, delta):
+        with self._lock:
+            known_version, count = self._value
+            if known_version == version - 1:
+                self._value = (version, count + delta)
+
+class FragmentCache:
+    """Bounded LRU of rendered HTML with hit/miss counters on /metrics"""
+
+    def __init__(self, name, max_entries):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+
+        if value is None:
+            FRAGMENT_CACHE_MISSES.labels(self.name).inc()
+        else:
+            FRAGMENT_CACHE_HITS.labels(self.name).inc()
+        return value
+
+    def set(self, key, value):
+        evicted = 0
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+
+        if evicted:
+            FRAGMENT_CACHE_EVICTIONS.labels(self.name).inc(evicted)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,92 @@
+"""
+SQLite engines for the Flask Todo app
+
+Writes go through Flask-SQLAlchemy's default engine: a small pool of WAL
+connections with synchronous=NORMAL and a busy timeout. Read routes use
+a second engine of read-only connections (mode=ro, query_only), each
+transaction reading one consistent WAL snapshot, so page reads never
+queue behind the writer for a connection or for the lock.
+"""
+
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from metrics import DB_POOL_CHECKOUT, DB_POOL_TIMEOUTS
+
+WRITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long every checkout waited, labelled by pool_logging_name"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.labels(self.logging_name).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT.labels(self.logging_name).observe(time.perf_counter() - start)
+
+def is_sqlite_file(url):
+    return url.startswith('sqlite:///') and ':memory:' not in url
+
+def write_engine_options(pool_size, pool_timeout, busy_timeout):
+    """SQLALCHEMY_ENGINE_OPTIONS for the write engine"""
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_logging_name': 'write',
+        'pool_size': pool_size,
+        'max_overflow': 0,
+        'pool_timeout': pool_timeout,
+        # pysqlite's timeout is SQLite's busy timeout, in seconds
+        'connect_args': {'timeout': busy_timeout / 1000},
+    }
+
+def configure_write_engine(engine):
+    """Apply WRITE_PRAGMAS to every new write connection"""
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in WRITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+def create_read_engine(path, pool_size, pool_timeout, busy_timeout):
+    """Engine of read-only connections to the SQLite file at `path`"""
+    engine = create_engine(
+        f'sqlite:///file:{path}?mode=ro&uri=true',
+        poolclass=TimedQueuePool,
+        pool_logging_name='read',
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=pool_timeout,
+        connect_args={'timeout': busy_timeout / 1000},
+    )
+
+    @event.listens_for(engine, 'connect')
+    def set_read_only(dbapi_connection, connection_record):
+        # Let SQLAlchemy's own BEGIN through (pysqlite would otherwise run
+        # every SELECT in its own snapshot) and refuse writes outright
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA query_only = ON')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def begin_snapshot(connection):
+        connection.exec_driver_sql('BEGIN')
+
+    return engine
+
+@contextmanager
+def read_session(engine):
+    """Session whose queries all see the same committed snapshot"""
+    with Session(engine) as session, session.begin():
+        yield session
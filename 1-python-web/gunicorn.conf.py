@@ -0,0 +1,30 @@
+"""
+Gunicorn settings for the Flask Todo app
+
+    gunicorn --bind 127.0.0.1:8000 app:app
+
+gunicorn picks this file up from the working directory. It turns on
+prometheus_client's multiprocess mode so /metrics adds up every worker,
+not just the one that happened to answer the scrape.
+"""
+
+import os
+import shutil
+import tempfile
+
+# Must be set before any worker imports prometheus_client
+multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'todo-app-metrics')
+)
+
+
+def on_starting(server):
+    # Samples left by a previous run would be added to this one's
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir)
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a worker that is gone
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
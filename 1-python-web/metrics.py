@@ -0,0 +1,202 @@
+"""
+Prometheus metrics for the Flask Todo app
+
+Label values are bounded: requests are labelled with the matched route
+template (/toggle/<int:id>), never the raw path, and anything that matched
+no route shares one overflow label.
+
+SQLAlchemy engines passed to instrument_engine() also get per-statement
+timing, queries-per-request counts with likely-N+1 flagging and a slow
+query log with bound parameters redacted.
+
+Under several worker processes (gunicorn), set PROMETHEUS_MULTIPROC_DIR
+to an empty directory; every process then writes its samples there and
+/metrics aggregates them. gunicorn.conf.py does this automatically.
+"""
+
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, make_wsgi_app, multiprocess
+
+UNMATCHED_ENDPOINT = '<unmatched>'
+NO_REQUEST_ENDPOINT = '<none>'
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# A request running more queries than this is flagged as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('DB_N_PLUS_ONE_THRESHOLD', '10'))
+# Statements slower than this are logged (with parameters redacted)
+SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '100'))
+# Distinct statement fingerprints kept as label values; the rest share OTHER_STATEMENT
+MAX_STATEMENT_LABELS = 100
+OTHER_STATEMENT = '<other>'
+
+logger = logging.getLogger('todo.sql')
+
+REQUEST_COUNT = Counter('app_requests_total', 'Total app requests', ['method', 'endpoint', 'http_status'])
+REQUEST_LATENCY = Histogram('app_request_latency_seconds', 'Request latency', ['method', 'endpoint'])
+REQUESTS_IN_PROGRESS = Gauge(
+    'app_requests_in_progress', 'Requests currently being handled', ['method', 'endpoint'],
+    multiprocess_mode='livesum'
+)
+RESPONSE_SIZE = Histogram(
+    'app_response_size_bytes', 'Response body size', ['method', 'endpoint'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+)
+
+DB_QUERY_LATENCY = Histogram(
+    'app_db_query_seconds', 'SQL statement latency', ['endpoint', 'statement'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'app_db_queries_per_request', 'SQL statements run per request', ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+DB_N_PLUS_ONE = Counter(
+    'app_db_n_plus_one_total', f'Requests running more than {N_PLUS_ONE_THRESHOLD} statements',
+    ['endpoint']
+)
+DB_SLOW_QUERIES = Counter('app_db_slow_queries_total', 'Statements slower than DB_SLOW_QUERY_MS', ['endpoint'])
+
+DB_POOL_CHECKOUT = Histogram(
+    'app_db_pool_checkout_seconds', 'Time spent waiting for a pooled connection', ['pool'],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+DB_POOL_TIMEOUTS = Counter('app_db_pool_timeouts_total', 'Checkouts that gave up waiting', ['pool'])
+
+FRAGMENT_CACHE_HITS = Counter('app_fragment_cache_hits_total', 'Rendered HTML served from cache', ['cache'])
+FRAGMENT_CACHE_MISSES = Counter('app_fragment_cache_misses_total', 'Rendered HTML not in cache', ['cache'])
+FRAGMENT_CACHE_EVICTIONS = Counter('app_fragment_cache_evictions_total', 'Cache entries dropped by LRU', ['cache'])
+
+statement_labels = set()
+statement_labels_lock = threading.Lock()
+
+def request_labels():
+    """(method, endpoint) labels for the current request, from a fixed set of values"""
+    method = request.method if request.method in KNOWN_METHODS else 'OTHER'
+    endpoint = request.url_rule.rule if request.url_rule is not None else UNMATCHED_ENDPOINT
+    return method, endpoint
+
+def before_request():
+    g.metrics_labels = request_labels()
+    g.metrics_start = time.perf_counter()
+    g.db_queries = 0
+    REQUESTS_IN_PROGRESS.labels(*g.metrics_labels).inc()
+
+def after_request(response):
+    labels = g.metrics_labels
+    REQUEST_COUNT.labels(*labels, response.status_code).inc()
+    REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - g.metrics_start)
+
+    # Streamed responses have no length up front; they are not sized
+    if response.content_length is not None:
+        RESPONSE_SIZE.labels(*labels).observe(response.content_length)
+
+    endpoint = labels[1]
+    DB_QUERIES_PER_REQUEST.labels(endpoint).observe(g.db_queries)
+    if g.db_queries > N_PLUS_ONE_THRESHOLD:
+        DB_N_PLUS_ONE.labels(endpoint).inc()
+        logger.warning('Likely N+1: %s %s ran %d SQL statements',
+                       request.method, endpoint, g.db_queries)
+    return response
+
+def teardown_request(error=None):
+    # Runs even when the request failed, so the gauge never drifts upwards
+    labels = g.pop('metrics_labels', None)
+    if labels is not None:
+        REQUESTS_IN_PROGRESS.labels(*labels).dec()
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(statement):
+    """Normalize SQL so statements differing only in literals share a label"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?, ...)', sql)
+    return ' '.join(sql.split())
+
+def statement_label(statement):
+    """Fingerprint as a label value, capped at MAX_STATEMENT_LABELS distinct values"""
+    label = fingerprint(statement)
+    with statement_labels_lock:
+        if label in statement_labels:
+            return label
+        if len(statement_labels) < MAX_STATEMENT_LABELS:
+            statement_labels.add(label)
+            return label
+    return OTHER_STATEMENT
+
+def redact(parameters):
+    """Bound parameters with every value replaced by its type name"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) if isinstance(value, (list, tuple, dict)) else type(value).__name__
+                for value in parameters]
+    return type(parameters).__name__
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def current_endpoint():
+    """Endpoint label for statements; NO_REQUEST_ENDPOINT outside a request"""
+    if has_request_context() and 'metrics_labels' in g:
+        return g.metrics_labels[1]
+    return NO_REQUEST_ENDPOINT
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+
+    endpoint = current_endpoint()
+    if endpoint != NO_REQUEST_ENDPOINT:
+        g.db_queries += 1
+
+    DB_QUERY_LATENCY.labels(endpoint, statement_label(statement)).observe(elapsed)
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        DB_SLOW_QUERIES.labels(endpoint).inc()
+        logger.warning('Slow query (%.1f ms) on %s: %s params=%s',
+                       elapsed * 1000, endpoint, ' '.join(statement.split()), redact(parameters))
+
+def handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get('query_start'):
+        context.connection.info['query_start'].pop()
+
+def before_commit(session):
+    session.info['commit_start'] = time.perf_counter()
+
+def after_commit(session):
+    start = session.info.pop('commit_start', None)
+    if start is not None:
+        # Includes the flush; its INSERT/UPDATE statements are also timed on their own
+        DB_QUERY_LATENCY.labels(current_endpoint(), 'COMMIT').observe(time.perf_counter() - start)
+
+def instrument_engine(engine):
+    """Time every statement run through a SQLAlchemy engine"""
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    event.listen(engine, 'handle_error', handle_error)
+
+def instrument_session(session):
+    """Time commits (flush included) made through a SQLAlchemy session"""
+    event.listen(session, 'before_commit', before_commit)
+    event.listen(session, 'after_commit', after_commit)
+
+def init_app(app):
+    """Record request metrics for every request handled by `app`"""
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
+
+def metrics_app():
+    """WSGI app for /metrics, aggregating every worker process in multiprocess mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return make_wsgi_app(registry)
+    return make_wsgi_app()
@@ -5,5 +5,6 @@ db = SQLAlchemy()
 class Todo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
-    completed = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
\ No newline at end of file
+    # Indexed: the index page is ordered by created_at and counts the open (not completed) todos
+    completed = db.Column(db.Boolean, default=False, index=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
\ No newline at end of file
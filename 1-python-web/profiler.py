@@ -0,0 +1,223 @@
+"""
+Sampling profiler for the Flask Todo app
+
+Off unless PROFILER_TOKEN is set; when off, nothing is registered and no
+thread is started. When on, one background thread wakes PROFILER_HZ times
+a second and records the stack of every thread currently handling a
+request. Nothing is traced, so request threads pay only for registering
+themselves on the way in and out.
+
+    GET /debug/profile?seconds=N   every request stack for N seconds
+    GET /debug/slow                requests slower than PROFILER_SLOW_MS
+    GET /debug/slow/<id>           the stacks sampled during one of them
+
+Profiles are collapsed stacks ("outer;inner;leaf count" per line), ready
+for flamegraph.pl or speedscope. All routes need the X-Debug-Token header.
+Under several gunicorn workers each one profiles itself only, so
+/debug/profile shows whichever worker answered it.
+"""
+
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from flask import abort, g, jsonify, make_response, request
+
+TOKEN = os.environ.get('PROFILER_TOKEN', '')
+SAMPLE_HZ = float(os.environ.get('PROFILER_HZ', '100'))
+# Requests slower than this keep their own profile in a ring buffer
+SLOW_MS = float(os.environ.get('PROFILER_SLOW_MS', '500'))
+SLOW_KEEP = int(os.environ.get('PROFILER_SLOW_KEEP', '20'))
+MAX_SECONDS = int(os.environ.get('PROFILER_MAX_SECONDS', '60'))
+# Frames kept per stack, counted from the leaf
+MAX_DEPTH = 128
+
+frame_labels = {}
+
+def frame_label(code):
+    """'function (file:line)' for a code object, cached since code objects live long"""
+    label = frame_labels.get(code)
+    if label is None:
+        name = getattr(code, 'co_qualname', code.co_name)
+        label = f'{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+        frame_labels[code] = label
+    return label
+
+def collapse(frame):
+    """One stack as 'root;...;leaf'"""
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+def format_collapsed(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+class Sampler:
+    """Background thread sampling the stacks of registered request threads"""
+
+    def __init__(self, hz, slow_ms, slow_keep):
+        self.interval = 1 / hz
+        self.slow_ms = slow_ms
+        self.slow = deque(maxlen=slow_keep)
+        self._requests = {}
+        self._windows = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.ticks = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+
+    def ensure_started(self):
+        # Started on first use rather than at import, so a process that
+        # forks after importing the app never inherits a dead thread
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self.started_at = time.monotonic()
+                    self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            start = time.perf_counter()
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, stacks in self._requests.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    stack = collapse(frame)
+                    stacks[stack] += 1
+                    for window in self._windows:
+                        window[stack] += 1
+            del frames
+            self.ticks += 1
+            self.busy_seconds += time.perf_counter() - start
+
+    def begin(self):
+        """Start sampling the calling thread; returns its sample Counter"""
+        stacks = Counter()
+        with self._lock:
+            self._requests[threading.get_ident()] = stacks
+        return stacks
+
+    def end(self, stacks, summary, duration):
+        """Stop sampling the calling thread and keep its profile if it was slow"""
+        with self._lock:
+            self._requests.pop(threading.get_ident(), None)
+            if duration * 1000 >= self.slow_ms:
+                self.slow.append({
+                    'id': next(self._ids),
+                    'duration_ms': round(duration * 1000, 1),
+                    'samples': sum(stacks.values()),
+                    'time': time.time(),
+                    **summary,
+                    'stacks': stacks,
+                })
+
+    def slow_snapshot(self):
+        """The kept slow requests, oldest first, copied so request threads can keep appending"""
+        with self._lock:
+            return list(self.slow)
+
+    def window(self, seconds):
+        """Stacks of every request thread sampled over the next `seconds`"""
+        stacks = Counter()
+        with self._lock:
+            self._windows.append(stacks)
+        try:
+            time.sleep(seconds)
+        finally:
+            with self._lock:
+                self._windows.remove(stacks)
+        return stacks
+
+    def stats(self):
+        uptime = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'hz': round(1 / self.interval, 1),
+            'ticks': self.ticks,
+            'active_requests': len(self._requests),
+            # Share of wall time the sampler thread spent walking stacks
+            'overhead': round(self.busy_seconds / uptime, 5) if uptime else 0.0,
+        }
+
+sampler = Sampler(SAMPLE_HZ, SLOW_MS, SLOW_KEEP) if TOKEN else None
+
+def check_token():
+    supplied = request.headers.get('X-Debug-Token', '')
+    if not hmac.compare_digest(supplied.encode(), TOKEN.encode()):
+        abort(403)
+
+def collapsed_response(stacks):
+    response = make_response(format_collapsed(stacks))
+    response.mimetype = 'text/plain'
+    return response
+
+def before_request():
+    if request.path.startswith('/debug/'):
+        return
+    sampler.ensure_started()
+    g.profile_stacks = sampler.begin()
+    g.profile_start = time.perf_counter()
+
+def after_request(response):
+    if 'profile_stacks' in g:
+        g.profile_status = response.status_code
+    return response
+
+def teardown_request(error=None):
+    stacks = g.pop('profile_stacks', None)
+    if stacks is None:
+        return
+    endpoint = request.url_rule.rule if request.url_rule is not None else None
+    sampler.end(stacks, {
+        'method': request.method,
+        'endpoint': endpoint,
+        'path': request.path,
+        'status': g.pop('profile_status', 500),
+    }, time.perf_counter() - g.pop('profile_start'))
+
+def profile():
+    check_token()
+    try:
+        seconds = float(request.args.get('seconds', '10'))
+    except ValueError:
+        abort(400)
+    if not 0 < seconds <= MAX_SECONDS:
+        abort(400)
+    sampler.ensure_started()
+    return collapsed_response(sampler.window(seconds))
+
+def slow_requests():
+    check_token()
+    entries = [{key: value for key, value in entry.items() if key != 'stacks'}
+               for entry in reversed(sampler.slow_snapshot())]
+    return jsonify(threshold_ms=sampler.slow_ms, sampler=sampler.stats(), requests=entries)
+
+def slow_request(id):
+    check_token()
+    for entry in sampler.slow_snapshot():
+        if entry['id'] == id:
+            return collapsed_response(entry['stacks'])
+    abort(404)
+
+def init_app(app):
+    """Register the profiler hooks and /debug routes, if PROFILER_TOKEN is set"""
+    if sampler is None:
+        return
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
+    app.add_url_rule('/debug/profile', 'debug_profile', profile)
+    app.add_url_rule('/debug/slow', 'debug_slow', slow_requests)
+    app.add_url_rule('/debug/slow/<int:id>', 'debug_slow_request', slow_request)
+    print(f"🔬 Profiler on at {SAMPLE_HZ:g} Hz, keeping requests slower than {SLOW_MS:g} ms")
@@ -0,0 +1,72 @@
+// Progressive enhancement for the todo list: add, toggle and delete go
+// through the /fragments routes and only the changed row is swapped in.
+// On any failure we fall back to the plain link or form, which redirects
+// back to the full page like it does without JavaScript.
+(function () {
+    const list = document.getElementById('todo-list');
+    const remaining = document.getElementById('remaining-count');
+
+    async function post(url, body) {
+        const response = await fetch(url, { method: 'POST', body });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const count = response.headers.get('X-Remaining');
+        if (remaining && count !== null) {
+            remaining.textContent = count;
+        }
+        return response;
+    }
+
+    function toElement(html) {
+        const template = document.createElement('template');
+        template.innerHTML = html.trim();
+        return template.content.firstElementChild;
+    }
+
+    document.addEventListener('click', async (event) => {
+        const link = event.target.closest('a[data-fragment]');
+        if (!link) {
+            return;
+        }
+        event.preventDefault();
+
+        const row = link.closest('.list-group-item');
+        try {
+            const html = await (await post(link.dataset.fragment)).text();
+            if (html) {
+                row.replaceWith(toElement(html));
+            } else {
+                row.remove();
+            }
+        } catch (error) {
+            window.location.href = link.href;
+        }
+    });
+
+    const form = document.querySelector('form[data-fragment]');
+    if (form) {
+        form.addEventListener('submit', async (event) => {
+            event.preventDefault();
+            try {
+                const response = await post(form.dataset.fragment, new FormData(form));
+                const page = response.headers.get('X-Page');
+                if (page !== form.dataset.page) {
+                    // New todos sort last: the row belongs on another page,
+                    // and this page's pager would be out of date
+                    window.location.href = `${window.location.pathname}?page=${page}`;
+                    return;
+                }
+                const html = await response.text();
+                const empty = document.getElementById('todo-empty');
+                if (empty) {
+                    empty.remove();
+                }
+                list.appendChild(toElement(html));
+                form.reset();
+            } catch (error) {
+                form.submit();
+            }
+        });
+    }
+})();
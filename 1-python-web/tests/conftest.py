@@ -0,0 +1,22 @@
+"""Run app.py against a throwaway database, imported the way gunicorn imports it"""
+
+import os
+import tempfile
+
+import pytest
+
+# app.py creates its tables and version file on import
+TEMP_DIR = tempfile.mkdtemp(prefix='flask-todo-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEMP_DIR, 'todos.db')
+os.environ['TODO_VERSION_FILE'] = os.path.join(TEMP_DIR, 'todos.version')
+os.environ['TODO_PAGE_SIZE'] = '3'
+
+import app as todo_app  # noqa: E402
+
+@pytest.fixture
+def client():
+    with todo_app.app.app_context():
+        todo_app.Todo.query.delete()
+        todo_app.db.session.commit()
+        todo_app.todo_count.set(todo_app.bump_version(), 0)
+    return todo_app.app.test_client()
@@ -0,0 +1,68 @@
+import re
+
+import app as todo_app
+
+def add(client, title):
+    response = client.post('/fragments/add', data={'title': title})
+    todo_id = int(re.search(r'id="todo-(\d+)"', response.get_data(as_text=True)).group(1))
+    return response, todo_id
+
+def test_add_returns_only_the_new_row(client):
+    response, todo_id = add(client, 'Fragment todo')
+    html = response.get_data(as_text=True)
+    assert response.status_code == 201
+    assert 'Fragment todo' in html
+    assert '<html' not in html and html.count('id="todo-') == 1
+    assert response.headers['X-Remaining'] == '1'
+    assert f'/toggle/{todo_id}' in html
+
+def test_toggle_and_delete_update_the_remaining_count(client):
+    _, first = add(client, 'first')
+    add(client, 'second')
+
+    response = client.post(f'/fragments/toggle/{first}')
+    assert response.status_code == 200
+    assert 'checked' in response.get_data(as_text=True)
+    assert response.headers['X-Remaining'] == '1'
+
+    response = client.post(f'/fragments/delete/{first}')
+    assert response.status_code == 200
+    assert response.get_data() == b''
+    assert response.headers['X-Remaining'] == '1'
+
+def test_missing_rows_and_titles(client):
+    assert client.post('/fragments/toggle/999999').status_code == 404
+    assert client.post('/fragments/delete/999999').status_code == 404
+    assert client.post('/fragments/add', data={}).status_code == 400
+
+def test_fragment_writes_invalidate_the_cached_page(client):
+    client.get('/')
+    version = todo_app.table_version.current()
+    _, todo_id = add(client, 'Shows up on the page')
+    assert todo_app.table_version.current() == version + 1
+    assert 'Shows up on the page' in client.get('/').get_data(as_text=True)
+
+    client.post(f'/fragments/delete/{todo_id}')
+    assert 'Shows up on the page' not in client.get('/').get_data(as_text=True)
+
+def test_fragment_writes_keep_the_count_for_add(client):
+    for title in ('a', 'b'):
+        client.post('/add', data={'title': title})
+    client.get('/')
+    add(client, 'c')
+    add(client, 'd')
+    # Page size 3: the fifth todo is on page 2, found without counting
+    assert client.post('/add', data={'title': 'e'}).headers['Location'].endswith('/?page=2')
+    assert todo_app.todo_count.get(todo_app.table_version.current()) == 5
+
+def test_add_reports_the_page_the_new_row_is_on(client):
+    pages = [add(client, title)[0].headers['X-Page'] for title in 'abcd']
+    # Page size 3: the fourth todo starts page 2
+    assert pages == ['1', '1', '1', '2']
+    # The row's links send toggles and deletes back to that page
+    response, todo_id = add(client, 'e')
+    assert f'href="/toggle/{todo_id}?page=2"' in response.get_data(as_text=True)
+
+def test_index_form_posts_its_page(client):
+    html = client.get('/').get_data(as_text=True)
+    assert 'data-fragment="/fragments/add" data-page="1"' in html
@@ -0,0 +1,33 @@
+from prometheus_client import REGISTRY
+
+import metrics
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def test_requests_are_labelled_with_the_route_template(client):
+    before = sample('app_requests_total', method='GET', endpoint='/toggle/<int:id>', http_status='302')
+    client.get('/toggle/12345')
+    client.get('/toggle/67890')
+    after = sample('app_requests_total', method='GET', endpoint='/toggle/<int:id>', http_status='302')
+    assert after - before == 2
+
+def test_unmatched_paths_share_one_label(client):
+    before = sample('app_requests_total', method='GET', endpoint=metrics.UNMATCHED_ENDPOINT,
+                    http_status='404')
+    client.get('/no/such/page-1')
+    client.get('/no/such/page-2')
+    after = sample('app_requests_total', method='GET', endpoint=metrics.UNMATCHED_ENDPOINT,
+                   http_status='404')
+    assert after - before == 2
+    assert not any(sample.labels.get('endpoint', '').startswith('/no/such')
+                   for family in REGISTRY.collect() for sample in family.samples)
+
+def test_in_progress_gauge_returns_to_zero(client):
+    client.get('/')
+    assert sample('app_requests_in_progress', method='GET', endpoint='/') == 0
+
+def test_metrics_endpoint(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert b'app_requests_total' in response.data
@@ -0,0 +1,125 @@
+import os
+import threading
+
+from sqlalchemy import event
+
+import app as todo_app
+from cache import TableVersion, VersionedCount
+
+def test_version_never_repeats(tmp_path):
+    version = TableVersion(str(tmp_path / 'todos.version'))
+    start = version.current()
+    # Many bumps inside one clock tick must still be distinct and increasing
+    seen = [version.bump() for _ in range(1000)]
+    assert seen == list(range(start + 1, start + 1001))
+    assert version.current() == seen[-1]
+
+def test_version_is_shared_between_openers(tmp_path):
+    path = str(tmp_path / 'todos.version')
+    first, second = TableVersion(path), TableVersion(path)
+    first.bump()
+    assert second.current() == first.current() == 1
+    assert second.bump() == 2
+    assert first.current() == 2
+    # A reopen continues from the file
+    assert TableVersion(path).current() == 2
+
+def test_version_bumps_from_threads_are_unique(tmp_path):
+    version = TableVersion(str(tmp_path / 'todos.version'))
+    seen = []
+
+    def bump():
+        for _ in range(200):
+            seen.append(version.bump())
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(seen) == list(range(1, 801))
+
+def test_version_bumps_from_processes_are_unique(tmp_path):
+    version = TableVersion(str(tmp_path / 'todos.version'))
+    read, write = os.pipe()
+    pids = []
+    for _ in range(3):
+        pid = os.fork()
+        if pid == 0:
+            # Forked with the file already open, like gunicorn workers
+            values = b''.join(b'%d\n' % version.bump() for _ in range(100))
+            os.write(write, values)
+            os._exit(0)
+        pids.append(pid)
+    os.close(write)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    with os.fdopen(read, 'rb') as pipe:
+        seen = sorted(int(line) for line in pipe.read().split())
+    assert seen == list(range(1, 301))
+
+def test_versioned_count_only_carries_to_the_next_version():
+    count = VersionedCount()
+    count.set(5, 10)
+    count.carry(6, 1)
+    assert count.get(6) == 11
+    assert count.get(5) is None
+    # Version 7 was another write's; 8 can't know the count
+    count.carry(8, 1)
+    assert count.get(8) is None
+
+def count_statements(engine):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    return statements, lambda: event.remove(engine, 'before_cursor_execute', record)
+
+def test_index_is_served_from_cache_until_a_write(client):
+    client.post('/add', data={'title': 'first'})
+    assert b'first' in client.get('/').data
+
+    statements, stop = count_statements(todo_app.read_engine)
+    try:
+        assert b'first' in client.get('/').data
+        assert statements == []
+        client.post('/add', data={'title': 'second'})
+        assert b'second' in client.get('/?page=1').data
+    finally:
+        stop()
+    assert statements
+
+def test_add_redirects_to_the_last_page_without_counting(client):
+    for title in ('a', 'b', 'c'):
+        client.post('/add', data={'title': title})
+    # Page size is 3; rendering a page remembers the count for this version
+    client.get('/')
+
+    with todo_app.app.app_context():
+        statements, stop = count_statements(todo_app.db.engine)
+        try:
+            response = client.post('/add', data={'title': 'd'})
+        finally:
+            stop()
+    assert response.headers['Location'].endswith('/?page=2')
+    assert not any('count(' in statement.lower() for statement in statements)
+
+    response = client.post('/add', data={'title': 'e'})
+    assert response.headers['Location'].endswith('/?page=2')
+    assert b'e' in client.get('/?page=2').data
+
+def test_add_counts_when_another_write_came_in_between(client):
+    for title in ('a', 'b', 'c'):
+        client.post('/add', data={'title': title})
+    client.get('/')
+    # A write from another worker: the version moves on without this process's count
+    with todo_app.app.app_context():
+        todo_app.db.session.add(todo_app.Todo(title='elsewhere'))
+        todo_app.db.session.commit()
+    todo_app.table_version.bump()
+
+    response = client.post('/add', data={'title': 'd'})
+    assert response.headers['Location'].endswith('/?page=2')
+    assert todo_app.todo_count.get(todo_app.table_version.current()) == 5
@@ -0,0 +1,91 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+import pytest
+from flask import Flask
+
+import profiler
+
+@pytest.fixture
+def profiled(monkeypatch):
+    monkeypatch.setattr(profiler, 'TOKEN', 'secret')
+    monkeypatch.setattr(profiler, 'sampler', profiler.Sampler(hz=500, slow_ms=50, slow_keep=2))
+    app = Flask(__name__)
+
+    @app.route('/slow')
+    def slow_view():
+        time.sleep(0.15)
+        return 'done'
+
+    @app.route('/fast')
+    def fast_view():
+        return 'done'
+
+    profiler.init_app(app)
+    return app.test_client()
+
+def test_off_without_a_token(client):
+    assert client.get('/debug/slow').status_code == 404
+
+def test_slow_requests_keep_their_stacks(profiled):
+    profiled.get('/fast')
+    profiled.get('/slow')
+    token = {'X-Debug-Token': 'secret'}
+
+    listing = profiled.get('/debug/slow', headers=token).get_json()
+    assert [entry['endpoint'] for entry in listing['requests']] == ['/slow']
+    entry = listing['requests'][0]
+    assert entry['duration_ms'] >= 150 and entry['status'] == 200 and entry['samples'] > 0
+
+    stacks = profiled.get(f"/debug/slow/{entry['id']}", headers=token).get_data(as_text=True)
+    assert 'slow_view (test_profiler.py:' in stacks
+    assert profiled.get('/debug/slow/999', headers=token).status_code == 404
+
+def test_slow_ring_keeps_the_latest(profiled):
+    for _ in range(3):
+        profiled.get('/slow')
+    ids = [entry['id'] for entry in profiled.get(
+        '/debug/slow', headers={'X-Debug-Token': 'secret'}).get_json()['requests']]
+    assert ids == [3, 2]
+
+def test_debug_routes_need_the_token(profiled):
+    assert profiled.get('/debug/slow').status_code == 403
+    assert profiled.get('/debug/slow', headers={'X-Debug-Token': 'wrong'}).status_code == 403
+    assert profiled.get('/debug/profile?seconds=0', headers={'X-Debug-Token': 'secret'}).status_code == 400
+
+def test_collapsed_format():
+    stacks = Counter({'main;handler;query': 3, 'main;handler': 1})
+    assert profiler.format_collapsed(stacks) == 'main;handler;query 3\nmain;handler 1\n'
+
+    def leaf():
+        return profiler.collapse(sys._getframe())
+
+    assert leaf().endswith(';test_collapsed_format.<locals>.leaf (test_profiler.py:' +
+                           str(leaf.__code__.co_firstlineno) + ')')
+
+def test_slow_ring_can_be_read_while_requests_finish():
+    sampler = profiler.Sampler(hz=100, slow_ms=0, slow_keep=50)
+    summary = {'method': 'GET', 'endpoint': '/', 'path': '/', 'status': 200}
+    errors = []
+
+    def finish_requests():
+        for _ in range(2000):
+            sampler.end(sampler.begin(), summary, 0.001)
+
+    def read_ring():
+        try:
+            for _ in range(2000):
+                for entry in sampler.slow_snapshot():
+                    entry['id']
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=finish_requests), threading.Thread(target=read_ring)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(sampler.slow_snapshot()) == 50
@@ -0,0 +1,51 @@
+import logging
+
+from prometheus_client import REGISTRY
+
+import metrics
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def test_statement_fingerprints_ignore_literals():
+    assert (metrics.fingerprint("SELECT * FROM todo WHERE id = 5 AND title = 'a'")
+            == metrics.fingerprint("SELECT * FROM todo WHERE id = 17 AND title = 'b''c'"))
+    assert metrics.fingerprint('DELETE FROM todo WHERE id IN (1, 2, 3)') == \
+        'DELETE FROM todo WHERE id IN (?, ...)'
+
+def test_redact_keeps_only_types():
+    assert metrics.redact({'title': 'secret', 'id': 3}) == {'title': 'str', 'id': 'int'}
+    assert metrics.redact([('secret', 1)]) == [['str', 'int']]
+
+def test_statement_labels_are_capped(monkeypatch):
+    monkeypatch.setattr(metrics, 'MAX_STATEMENT_LABELS', 2)
+    monkeypatch.setattr(metrics, 'statement_labels', set())
+    assert metrics.statement_label('SELECT a FROM t') == 'SELECT a FROM t'
+    assert metrics.statement_label('SELECT b FROM t') == 'SELECT b FROM t'
+    assert metrics.statement_label('SELECT c FROM t') == metrics.OTHER_STATEMENT
+    # Labels already handed out keep working
+    assert metrics.statement_label('SELECT a FROM t') == 'SELECT a FROM t'
+
+def test_statements_are_counted_per_request(client):
+    client.post('/add', data={'title': 'counted'})
+    before = sample('app_db_queries_per_request_count', endpoint='/add')
+    before_sum = sample('app_db_queries_per_request_sum', endpoint='/add')
+    client.post('/add', data={'title': 'counted again'})
+    assert sample('app_db_queries_per_request_count', endpoint='/add') == before + 1
+    assert sample('app_db_queries_per_request_sum', endpoint='/add') > before_sum
+
+def test_requests_over_the_threshold_are_flagged(client, monkeypatch, caplog):
+    monkeypatch.setattr(metrics, 'N_PLUS_ONE_THRESHOLD', 0)
+    before = sample('app_db_n_plus_one_total', endpoint='/add')
+    with caplog.at_level(logging.WARNING, logger='todo.sql'):
+        client.post('/add', data={'title': 'flagged'})
+    assert sample('app_db_n_plus_one_total', endpoint='/add') == before + 1
+    assert 'Likely N+1: POST /add' in caplog.text
+
+def test_slow_queries_are_logged_without_values(client, monkeypatch, caplog):
+    monkeypatch.setattr(metrics, 'SLOW_QUERY_MS', 0)
+    with caplog.at_level(logging.WARNING, logger='todo.sql'):
+        client.post('/add', data={'title': 'top secret title'})
+    assert 'Slow query' in caplog.text
+    assert 'INSERT INTO todo' in caplog.text
+    assert 'top secret title' not in caplog.text
@@ -0,0 +1,50 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+import app as todo_app
+from database import create_read_engine, read_session
+from models import Todo
+
+def count(session):
+    return session.scalar(select(func.count()).select_from(Todo))
+
+def test_write_engine_uses_wal():
+    with todo_app.app.app_context(), todo_app.db.engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+
+def test_read_engine_refuses_writes(client):
+    with pytest.raises(OperationalError):
+        with read_session(todo_app.read_engine) as session:
+            session.execute(text("INSERT INTO todo (title, completed) VALUES ('nope', 0)"))
+
+def test_read_session_sees_one_snapshot(client):
+    client.post('/add', data={'title': 'before'})
+    with read_session(todo_app.read_engine) as session:
+        assert count(session) == 1
+        client.post('/add', data={'title': 'during'})
+        # Committed meanwhile, but this transaction keeps its snapshot
+        assert count(session) == 1
+    with read_session(todo_app.read_engine) as session:
+        assert count(session) == 2
+
+def test_checkouts_are_timed_per_pool(client):
+    before = REGISTRY.get_sample_value('app_db_pool_checkout_seconds_count', {'pool': 'read'}) or 0
+    client.get('/?page=99')
+    assert REGISTRY.get_sample_value('app_db_pool_checkout_seconds_count', {'pool': 'read'}) > before
+
+def test_read_pool_timeout_is_counted():
+    with todo_app.app.app_context():
+        path = todo_app.db.engine.url.database
+    engine = create_read_engine(path, pool_size=1, pool_timeout=0.05, busy_timeout=100)
+    before = REGISTRY.get_sample_value('app_db_pool_timeouts_total', {'pool': 'read'}) or 0
+    held = engine.connect()
+    try:
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    finally:
+        held.close()
+        engine.dispose()
+    assert REGISTRY.get_sample_value('app_db_pool_timeouts_total', {'pool': 'read'}) == before + 1
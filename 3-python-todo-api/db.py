@@ -0,0 +1,633 @@
+"""
+SQLite connection pool, commit watch, shard router, group-commit writer
+and busy retry for the Python Todo API
+Keeps a bounded set of long-lived, tuned connections instead of
+opening a fresh one for every request
+"""
+
+import functools
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+# Applied to every connection right after it is opened.
+# cache_size is negative so it is interpreted as KiB instead of pages.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -16000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+# Primary result codes behind "database is locked" / "database table is locked"
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the pool timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of persistent SQLite connections"""
+
+    def __init__(self, database, size=8, timeout=30.0, pragmas=None,
+                 cached_statements=256):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self._retired = False
+
+        # LIFO so the most recently used (warmest) connection is reused first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self):
+        """Open and tune a new connection"""
+        # The busy timeout is set on connect too, so the journal_mode pragma
+        # below already waits if another process holds the lock
+        conn = sqlite3.connect(
+            self.database,
+            timeout=int(self.pragmas.get('busy_timeout', 5000)) / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}').fetchall()
+        return conn
+
+    def acquire(self):
+        """Check out a connection, opening one if the pool is not full yet"""
+        start = time.perf_counter()
+        waited = False
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+
+            if grow:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                waited = True
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(
+                        f'No database connection available after {self.timeout}s'
+                    )
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_total += elapsed
+            self._wait_max = max(self._wait_max, elapsed)
+
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._lock:
+            self._in_use -= 1
+            retired = self._retired
+            if retired:
+                self._created -= 1
+
+        if retired:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with-block.
+
+        Commits on success and rolls back on error, like using a plain
+        sqlite3 connection as a context manager.
+        """
+        conn = self.acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.release(conn)
+
+    def close(self, retire=False):
+        """Close every idle connection.
+
+        The pool stays usable and reopens connections on demand. With
+        retire=True, connections still checked out are closed as they are
+        released too; use it for a pool that is being thrown away.
+        """
+        if retire:
+            with self._lock:
+                self._retired = True
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self):
+        """Snapshot of pool usage for sizing"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'open': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'wait_seconds_total': round(self._wait_total, 6),
+                'wait_seconds_avg': round(self._wait_total / self._checkouts, 6)
+                if self._checkouts else 0.0,
+                'wait_seconds_max': round(self._wait_max, 6),
+                'pragmas': self.pragmas,
+            }
+
+
+class CommitWatch:
+    """Tells whether any connection, in any process, committed to a database file.
+
+    Holds one connection of its own and runs PRAGMA data_version on it.
+    SQLite changes that value whenever another connection commits, and
+    reading it touches no table pages and takes no pooled connection, so
+    it is cheap enough to check on every request.
+    """
+
+    def __init__(self, database, timeout=5.0):
+        self.database = database
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last = None
+        self._checks = 0
+        self._changes = 0
+
+    def changed(self):
+        """True if something was committed since the previous call (always on the first)"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.database, timeout=self.timeout,
+                                             check_same_thread=False, isolation_level=None)
+                self._last = None
+
+            version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            changed = version != self._last
+            self._last = version
+            self._checks += 1
+            self._changes += changed
+            return changed
+
+    def close(self):
+        """Close the connection; the next check reopens it and reports a change"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self):
+        with self._lock:
+            return {'checks': self._checks, 'changes': self._changes}
+
+
+class ShardRouter:
+    """Routes shard keys to their own SQLite files, keeping an LRU of open pools.
+
+    Every shard is a separate database file with its own write lock, so
+    writes to different shards never wait on each other. At most max_open
+    shard pools are kept; the least recently used one is closed to make room.
+    """
+
+    def __init__(self, path_for, init_shard=None, max_open=32, pool_size=4,
+                 timeout=30.0, pragmas=None):
+        # path_for(key) returns the shard's file; init_shard(conn) creates
+        # its schema and runs once each time a shard is opened
+        self.path_for = path_for
+        self.init_shard = init_shard
+        self.max_open = max_open
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.pragmas = pragmas
+
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._opens = 0
+        self._evictions = 0
+
+    def pool(self, key):
+        """Connection pool for a shard, opening it if needed"""
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None:
+                self._pools.move_to_end(key)
+                self._hits += 1
+                return pool
+
+        pool = ConnectionPool(self.path_for(key), size=self.pool_size,
+                              timeout=self.timeout, pragmas=self.pragmas)
+        if self.init_shard is not None:
+            with pool.connection() as conn:
+                self.init_shard(conn)
+
+        evicted = []
+        with self._lock:
+            # Another thread may have opened the same shard meanwhile
+            existing = self._pools.get(key)
+            if existing is not None:
+                evicted.append(pool)
+                pool = existing
+            else:
+                self._pools[key] = pool
+                self._opens += 1
+                while len(self._pools) > self.max_open:
+                    evicted.append(self._pools.popitem(last=False)[1])
+                    self._evictions += 1
+
+        for stale in evicted:
+            stale.close(retire=True)
+        return pool
+
+    def connection(self, key):
+        """Pooled connection to a shard (use as a context manager)"""
+        return self.pool(key).connection()
+
+    def discard(self, key):
+        """Close a shard's pool and delete its database files"""
+        with self._lock:
+            pool = self._pools.pop(key, None)
+        if pool is not None:
+            pool.close(retire=True)
+
+        path = self.path_for(key)
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        """Close every open shard pool"""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.close(retire=True)
+
+    def stats(self):
+        """Snapshot of open shards and LRU churn"""
+        with self._lock:
+            return {
+                'open': len(self._pools),
+                'max_open': self.max_open,
+                'pool_size': self.pool_size,
+                'hits': self._hits,
+                'opens': self._opens,
+                'evictions': self._evictions,
+            }
+
+
+def is_busy_error(error):
+    """True if a sqlite3 error means another connection holds the lock"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+class DatabaseBusy(Exception):
+    """Raised when a write still hits SQLITE_BUSY after every retry"""
+
+
+class BusyRetry:
+    """Decorator that re-runs a write on SQLITE_BUSY with jittered backoff.
+
+    busy_timeout already makes SQLite wait for the lock; this covers what
+    it cannot, such as a wait that outlasts the timeout or a busy error
+    raised on COMMIT. The wrapped function must be safe to run again,
+    which holds when all its writes happen in one rolled-back transaction.
+    """
+
+    def __init__(self, attempts=5, base_delay=0.01, max_delay=0.5):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._retries = 0
+        self._recovered = 0
+        self._gave_up = 0
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(self.attempts):
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as error:
+                    if not is_busy_error(error):
+                        raise
+                    if attempt == self.attempts - 1:
+                        with self._lock:
+                            self._gave_up += 1
+                        raise DatabaseBusy('Database is busy, try again later') from error
+
+                    with self._lock:
+                        self._retries += 1
+                    # Full jitter, so processes that collided don't retry in lockstep
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                    time.sleep(random.uniform(0, delay))
+                    continue
+
+                if attempt:
+                    with self._lock:
+                        self._recovered += 1
+                return result
+        return wrapper
+
+    def stats(self):
+        """Snapshot of retry counts"""
+        with self._lock:
+            return {
+                'attempts': self.attempts,
+                'retries': self._retries,
+                'recovered': self._recovered,
+                'gave_up': self._gave_up,
+            }
+
+
+class WriteQueueFull(Exception):
+    """Raised when the write coalescer queue stays full"""
+
+
+class WriteTimeout(WriteQueueFull):
+    """Raised when a queued write is not committed in time"""
+
+
+class WriteCoalescer:
+    """Group-commit writer.
+
+    A single background thread drains queued writes and runs them in one
+    transaction per group, bounded by max_batch operations or max_wait
+    seconds after the first one arrives. Each caller gets a Future that
+    resolves to the cursor's lastrowid once the group has committed.
+    """
+
+    def __init__(self, transaction, max_batch=64, max_wait=0.002,
+                 max_queue=10000, put_timeout=5.0):
+        # transaction() must return a context manager yielding a connection
+        # that commits on exit
+        self.transaction = transaction
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.put_timeout = put_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._groups = 0
+        self._ops = 0
+        self._errors = 0
+        self._timeouts = 0
+        self._max_group = 0
+        self._commit_seconds = 0.0
+        # Group sizes bucketed by upper bound (1, 2, 4, ... max_batch)
+        self._group_sizes = {}
+
+    def _ensure_started(self):
+        # Started lazily so pre-forked workers each get their own thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='write-coalescer', daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, sql, params=()):
+        """Queue one write; returns a Future for its lastrowid"""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put((sql, params, future), timeout=self.put_timeout)
+        except queue.Full:
+            raise WriteQueueFull('Write queue is full, try again later')
+        return future
+
+    def write(self, sql, params=(), timeout=None):
+        """Queue one write and wait up to `timeout` seconds for its lastrowid
+
+        Raises WriteTimeout when that runs out. A write the writer thread
+        has not picked up yet is withdrawn; one already in a group being
+        committed can't be, and may still land.
+        """
+        future = self.submit(sql, params)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self._timeouts += 1
+            raise WriteTimeout('Write was not committed in time, try again later')
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stop = False
+            deadline = time.perf_counter() + self.max_wait
+
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(
+                        timeout=max(deadline - time.perf_counter(), 0)
+                    )
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        # Skip writes whose caller gave up waiting; the rest can't be cancelled now
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        results = []
+
+        try:
+            with self.transaction() as conn:
+                for sql, params, _ in batch:
+                    try:
+                        results.append(conn.execute(sql, params).lastrowid)
+                    except sqlite3.Error as error:
+                        # Only this statement is rolled back; the group goes on
+                        results.append(error)
+        except Exception as error:
+            results = [error] * len(batch)
+
+        elapsed = time.perf_counter() - start
+        errors = 0
+        for (_, _, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                errors += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+        bucket = 1
+        while bucket < len(batch):
+            bucket *= 2
+
+        with self._lock:
+            self._groups += 1
+            self._ops += len(batch)
+            self._errors += errors
+            self._max_group = max(self._max_group, len(batch))
+            self._commit_seconds += elapsed
+            self._group_sizes[bucket] = self._group_sizes.get(bucket, 0) + 1
+
+    def close(self, timeout=5.0):
+        """Flush queued writes and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def stats(self):
+        """Snapshot of queue depth and group sizes"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_batch': self.max_batch,
+                'max_wait_seconds': self.max_wait,
+                'groups': self._groups,
+                'ops': self._ops,
+                'errors': self._errors,
+                'timeouts': self._timeouts,
+                'group_size_avg': round(self._ops / self._groups, 2)
+                if self._groups else 0.0,
+                'group_size_max': self._max_group,
+                'group_sizes': {f'le_{size}': count for size, count
+                                in sorted(self._group_sizes.items())},
+                'commit_seconds_total': round(self._commit_seconds, 6),
+            }
+
+
+class PeriodicTask:
+    """Runs func every `interval` seconds on a daemon thread.
+
+    Like WriteCoalescer, the thread is started lazily so pre-forked
+    workers each get their own.
+    """
+
+    def __init__(self, func, interval, name):
+        self.func = func
+        self.interval = interval
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._runs = 0
+        self._errors = 0
+        self._last_error = None
+        self._last_run_at = None
+        self._last_seconds = 0.0
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def run_once(self):
+        """Run func now, recording its duration and any error"""
+        start = time.perf_counter()
+        try:
+            self.func()
+        except Exception as error:
+            print(f"⚠️  {self.name} failed: {error}")
+            with self._lock:
+                self._errors += 1
+                self._last_error = str(error)
+
+        with self._lock:
+            self._runs += 1
+            self._last_run_at = time.time()
+            self._last_seconds = time.perf_counter() - start
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'interval_seconds': self.interval,
+                'running': self._thread is not None and self._thread.is_alive(),
+                'runs': self._runs,
+                'errors': self._errors,
+                'last_error': self._last_error,
+                'last_run_at': self._last_run_at,
+                'last_run_seconds': round(self._last_seconds, 6),
+            }
@@ -0,0 +1,69 @@
+"""
+Production server settings for the Python Todo API
+
+    gunicorn main:app
+
+gunicorn picks this file up from the working directory. It pre-forks
+TODO_WORKERS processes with TODO_THREADS threads each, all sharing one
+SQLite file in WAL mode.
+"""
+
+import multiprocessing
+import os
+import signal
+
+bind = os.environ.get('TODO_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('TODO_WORKERS', multiprocessing.cpu_count()))
+# Every open change stream (/api/todos/changes/stream) holds one of these
+# threads, so size workers x threads for the expected number of open tabs
+# plus the ordinary request load
+threads = int(os.environ.get('TODO_THREADS', '4'))
+worker_class = 'gthread'
+
+# Import main.py once in the master: init_db() creates the schema, runs
+# migrations and builds the search index before any worker exists, instead
+# of every worker racing to do it
+preload_app = True
+
+# Seconds a worker gets to finish in-flight requests after SIGTERM
+graceful_timeout = int(os.environ.get('TODO_GRACEFUL_TIMEOUT', '30'))
+# Change streams are long-lived requests; workers still heartbeat while serving them
+timeout = 60
+keepalive = 5
+
+accesslog = os.environ.get('TODO_ACCESS_LOG')
+errorlog = '-'
+
+
+def when_ready(server):
+    print(f"🚀 Python Todo API running on http://{bind} "
+          f"({workers} workers x {threads} threads)")
+
+
+def pre_fork(server, worker):
+    # SQLite connections must not cross fork(); the master only used them
+    # for init_db(), so close them before every fork. Children open their own.
+    import main
+    main.pool.close()
+    main.commit_watch.close()
+    main.shards.close()
+
+
+def post_worker_init(worker):
+    # On SIGTERM, end open change streams too. Otherwise each one holds its
+    # thread until graceful_timeout runs out and the worker is killed.
+    import main
+    handle_exit = worker.handle_exit
+
+    def handle_exit_and_close_streams(sig, frame):
+        main.close_streams()
+        handle_exit(sig, frame)
+
+    worker.handle_exit = handle_exit_and_close_streams
+    signal.signal(signal.SIGTERM, handle_exit_and_close_streams)
+
+
+def worker_exit(server, worker):
+    # Graceful shutdown: commit queued inserts and close this worker's connections
+    import main
+    main.shutdown()
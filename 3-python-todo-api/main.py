@@ -1,48 +1,590 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import sqlite3
 import json
+import base64
+import heapq
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 import os
+from db import (ConnectionPool, CommitWatch, ShardRouter, PoolTimeout, WriteCoalescer,
+                WriteQueueFull, PeriodicTask, BusyRetry, DatabaseBusy, DEFAULT_PRAGMAS)
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Next-Offset', 'ETag'])  # Enable CORS for all routes
 
-DATABASE = 'todos.db'
+DATABASE = os.environ.get('TODO_DB_PATH', 'todos.db')
+
+# Connection pool settings (see README "Configuration")
+POOL_SIZE = int(os.environ.get('TODO_DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.environ.get('TODO_DB_POOL_TIMEOUT', '30'))
+PRAGMAS = {
+    **DEFAULT_PRAGMAS,
+    'journal_mode': os.environ.get('TODO_DB_JOURNAL_MODE', DEFAULT_PRAGMAS['journal_mode']),
+    'synchronous': os.environ.get('TODO_DB_SYNCHRONOUS', DEFAULT_PRAGMAS['synchronous']),
+    'busy_timeout': int(os.environ.get('TODO_DB_BUSY_TIMEOUT', DEFAULT_PRAGMAS['busy_timeout'])),
+    'cache_size': int(os.environ.get('TODO_DB_CACHE_SIZE', DEFAULT_PRAGMAS['cache_size'])),
+    'mmap_size': int(os.environ.get('TODO_DB_MMAP_SIZE', DEFAULT_PRAGMAS['mmap_size'])),
+}
+
+# Write handlers that still hit SQLITE_BUSY after busy_timeout are re-run
+# this many times with backoff before answering 503
+BUSY_RETRY_ATTEMPTS = int(os.environ.get('TODO_BUSY_RETRY_ATTEMPTS', '5'))
+
+# Pagination settings for GET /api/todos
+MAX_PAGE_SIZE = int(os.environ.get('TODO_MAX_PAGE_SIZE', '1000'))
+STREAM_BATCH_SIZE = 500
+
+# How list bodies are encoded by default: 'python' (dict per row) or
+# 'sql' (SQLite's json_object builds each row, Python only joins strings)
+LIST_SERIALIZER = os.environ.get('TODO_LIST_SERIALIZER', 'python')
+TODO_JSON_SQL = (
+    "json_object('id', id, 'title', title, "
+    "'completed', json(CASE WHEN completed THEN 'true' ELSE 'false' END), "
+    "'created_at', created_at)"
+)
+
+# Bulk endpoint settings
+BULK_MAX_OPERATIONS = int(os.environ.get('TODO_BULK_MAX_OPERATIONS', '1000'))
+BULK_SQL = {
+    'create': 'INSERT INTO todos (title, completed, created_at) VALUES (?, ?, ?)',
+    'update': 'UPDATE todos SET title = ?, completed = ? WHERE id = ?',
+    'delete': 'DELETE FROM todos WHERE id = ?',
+    'toggle': 'UPDATE todos SET completed = ? WHERE id = ?',
+}
+
+# Group commit for POST /api/todos: one writer thread commits queued
+# inserts in groups of up to COALESCE_MAX_BATCH or COALESCE_MAX_WAIT_MS
+WRITE_COALESCING = os.environ.get('TODO_WRITE_COALESCING', '').lower() in ('1', 'true', 'yes')
+COALESCE_MAX_BATCH = int(os.environ.get('TODO_COALESCE_MAX_BATCH', '64'))
+COALESCE_MAX_WAIT_MS = float(os.environ.get('TODO_COALESCE_MAX_WAIT_MS', '2'))
+COALESCE_MAX_QUEUE = int(os.environ.get('TODO_COALESCE_MAX_QUEUE', '10000'))
+
+# Change feed: entries older than the retention window are compacted away
+# by the maintenance task
+CHANGES_RETENTION_SECONDS = int(os.environ.get('TODO_CHANGES_RETENTION_SECONDS', '86400'))
+SSE_HEARTBEAT_SECONDS = 15
+# How often an idle change stream checks SQLite for writes made by other processes
+SSE_POLL_SECONDS = 1
+# Each open stream holds a server thread, so streams are closed after this
+# long and EventSource reconnects with Last-Event-ID
+SSE_MAX_SECONDS = float(os.environ.get('TODO_SSE_MAX_SECONDS', '300'))
+
+# clear_completed() deletes in batches and pauses between them, so other
+# writers get the lock instead of waiting for one long DELETE
+CLEAR_BATCH_SIZE = int(os.environ.get('TODO_CLEAR_BATCH_SIZE', '2000'))
+CLEAR_BATCH_PAUSE_MS = float(os.environ.get('TODO_CLEAR_BATCH_PAUSE_MS', '5'))
+
+# Background maintenance: change-log compaction, incremental vacuum and ANALYZE
+MAINTENANCE_INTERVAL = float(os.environ.get('TODO_MAINTENANCE_INTERVAL', '300'))
+MAINTENANCE_VACUUM_PAGES = int(os.environ.get('TODO_MAINTENANCE_VACUUM_PAGES', '2000'))
+ANALYSIS_LIMIT = 1000
+
+# Full-text search page size
+SEARCH_DEFAULT_LIMIT = 20
+
+# In-memory cache of serialized GET /api/todos responses
+LIST_CACHE_SIZE = int(os.environ.get('TODO_LIST_CACHE_SIZE', '64'))
+
+# Lists: each list's todos live in their own SQLite file (shard) under
+# SHARD_DIR, so writers to different lists never share a lock
+SHARD_DIR = os.environ.get(
+    'TODO_SHARD_DIR', os.path.join(os.path.dirname(os.path.abspath(DATABASE)), 'shards')
+)
+SHARD_MAX_OPEN = int(os.environ.get('TODO_SHARD_MAX_OPEN', '32'))
+SHARD_POOL_SIZE = int(os.environ.get('TODO_SHARD_POOL_SIZE', '4'))
+SHARD_FANOUT_WORKERS = int(os.environ.get('TODO_SHARD_FANOUT_WORKERS', '8'))
+
+pool = ConnectionPool(DATABASE, size=POOL_SIZE, timeout=POOL_TIMEOUT, pragmas=PRAGMAS)
+busy_retry = BusyRetry(attempts=BUSY_RETRY_ATTEMPTS)
+commit_watch = CommitWatch(DATABASE, timeout=PRAGMAS['busy_timeout'] / 1000)
+
+# Data version: bumped in the same transaction as every write and mirrored
+# here after commit. Other worker processes write to the same file, so
+# readers call refresh_data_version(), which re-reads it from the meta
+# table only after commit_watch has seen a commit.
+data_version = 0
+data_version_lock = threading.Lock()
+data_version_refresh_lock = threading.Lock()
+data_version_changed = threading.Condition(data_version_lock)
+# Set on shutdown to end open change streams within SSE_POLL_SECONDS
+streams_closing = threading.Event()
+maintenance_stats = {'changes_compacted': 0, 'pages_vacuumed': 0, 'analyzed': 0}
+list_cache = OrderedDict()
+list_cache_stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+# Set by init_db(); False when SQLite was built without FTS5
+search_enabled = False
 
 def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get a pooled database connection (use as a context manager)"""
+    return pool.connection()
+
+def publish_data_version(version):
+    """Record a committed data version and drop list responses cached for older ones"""
+    global data_version
+
+    with data_version_lock:
+        if version > data_version:
+            data_version = version
+            list_cache.clear()
+            data_version_changed.notify_all()
+
+def refresh_data_version():
+    """Current data version, including other processes' writes.
+
+    The meta table is only read when something was committed since the
+    last check. Checks are serialized, so a request never answers with a
+    version older than one another request has already seen committed.
+    """
+    with data_version_refresh_lock:
+        if commit_watch.changed():
+            with get_db() as conn:
+                version = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+            publish_data_version(version)
+        return data_version
+
+@contextmanager
+def write_db():
+    """Pooled connection for a write handler.
+
+    The write lock is taken up front (BEGIN IMMEDIATE), so a handler that
+    reads before it writes waits on busy_timeout instead of failing with
+    SQLITE_BUSY when another process committed in between. If the block
+    changed any rows, the data version is bumped in the same transaction
+    and published once it has committed.
+    """
+    version = None
+
+    with get_db() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        changed_rows = conn.total_changes
+        yield conn
+
+        if conn.total_changes != changed_rows:
+            version = conn.execute(
+                "UPDATE meta SET value = value + 1 WHERE key = 'data_version' RETURNING value"
+            ).fetchone()[0]
+
+    if version is not None:
+        publish_data_version(version)
+        maintenance.ensure_started()
+
+def compact_changes():
+    """Drop change log entries older than the retention window.
+
+    Whole versions are removed, and the highest removed version is kept
+    as changes_floor so older ?since= values can be rejected.
+    """
+    cutoff = int(time.time()) - CHANGES_RETENTION_SECONDS
+
+    with get_db() as conn:
+        floor = conn.execute(
+            'SELECT MAX(version) FROM changes WHERE changed_at < ?', (cutoff,)
+        ).fetchone()[0]
+        if floor is None:
+            return 0
+
+        deleted = conn.execute('DELETE FROM changes WHERE version <= ?', (floor,)).rowcount
+        conn.execute("""
+            INSERT INTO meta (key, value) VALUES ('changes_floor', ?)
+            ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)
+        """, (floor,))
+
+    return deleted
+
+def run_maintenance():
+    """Compact the change log, hand free pages back and refresh planner stats"""
+    compacted = compact_changes()
+
+    with get_db() as conn:
+        vacuumed = 0
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if free_pages:
+                # Bounded, so one run never holds the write lock for long.
+                # The pragma frees one page per step and execute() only
+                # steps it once; executescript() runs it to completion
+                conn.executescript(f'PRAGMA incremental_vacuum({MAINTENANCE_VACUUM_PAGES});')
+                vacuumed = free_pages - conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+        # analysis_limit makes ANALYZE sample each index instead of reading all of it
+        conn.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}').fetchall()
+        conn.execute('ANALYZE')
+
+    with data_version_lock:
+        maintenance_stats['changes_compacted'] += compacted
+        maintenance_stats['pages_vacuumed'] += vacuumed
+        maintenance_stats['analyzed'] += 1
+
+maintenance = PeriodicTask(busy_retry(run_maintenance), MAINTENANCE_INTERVAL, 'db-maintenance')
+
+writer = WriteCoalescer(
+    write_db,
+    max_batch=COALESCE_MAX_BATCH,
+    max_wait=COALESCE_MAX_WAIT_MS / 1000,
+    max_queue=COALESCE_MAX_QUEUE,
+) if WRITE_COALESCING else None
+
+def shard_path(list_id):
+    """Database file holding one list's todos"""
+    return os.path.join(SHARD_DIR, f'list-{list_id}.db')
+
+def create_todos_schema(conn):
+    """Create the todos table and its indexes (main database and list shards)"""
+    # auto_vacuum can only change through a VACUUM once the file has a
+    # header (the WAL pragma already wrote one). That is instant while the
+    # database is empty; existing databases need `main.py vacuum`
+    if not conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchone():
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS todos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            completed BOOLEAN NOT NULL DEFAULT FALSE,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    # Covers the list ordering and the keyset cursor, so listing never sorts
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_todos_created_at_id
+        ON todos (created_at DESC, id DESC)
+    ''')
+    # Partial index: only completed rows, so clear_completed() finds them
+    # without scanning the table and the index stays small
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_todos_completed
+        ON todos (completed) WHERE completed = 1
+    ''')
+
+shards = ShardRouter(shard_path, init_shard=create_todos_schema, max_open=SHARD_MAX_OPEN,
+                     pool_size=SHARD_POOL_SIZE, timeout=POOL_TIMEOUT, pragmas=PRAGMAS)
+# Threads are only started on first use, so forked workers get their own
+fanout = ThreadPoolExecutor(max_workers=SHARD_FANOUT_WORKERS, thread_name_prefix='shard-fanout')
+
+def list_etag(version):
+    """Strong ETag (unquoted) for the todo list at a data version"""
+    return f'v{version}'
 
 def init_db():
     """Initialize database"""
     with get_db() as conn:
+        create_todos_schema(conn)
+        # Catalog of lists; their todos live in the shard files
         conn.execute('''
-            CREATE TABLE IF NOT EXISTS todos (
+            CREATE TABLE IF NOT EXISTS lists (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                completed BOOLEAN NOT NULL DEFAULT FALSE,
+                name TEXT NOT NULL,
                 created_at TEXT NOT NULL
             )
         ''')
+        # Persisted so ETags stay unique across restarts
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+
+        # Change log behind GET /api/todos/changes. The triggers record every
+        # insert, update and delete under the version the surrounding write
+        # transaction is about to get from write_db().
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                version INTEGER NOT NULL,
+                todo_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                changed_at INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_changes_version ON changes (version)')
+        for event, op, row in (('INSERT', 'insert', 'NEW'),
+                               ('UPDATE', 'update', 'NEW'),
+                               ('DELETE', 'delete', 'OLD')):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS todos_changes_{op}
+                AFTER {event} ON todos
+                BEGIN
+                    INSERT INTO changes (version, todo_id, op, changed_at)
+                    VALUES ((SELECT value + 1 FROM meta WHERE key = 'data_version'),
+                            {row}.id, '{op}', CAST(strftime('%s', 'now') AS INTEGER));
+                END
+            ''')
+        # Databases that predate the change log have no history before now
+        conn.execute('''
+            INSERT OR IGNORE INTO meta (key, value)
+            SELECT 'changes_floor', value FROM meta WHERE key = 'data_version'
+        ''')
         conn.commit()
 
-@app.route('/api/todos', methods=['GET'])
-def get_todos():
-    """Get all todos"""
+        version = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+
+    publish_data_version(version)
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    init_search()
+
+def init_search():
+    """Create the FTS5 index over todos.title and the triggers that keep it in sync"""
+    global search_enabled
+
     with get_db() as conn:
-        todos = conn.execute('SELECT * FROM todos ORDER BY created_at DESC').fetchall()
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todos_fts'"
+        ).fetchone()
+
+        try:
+            # External content: the index stores only tokens, titles stay in todos
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+                    title,
+                    content='todos',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"⚠️  Full-text search disabled: {e}")
+            search_enabled = False
+            return
+
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos
+            BEGIN
+                INSERT INTO todos_fts (rowid, title) VALUES (NEW.id, NEW.title);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos
+            BEGIN
+                INSERT INTO todos_fts (todos_fts, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title ON todos
+            BEGIN
+                INSERT INTO todos_fts (todos_fts, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+                INSERT INTO todos_fts (rowid, title) VALUES (NEW.id, NEW.title);
+            END
+        ''')
+        conn.commit()
+
+    search_enabled = True
+
+    # Todos written before the index existed
+    if not exists:
+        rebuild_search()
+
+def rebuild_search():
+    """Rebuild the full-text index from the todos table and merge its segments"""
+    with get_db() as conn:
+        conn.execute("INSERT INTO todos_fts (todos_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO todos_fts (todos_fts) VALUES ('optimize')")
+
+def build_match_query(q):
+    """Turn user input into a safe FTS5 query.
+
+    Every word must match; a trailing * makes a word a prefix match.
+    Returns None if there is nothing to search for.
+    """
+    terms = []
+    for word, star in re.findall(r'(\w+)(\*?)', q):
+        terms.append(f'"{word}"' + star)
+    return ' '.join(terms) or None
 
-    return jsonify([{
+def todo_to_dict(todo):
+    """Convert a todos row to its JSON shape"""
+    return {
         'id': todo['id'],
         'title': todo['title'],
         'completed': bool(todo['completed']),
         'created_at': todo['created_at']
-    } for todo in todos])
+    }
+
+def encode_cursor(created_at, todo_id):
+    """Opaque keyset cursor pointing just after the given row"""
+    raw = f"{created_at}|{todo_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Turn a cursor back into (created_at, id); raises ValueError if malformed"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, todo_id = base64.urlsafe_b64decode(padded).decode().rsplit('|', 1)
+    return created_at, int(todo_id)
+
+def parse_limit(value):
+    """Parse a ?limit= page size capped at MAX_PAGE_SIZE; raises ValueError with the error message"""
+    if value is None:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+def list_todos_query(after=None, limit=None, columns='id, title, completed, created_at'):
+    """Build the keyset-paginated list query"""
+    sql = f'SELECT {columns} FROM todos'
+    params = []
+
+    if after is not None:
+        sql += ' WHERE (created_at, id) < (?, ?)'
+        params.extend(after)
+
+    sql += ' ORDER BY created_at DESC, id DESC'
+
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+
+    return sql, params
+
+def dump_todos(todos):
+    """Encode todo dicts the same way SQLite's json_object() does"""
+    return json.dumps(todos, separators=(',', ':'), ensure_ascii=False)
+
+def render_todo_list(conn, after=None, limit=None, serializer='python'):
+    """Run the list query and return (JSON body, next cursor or None)
+
+    serializer='python' builds a dict per row and encodes it here.
+    serializer='sql' lets SQLite encode each row, so Python only joins
+    ready-made JSON strings, in the order the query returned them.
+    """
+    if serializer == 'sql':
+        sql, params = list_todos_query(after, limit, columns=f'created_at, id, {TODO_JSON_SQL}')
+        cursor = conn.cursor()
+        cursor.row_factory = None  # plain tuples, no sqlite3.Row per row
+        rows = cursor.execute(sql, params).fetchall()
+        body = '[' + ','.join(row[2] for row in rows) + ']'
+        keys = [row[:2] for row in rows[-1:]]
+    else:
+        sql, params = list_todos_query(after, limit)
+        rows = conn.execute(sql, params).fetchall()
+        body = dump_todos([todo_to_dict(row) for row in rows])
+        keys = [(row['created_at'], row['id']) for row in rows[-1:]]
+
+    next_cursor = None
+    if limit is not None and len(rows) == limit:
+        next_cursor = encode_cursor(*keys[0])
+    return body, next_cursor
+
+def iter_todo_chunks(conn, after=None, limit=None, serializer='python'):
+    """Yield the list as comma-joined JSON objects, STREAM_BATCH_SIZE rows at a time"""
+    cursor = conn.cursor()
+    if serializer == 'sql':
+        sql, params = list_todos_query(after, limit, columns=TODO_JSON_SQL)
+        cursor.row_factory = None
+        encode = lambda rows: ','.join(row[0] for row in rows)
+    else:
+        sql, params = list_todos_query(after, limit)
+        encode = lambda rows: dump_todos([todo_to_dict(row) for row in rows])[1:-1]
+
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+        if not rows:
+            break
+        yield encode(rows)
+
+def stream_todos(after=None, limit=None, serializer='python'):
+    """Yield the todo list as a JSON array, batch by batch off the cursor"""
+    yield '['
+    first = True
+
+    with get_db() as conn:
+        for chunk in iter_todo_chunks(conn, after, limit, serializer):
+            yield chunk if first else ',' + chunk
+            first = False
+
+    yield ']'
+
+@app.route('/api/todos', methods=['GET'])
+def get_todos():
+    """Get todos, newest first
+
+    Optional query parameters:
+      limit      - page size (capped at MAX_PAGE_SIZE)
+      after      - cursor from the previous page's X-Next-Cursor header
+      stream     - write the array out as rows are read instead of buffering it
+      serializer - 'python' or 'sql' (defaults to LIST_SERIALIZER)
+    """
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    stream = request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+    serializer = request.args.get('serializer', LIST_SERIALIZER)
+
+    if serializer not in ('python', 'sql'):
+        return jsonify({'error': "serializer must be 'python' or 'sql'"}), 400
+
+    try:
+        limit = parse_limit(limit)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    if after:
+        try:
+            after = decode_cursor(after)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+    else:
+        after = None
+
+    # Read the version before the rows, so a body is never labelled
+    # with a version newer than the data it was built from
+    version = refresh_data_version()
+    etag = list_etag(version)
+
+    if request.if_none_match.contains(etag):
+        list_cache_stats['not_modified'] += 1
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    if stream:
+        response = Response(stream_todos(after, limit, serializer), mimetype='application/json')
+    else:
+        key = (version, limit, after, serializer)
+
+        with data_version_lock:
+            cached = list_cache.get(key)
+            if cached is not None:
+                list_cache.move_to_end(key)
+
+        if cached is not None:
+            list_cache_stats['hits'] += 1
+            body, next_cursor = cached
+        else:
+            list_cache_stats['misses'] += 1
+
+            with get_db() as conn:
+                body, next_cursor = render_todo_list(conn, after, limit, serializer)
+
+            with data_version_lock:
+                if version == data_version:
+                    list_cache[key] = (body, next_cursor)
+                    if len(list_cache) > LIST_CACHE_SIZE:
+                        list_cache.popitem(last=False)
+
+        response = Response(body, mimetype='application/json')
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/todos', methods=['POST'])
+@busy_retry
 def create_todo():
     """Create new todo"""
     data = request.get_json()
@@ -56,23 +598,27 @@ def create_todo():
 
     created_at = datetime.utcnow().isoformat()
 
-    with get_db() as conn:
-        cursor = conn.execute(
-            'INSERT INTO todos (title, completed, created_at) VALUES (?, ?, ?)',
-            (title, False, created_at)
-        )
-        todo_id = cursor.lastrowid
+    sql = 'INSERT INTO todos (title, completed, created_at) VALUES (?, ?, ?)'
+    params = (title, False, created_at)
 
-        todo = {
-            'id': todo_id,
-            'title': title,
-            'completed': False,
-            'created_at': created_at
-        }
+    if writer:
+        # Committed together with other queued inserts by the writer thread
+        todo_id = writer.write(sql, params, timeout=POOL_TIMEOUT)
+    else:
+        with write_db() as conn:
+            todo_id = conn.execute(sql, params).lastrowid
+
+    todo = {
+        'id': todo_id,
+        'title': title,
+        'completed': False,
+        'created_at': created_at
+    }
 
     return jsonify(todo), 201
 
 @app.route('/api/todos/<int:todo_id>', methods=['PUT'])
+@busy_retry
 def update_todo(todo_id):
     """Update todo"""
     data = request.get_json()
@@ -86,7 +632,7 @@ def update_todo(todo_id):
     if not title:
         return jsonify({'error': 'Title cannot be empty'}), 400
 
-    with get_db() as conn:
+    with write_db() as conn:
         cursor = conn.execute(
             'UPDATE todos SET title = ?, completed = ? WHERE id = ?',
             (title, completed, todo_id)
@@ -105,9 +651,10 @@ def update_todo(todo_id):
     return jsonify(todo)
 
 @app.route('/api/todos/<int:todo_id>', methods=['DELETE'])
+@busy_retry
 def delete_todo(todo_id):
     """Delete todo"""
-    with get_db() as conn:
+    with write_db() as conn:
         cursor = conn.execute('DELETE FROM todos WHERE id = ?', (todo_id,))
 
         if cursor.rowcount == 0:
@@ -116,9 +663,10 @@ def delete_todo(todo_id):
     return '', 204
 
 @app.route('/api/todos/<int:todo_id>/toggle', methods=['PUT'])
+@busy_retry
 def toggle_todo(todo_id):
     """Toggle todo completion status"""
-    with get_db() as conn:
+    with write_db() as conn:
         # First get current status
         current = conn.execute('SELECT completed FROM todos WHERE id = ?', (todo_id,)).fetchone()
 
@@ -132,27 +680,725 @@ def toggle_todo(todo_id):
     return '', 204
 
 @app.route('/api/todos/completed/clear', methods=['DELETE'])
+@busy_retry
 def clear_completed():
-    """Clear all completed todos"""
+    """Clear all completed todos
+
+    Deletes CLEAR_BATCH_SIZE rows per transaction and pauses between
+    batches, so other writers are never stalled behind one huge DELETE.
+    """
+    while True:
+        with write_db() as conn:
+            deleted = conn.execute('''
+                DELETE FROM todos WHERE id IN (
+                    SELECT id FROM todos WHERE completed = 1 LIMIT ?
+                )
+            ''', (CLEAR_BATCH_SIZE,)).rowcount
+
+        if deleted < CLEAR_BATCH_SIZE:
+            break
+        time.sleep(CLEAR_BATCH_PAUSE_MS / 1000)
+
+    return '', 204
+
+def get_changes_since(since):
+    """Return (version, changes) for everything after `since`.
+
+    Several changes to the same todo collapse into one entry carrying its
+    current state. Returns None if `since` predates the retained log.
+    """
+    with get_db() as conn:
+        # One read transaction, so the version and the rows come from the same snapshot
+        conn.execute('BEGIN')
+        meta = dict(conn.execute('SELECT key, value FROM meta').fetchall())
+
+        if since < meta.get('changes_floor', 0):
+            return None
+
+        rows = conn.execute('''
+            SELECT c.todo_id, MAX(c.version) AS version, MAX(c.op = 'insert') AS inserted,
+                   t.id, t.title, t.completed, t.created_at
+            FROM changes c
+            LEFT JOIN todos t ON t.id = c.todo_id
+            WHERE c.version > ?
+            GROUP BY c.todo_id
+            ORDER BY version, c.todo_id
+        ''', (since,)).fetchall()
+
+    changes = []
+    for row in rows:
+        if row['id'] is None:
+            changes.append({'op': 'delete', 'id': row['todo_id'], 'version': row['version']})
+        else:
+            changes.append({
+                'op': 'insert' if row['inserted'] else 'update',
+                'id': row['todo_id'],
+                'version': row['version'],
+                'todo': todo_to_dict(row)
+            })
+
+    return meta['data_version'], changes
+
+def parse_since(value):
+    """Parse a ?since= version; returns None if it is not a non-negative integer"""
+    try:
+        since = int(value)
+    except (TypeError, ValueError):
+        return None
+    return since if since >= 0 else None
+
+@app.route('/api/todos/changes', methods=['GET'])
+def get_changes():
+    """Get inserts, updates and deletes after ?since=<version>"""
+    since = parse_since(request.args.get('since'))
+    if since is None:
+        return jsonify({'error': 'since must be a non-negative integer'}), 400
+
+    if since == refresh_data_version():
+        return jsonify({'version': since, 'changes': []})
+
+    result = get_changes_since(since)
+    if result is None:
+        return jsonify({'error': 'since is older than the change log, refetch the full list'}), 410
+
+    version, changes = result
+    return jsonify({'version': version, 'changes': changes})
+
+@app.route('/api/todos/changes/stream', methods=['GET'])
+def stream_changes():
+    """Push changes as server-sent events, starting after ?since=<version>
+
+    Reconnecting clients can send Last-Event-ID instead of since. A stream
+    ends after SSE_MAX_SECONDS, or on shutdown, and the browser reconnects.
+    """
+    since = parse_since(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    if since is None:
+        return jsonify({'error': 'since must be a non-negative integer'}), 400
+
+    def events(since):
+        # Sent right away so the headers go out before the first change
+        yield 'retry: 3000\n\n'
+        last_sent = time.monotonic()
+        deadline = last_sent + SSE_MAX_SECONDS
+
+        while time.monotonic() < deadline and not streams_closing.is_set():
+            # Local writes wake us right away; other processes' writes are
+            # picked up by polling SQLite every SSE_POLL_SECONDS
+            with data_version_lock:
+                if data_version == since:
+                    data_version_changed.wait(SSE_POLL_SECONDS)
+            current = refresh_data_version()
+
+            if current == since:
+                if time.monotonic() - last_sent >= SSE_HEARTBEAT_SECONDS:
+                    last_sent = time.monotonic()
+                    yield ': heartbeat\n\n'
+                continue
+
+            result = get_changes_since(since)
+            if result is None:
+                yield 'event: reset\ndata: {}\n\n'
+                return
+
+            since, changes = result
+            payload = json.dumps({'version': since, 'changes': changes})
+            last_sent = time.monotonic()
+            yield f'id: {since}\nevent: changes\ndata: {payload}\n\n'
+
+    response = Response(events(since), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/todos/search', methods=['GET'])
+def search_todos():
+    """Search todo titles, best bm25 match first
+
+    Query parameters:
+      q      - words to search for; end a word with * for a prefix match
+      limit  - page size (capped at MAX_PAGE_SIZE)
+      offset - from the previous page's X-Next-Offset header
+    """
+    if not search_enabled:
+        return jsonify({'error': 'Full-text search is not available'}), 501
+
+    query = build_match_query(request.args.get('q', ''))
+    if query is None:
+        return jsonify({'error': 'q is required'}), 400
+
+    try:
+        limit = min(int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)), MAX_PAGE_SIZE)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    if limit < 1 or offset < 0:
+        return jsonify({'error': 'limit must be positive and offset not negative'}), 400
+
+    with get_db() as conn:
+        todos = conn.execute('''
+            SELECT t.id, t.title, t.completed, t.created_at
+            FROM todos_fts
+            JOIN todos t ON t.id = todos_fts.rowid
+            WHERE todos_fts MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+        ''', (query, limit, offset)).fetchall()
+
+    response = jsonify([todo_to_dict(todo) for todo in todos])
+    if len(todos) == limit:
+        response.headers['X-Next-Offset'] = str(offset + limit)
+    return response
+
+def validate_bulk_operation(op):
+    """Return an error message for a malformed bulk operation, or None"""
+    if not isinstance(op, dict):
+        return 'Operation must be an object'
+
+    kind = op.get('op')
+    if kind not in BULK_SQL:
+        return 'op must be one of: create, update, delete, toggle'
+
+    if kind in ('create', 'update'):
+        title = op.get('title')
+        if not isinstance(title, str):
+            return 'Title is required'
+        if not title.strip():
+            return 'Title cannot be empty'
+
+    if kind != 'create':
+        todo_id = op.get('id')
+        if not isinstance(todo_id, int) or isinstance(todo_id, bool):
+            return 'id must be an integer'
+
+    return None
+
+@app.route('/api/todos/bulk', methods=['POST'])
+@busy_retry
+def bulk_todos():
+    """Apply many create/update/delete/toggle operations in one transaction
+
+    Body: {"operations": [{"op": "create", "title": "..."},
+                          {"op": "update", "id": 1, "title": "...", "completed": true},
+                          {"op": "delete", "id": 2},
+                          {"op": "toggle", "id": 3}],
+           "atomic": false}
+
+    Failed items are reported in the results and skipped. With "atomic": true,
+    any failure rolls back the whole batch.
+    """
+    data = request.get_json()
+
+    if not isinstance(data, dict) or not isinstance(data.get('operations'), list):
+        return jsonify({'error': 'operations list is required'}), 400
+
+    operations = data['operations']
+    atomic = bool(data.get('atomic', False))
+
+    if len(operations) > BULK_MAX_OPERATIONS:
+        return jsonify({'error': f'At most {BULK_MAX_OPERATIONS} operations per batch'}), 400
+
+    errors = [validate_bulk_operation(op) for op in operations]
+    ids = list({op['id'] for op, error in zip(operations, errors)
+                if error is None and op['op'] != 'create'})
+    created_at = datetime.utcnow().isoformat()
+    results = []
+
+    # write_db() takes the write lock up front, so the rows we check can't change under us
+    with write_db() as conn:
+        # Current state of every referenced todo; None once deleted in this batch
+        state = {}
+        if ids:
+            placeholders = ','.join('?' * len(ids))
+            rows = conn.execute(
+                f'SELECT id, title, completed, created_at FROM todos WHERE id IN ({placeholders})',
+                ids
+            ).fetchall()
+            state = {row['id']: todo_to_dict(row) for row in rows}
+
+        # Walk the operations in order, working out each outcome up front.
+        # Consecutive operations of the same kind share one executemany call.
+        runs = []
+        for index, (op, error) in enumerate(zip(operations, errors)):
+            if error:
+                results.append({'index': index, 'status': 400, 'error': error})
+                continue
+
+            kind = op['op']
+
+            if kind == 'create':
+                todo = {
+                    'id': None,
+                    'title': op['title'].strip(),
+                    'completed': False,
+                    'created_at': created_at
+                }
+                params = (todo['title'], False, created_at)
+                result = {'index': index, 'op': kind, 'status': 201, 'todo': todo}
+            else:
+                current = state.get(op['id'])
+                if current is None:
+                    results.append({'index': index, 'op': kind, 'status': 404,
+                                    'error': 'Todo not found'})
+                    continue
+
+                if kind == 'update':
+                    todo = {**current, 'title': op['title'].strip(),
+                            'completed': bool(op.get('completed', False))}
+                    params = (todo['title'], todo['completed'], todo['id'])
+                    result = {'index': index, 'op': kind, 'status': 200, 'todo': todo}
+                elif kind == 'toggle':
+                    todo = {**current, 'completed': not current['completed']}
+                    params = (todo['completed'], todo['id'])
+                    result = {'index': index, 'op': kind, 'status': 200, 'todo': todo}
+                else:
+                    todo = None
+                    params = (op['id'],)
+                    result = {'index': index, 'op': kind, 'status': 204, 'id': op['id']}
+
+                state[op['id']] = todo
+
+            results.append(result)
+            if runs and runs[-1][0] == kind:
+                runs[-1][1].append(params)
+                runs[-1][2].append(todo)
+            else:
+                runs.append((kind, [params], [todo]))
+
+        failed = sum(1 for result in results if result['status'] >= 400)
+
+        if atomic and failed:
+            conn.rollback()
+            return jsonify({
+                'error': 'Batch aborted, no operations were applied',
+                'atomic': True,
+                'succeeded': 0,
+                'failed': failed,
+                'results': results
+            }), 400
+
+        for kind, params, todos in runs:
+            conn.executemany(BULK_SQL[kind], params)
+
+            if kind == 'create':
+                # We hold the write lock, so AUTOINCREMENT handed out consecutive ids
+                last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+                first_id = last_id - len(todos) + 1
+                for offset, todo in enumerate(todos):
+                    todo['id'] = first_id + offset
+
+    return jsonify({
+        'atomic': atomic,
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'results': results
+    })
+
+def get_list(list_id):
+    """Catalog row for a list, or None"""
     with get_db() as conn:
-        conn.execute('DELETE FROM todos WHERE completed = ?', (True,))
+        return conn.execute(
+            'SELECT id, name, created_at FROM lists WHERE id = ?', (list_id,)
+        ).fetchone()
+
+def list_to_dict(row):
+    """Convert a lists row to its JSON shape"""
+    return {'id': row['id'], 'name': row['name'], 'created_at': row['created_at']}
+
+@contextmanager
+def shard_write(list_id):
+    """Write transaction on one list's shard; only that shard's lock is taken"""
+    with shards.connection(list_id) as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        yield conn
+
+def encode_fanout_cursor(created_at, list_id, todo_id):
+    """Opaque cursor for the cross-list listing"""
+    raw = f"{created_at}|{list_id}|{todo_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_fanout_cursor(cursor):
+    """Turn a cross-list cursor back into (created_at, list_id, id)"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, list_id, todo_id = base64.urlsafe_b64decode(padded).decode().rsplit('|', 2)
+    return created_at, int(list_id), int(todo_id)
+
+def shard_after(list_id, cursor):
+    """Turn a cross-list cursor into one shard's (created_at, id) keyset bound.
+
+    The merged order is (created_at, list_id, id), newest first. On a
+    created_at tie, lists with a smaller id than the cursor's come later
+    in the order (every row at that time is still to come) and lists with
+    a larger id came earlier (none are).
+    """
+    if cursor is None:
+        return None
+
+    created_at, cursor_list, todo_id = cursor
+    if list_id == cursor_list:
+        return created_at, todo_id
+    return created_at, sys.maxsize if list_id < cursor_list else 0
+
+def fetch_list_page(list_id, after, limit):
+    """One list's newest todos after a keyset bound, tagged with list_id"""
+    sql, params = list_todos_query(after, limit)
+    with shards.connection(list_id) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [{**todo_to_dict(row), 'list_id': list_id} for row in rows]
+
+@app.route('/api/lists', methods=['GET'])
+def get_lists():
+    """Get all lists"""
+    with get_db() as conn:
+        rows = conn.execute('SELECT id, name, created_at FROM lists ORDER BY id').fetchall()
+
+    return jsonify([list_to_dict(row) for row in rows])
+
+@app.route('/api/lists', methods=['POST'])
+@busy_retry
+def create_list():
+    """Create a list; its todos get a shard database of their own"""
+    data = request.get_json()
+
+    if not data or 'name' not in data:
+        return jsonify({'error': 'Name is required'}), 400
+
+    name = data['name'].strip()
+    if not name:
+        return jsonify({'error': 'Name cannot be empty'}), 400
+
+    created_at = datetime.utcnow().isoformat()
+
+    with get_db() as conn:
+        list_id = conn.execute(
+            'INSERT INTO lists (name, created_at) VALUES (?, ?)', (name, created_at)
+        ).lastrowid
+
+    # Create the shard file now instead of on its first request
+    shards.pool(list_id)
+
+    return jsonify({'id': list_id, 'name': name, 'created_at': created_at}), 201
+
+@app.route('/api/lists/<int:list_id>', methods=['DELETE'])
+@busy_retry
+def delete_list(list_id):
+    """Delete a list together with its shard database"""
+    with get_db() as conn:
+        cursor = conn.execute('DELETE FROM lists WHERE id = ?', (list_id,))
+
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'List not found'}), 404
+
+    # AUTOINCREMENT never hands out this id again, so the file can't be reattached
+    shards.discard(list_id)
+
+    return '', 204
+
+@app.route('/api/lists/todos', methods=['GET'])
+def get_all_list_todos():
+    """Get todos across lists, newest first
+
+    Every list's shard is queried in parallel for its own newest `limit`
+    rows after the cursor, and the pages are merged.
+
+    Optional query parameters:
+      lists - comma-separated list ids (default: every list)
+      limit - page size (capped at MAX_PAGE_SIZE)
+      after - cursor from the previous page's X-Next-Cursor header
+    """
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    cursor = request.args.get('after')
+    if cursor:
+        try:
+            cursor = decode_fanout_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+    else:
+        cursor = None
+
+    with get_db() as conn:
+        list_ids = [row['id'] for row in conn.execute('SELECT id FROM lists ORDER BY id')]
+
+    if request.args.get('lists'):
+        try:
+            wanted = {int(value) for value in request.args['lists'].split(',')}
+        except ValueError:
+            return jsonify({'error': 'lists must be comma-separated integers'}), 400
+        if wanted - set(list_ids):
+            return jsonify({'error': 'List not found'}), 404
+        list_ids = [list_id for list_id in list_ids if list_id in wanted]
+
+    pages = fanout.map(
+        lambda list_id: fetch_list_page(list_id, shard_after(list_id, cursor), limit),
+        list_ids
+    )
+    merged = heapq.merge(
+        *pages, key=lambda todo: (todo['created_at'], todo['list_id'], todo['id']), reverse=True
+    )
+    todos = list(merged) if limit is None else [todo for _, todo in zip(range(limit), merged)]
+
+    response = jsonify(todos)
+    if limit is not None and len(todos) == limit:
+        last = todos[-1]
+        response.headers['X-Next-Cursor'] = encode_fanout_cursor(
+            last['created_at'], last['list_id'], last['id']
+        )
+    return response
+
+@app.route('/api/lists/<int:list_id>/todos', methods=['GET'])
+def get_list_todos(list_id):
+    """Get one list's todos, newest first (same parameters as GET /api/todos)"""
+    if get_list(list_id) is None:
+        return jsonify({'error': 'List not found'}), 404
+
+    serializer = request.args.get('serializer', LIST_SERIALIZER)
+    if serializer not in ('python', 'sql'):
+        return jsonify({'error': "serializer must be 'python' or 'sql'"}), 400
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    after = request.args.get('after')
+    if after:
+        try:
+            after = decode_cursor(after)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+    else:
+        after = None
+
+    with shards.connection(list_id) as conn:
+        body, next_cursor = render_todo_list(conn, after, limit, serializer)
+
+    response = Response(body, mimetype='application/json')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@app.route('/api/lists/<int:list_id>/todos', methods=['POST'])
+@busy_retry
+def create_list_todo(list_id):
+    """Create a todo in a list"""
+    if get_list(list_id) is None:
+        return jsonify({'error': 'List not found'}), 404
+
+    data = request.get_json()
+
+    if not data or 'title' not in data:
+        return jsonify({'error': 'Title is required'}), 400
+
+    title = data['title'].strip()
+    if not title:
+        return jsonify({'error': 'Title cannot be empty'}), 400
+
+    created_at = datetime.utcnow().isoformat()
+
+    with shard_write(list_id) as conn:
+        todo_id = conn.execute(
+            'INSERT INTO todos (title, completed, created_at) VALUES (?, ?, ?)',
+            (title, False, created_at)
+        ).lastrowid
+
+    todo = {
+        'id': todo_id,
+        'title': title,
+        'completed': False,
+        'created_at': created_at
+    }
+
+    return jsonify(todo), 201
+
+@app.route('/api/lists/<int:list_id>/todos/<int:todo_id>', methods=['PUT'])
+@busy_retry
+def update_list_todo(list_id, todo_id):
+    """Update a todo in a list"""
+    if get_list(list_id) is None:
+        return jsonify({'error': 'List not found'}), 404
+
+    data = request.get_json()
+
+    if not data or 'title' not in data:
+        return jsonify({'error': 'Title is required'}), 400
+
+    title = data['title'].strip()
+    completed = data.get('completed', False)
+
+    if not title:
+        return jsonify({'error': 'Title cannot be empty'}), 400
+
+    with shard_write(list_id) as conn:
+        row = conn.execute(
+            'UPDATE todos SET title = ?, completed = ? WHERE id = ? '
+            'RETURNING id, title, completed, created_at',
+            (title, completed, todo_id)
+        ).fetchone()
+
+        if row is None:
+            return jsonify({'error': 'Todo not found'}), 404
+
+    return jsonify(todo_to_dict(row))
+
+@app.route('/api/lists/<int:list_id>/todos/<int:todo_id>', methods=['DELETE'])
+@busy_retry
+def delete_list_todo(list_id, todo_id):
+    """Delete a todo from a list"""
+    if get_list(list_id) is None:
+        return jsonify({'error': 'List not found'}), 404
+
+    with shard_write(list_id) as conn:
+        cursor = conn.execute('DELETE FROM todos WHERE id = ?', (todo_id,))
+
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Todo not found'}), 404
+
+    return '', 204
+
+@app.route('/api/lists/<int:list_id>/todos/<int:todo_id>/toggle', methods=['PUT'])
+@busy_retry
+def toggle_list_todo(list_id, todo_id):
+    """Toggle completion status of a todo in a list"""
+    if get_list(list_id) is None:
+        return jsonify({'error': 'List not found'}), 404
+
+    with shard_write(list_id) as conn:
+        row = conn.execute(
+            'UPDATE todos SET completed = NOT completed WHERE id = ? RETURNING id',
+            (todo_id,)
+        ).fetchone()
+
+        if row is None:
+            return jsonify({'error': 'Todo not found'}), 404
 
     return '', 204
 
+@app.route('/api/lists/<int:list_id>/todos/completed/clear', methods=['DELETE'])
+@busy_retry
+def clear_list_completed(list_id):
+    """Clear a list's completed todos, in batches like clear_completed()"""
+    if get_list(list_id) is None:
+        return jsonify({'error': 'List not found'}), 404
+
+    while True:
+        with shard_write(list_id) as conn:
+            deleted = conn.execute('''
+                DELETE FROM todos WHERE id IN (
+                    SELECT id FROM todos WHERE completed = 1 LIMIT ?
+                )
+            ''', (CLEAR_BATCH_SIZE,)).rowcount
+
+        if deleted < CLEAR_BATCH_SIZE:
+            break
+        time.sleep(CLEAR_BATCH_PAUSE_MS / 1000)
+
+    return '', 204
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get connection pool, list cache, write coalescer and maintenance stats
+
+    Counters are per worker process; pid tells the workers apart.
+    """
+    return jsonify({
+        'pid': os.getpid(),
+        'pool': pool.stats(),
+        'busy_retry': busy_retry.stats(),
+        'commit_watch': commit_watch.stats(),
+        'shards': shards.stats(),
+        'writer': writer.stats() if writer else None,
+        'maintenance': {**maintenance.stats(), **maintenance_stats},
+        'list_cache': {
+            'data_version': data_version,
+            'entries': len(list_cache),
+            'size': LIST_CACHE_SIZE,
+            **list_cache_stats
+        }
+    })
+
+@app.errorhandler(PoolTimeout)
+def handle_pool_timeout(error):
+    """All pooled connections stayed busy for too long"""
+    return jsonify({'error': str(error)}), 503
+
+@app.errorhandler(WriteQueueFull)
+def handle_write_queue_full(error):
+    """The write coalescer is not keeping up (also covers WriteTimeout)"""
+    return jsonify({'error': str(error)}), 503
+
+@app.errorhandler(DatabaseBusy)
+def handle_database_busy(error):
+    """Other processes kept the write lock through every retry"""
+    return jsonify({'error': str(error)}), 503, {'Retry-After': '1'}
+
+def close_streams():
+    """End open change streams; only sets an Event, so it is safe in a signal handler"""
+    streams_closing.set()
+
+def shutdown():
+    """Flush queued writes, stop background maintenance and close connections"""
+    close_streams()
+    if writer:
+        writer.close()
+    maintenance.stop()
+    fanout.shutdown(wait=False)
+    shards.close()
+    commit_watch.close()
+    pool.close()
+
 @app.route('/')
 def serve_index():
     """Serve the main HTML page"""
     return app.send_static_file('index.html')
 
+# Also runs when a WSGI server (flask run, gunicorn) imports the app, so every
+# process starts with the schema in place and the current data version loaded
+init_db()
+
 if __name__ == '__main__':
-    init_db()
+    if sys.argv[1:] == ['maintenance']:
+        print("🧹 Running database maintenance...")
+        maintenance.run_once()
+        print(f"✅ Done: {maintenance_stats}")
+        sys.exit(0)
+
+    if sys.argv[1:] == ['vacuum']:
+        # A full VACUUM rewrites the file; needed once to switch an existing
+        # database to incremental auto_vacuum
+        print("🧹 Vacuuming database (this blocks writers until it finishes)...")
+        with get_db() as conn:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        print("✅ Database vacuumed")
+        sys.exit(0)
+
+    if sys.argv[1:] == ['rebuild-search']:
+        if not search_enabled:
+            sys.exit(1)
+        print("🔎 Rebuilding full-text search index...")
+        rebuild_search()
+        print("✅ Search index rebuilt")
+        sys.exit(0)
+
     print("🚀 Python Todo API server running on http://localhost:8080")
     print("🌐 Frontend available at: http://localhost:8080")
     print("📊 API endpoints:")
-    print("  GET    /api/todos              - Get all todos")
+    print("  GET    /api/todos              - Get all todos (?limit=&after=&stream=1&serializer=sql)")
     print("  POST   /api/todos              - Create new todo")
     print("  PUT    /api/todos/{id}         - Update todo")
     print("  DELETE /api/todos/{id}         - Delete todo")
     print("  PUT    /api/todos/{id}/toggle  - Toggle todo completion")
     print("  DELETE /api/todos/completed/clear - Clear completed todos")
+    print("  GET    /api/todos/changes?since={version} - Changes after a version")
+    print("  GET    /api/todos/changes/stream - Changes as server-sent events")
+    print("  GET    /api/todos/search?q=    - Full-text search over titles")
+    print("  POST   /api/todos/bulk         - Apply many operations in one transaction")
+    print("  GET    /api/lists              - Get all lists")
+    print("  POST   /api/lists              - Create a list (its todos get their own database file)")
+    print("  GET    /api/lists/todos        - Todos across lists, merged newest first")
+    print("  *      /api/lists/{id}/todos/... - Same todo endpoints, scoped to one list")
+    print("  GET    /api/stats              - Pool, cache, writer and maintenance stats")
     app.run(host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
@@ -0,0 +1,20 @@
+#!/bin/bash
+
+echo "🚀 Starting Python Todo API Backend (production)..."
+echo "📍 Server will run on: http://${TODO_BIND:-0.0.0.0:8080}"
+echo "⚙️  Workers: ${TODO_WORKERS:-one per CPU core}, threads per worker: ${TODO_THREADS:-4}"
+echo ""
+
+# Check if Python is installed
+if ! command -v python3 &> /dev/null; then
+    echo "❌ Python3 is not installed. Please install Python3 first."
+    exit 1
+fi
+
+# Install dependencies
+echo "📦 Installing Python dependencies..."
+pip3 install -r requirements.txt
+
+# Run the server (settings come from gunicorn.conf.py)
+echo "🔥 Starting server..."
+exec python3 -m gunicorn main:app
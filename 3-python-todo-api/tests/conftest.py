@@ -0,0 +1,18 @@
+"""Run main.py against a throwaway database, imported the way the server imports it"""
+
+import os
+import tempfile
+
+import pytest
+
+# main.py opens its database on import
+os.environ['TODO_DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='todo-tests-'), 'todos.db')
+
+import main  # noqa: E402
+
+@pytest.fixture
+def client():
+    # Through write_db(), so the data version moves on and cached lists are dropped
+    with main.write_db() as conn:
+        conn.execute('DELETE FROM todos')
+    return main.app.test_client()
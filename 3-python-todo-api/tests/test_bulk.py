@@ -0,0 +1,71 @@
+import main
+
+def create(client, title):
+    return client.post('/api/todos', json={'title': title}).get_json()
+
+def test_mixed_operations_are_applied_in_order(client):
+    first, second = create(client, 'first'), create(client, 'second')
+
+    response = client.post('/api/todos/bulk', json={'operations': [
+        {'op': 'create', 'title': 'new one'},
+        {'op': 'create', 'title': 'new two'},
+        {'op': 'update', 'id': first['id'], 'title': 'first, edited', 'completed': True},
+        {'op': 'toggle', 'id': second['id']},
+        {'op': 'toggle', 'id': second['id']},
+        {'op': 'delete', 'id': first['id']},
+    ]})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['succeeded'] == 6 and body['failed'] == 0
+    assert [result['status'] for result in body['results']] == [201, 201, 200, 200, 200, 204]
+    # Later operations see the effect of earlier ones in the same batch
+    assert body['results'][4]['todo']['completed'] is False
+
+    todos = {todo['id']: todo for todo in client.get('/api/todos').get_json()}
+    created = [result['todo'] for result in body['results'][:2]]
+    assert [todos[todo['id']]['title'] for todo in created] == ['new one', 'new two']
+    assert first['id'] not in todos
+    assert todos[second['id']]['completed'] is False
+
+def test_failed_operations_are_skipped(client):
+    todo = create(client, 'kept')
+    body = client.post('/api/todos/bulk', json={'operations': [
+        {'op': 'toggle', 'id': todo['id']},
+        {'op': 'delete', 'id': 999999},
+        {'op': 'create', 'title': '  '},
+        {'op': 'explode'},
+    ]}).get_json()
+
+    assert [result['status'] for result in body['results']] == [200, 404, 400, 400]
+    assert body['succeeded'] == 1 and body['failed'] == 3
+    assert client.get('/api/todos').get_json()[0]['completed'] is True
+
+def test_atomic_batch_rolls_back_on_any_failure(client):
+    todo = create(client, 'untouched')
+    version = main.data_version
+
+    response = client.post('/api/todos/bulk', json={'atomic': True, 'operations': [
+        {'op': 'toggle', 'id': todo['id']},
+        {'op': 'create', 'title': 'never created'},
+        {'op': 'delete', 'id': 999999},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['succeeded'] == 0
+
+    todos = client.get('/api/todos').get_json()
+    assert [(t['title'], t['completed']) for t in todos] == [('untouched', False)]
+    assert main.data_version == version
+
+def test_batch_size_is_limited(client, monkeypatch):
+    monkeypatch.setattr(main, 'BULK_MAX_OPERATIONS', 2)
+    response = client.post('/api/todos/bulk', json={'operations': [
+        {'op': 'create', 'title': str(i)} for i in range(3)
+    ]})
+    assert response.status_code == 400
+    assert client.post('/api/todos/bulk', json={}).status_code == 400
+
+def test_body_must_be_an_object(client):
+    for body in ([1, 2], 'operations', 3):
+        response = client.post('/api/todos/bulk', json=body)
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'operations list is required'}
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+import main
+from db import BusyRetry, ConnectionPool, DatabaseBusy, is_busy_error
+
+def test_is_busy_error():
+    assert is_busy_error(sqlite3.OperationalError('database is locked'))
+    assert not is_busy_error(sqlite3.OperationalError('no such table: todos'))
+    assert not is_busy_error(ValueError('database is locked'))
+
+def test_retries_until_the_lock_is_free(tmp_path):
+    path = str(tmp_path / 'busy.db')
+    pool = ConnectionPool(path, size=1, pragmas={'journal_mode': 'WAL', 'busy_timeout': 20})
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE t (x)')
+
+    # Another process holds the write lock for a while
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute('BEGIN IMMEDIATE')
+    threading.Timer(0.05, other.rollback).start()
+
+    retry = BusyRetry(attempts=20, base_delay=0.01, max_delay=0.02)
+
+    @retry
+    def write():
+        with pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT INTO t VALUES (1)')
+
+    write()
+    stats = retry.stats()
+    assert stats['retries'] > 0 and stats['recovered'] == 1 and stats['gave_up'] == 0
+    other.close()
+    pool.close()
+
+def test_gives_up_with_database_busy():
+    retry = BusyRetry(attempts=3, base_delay=0)
+    calls = []
+
+    @retry
+    def always_locked():
+        calls.append(1)
+        raise sqlite3.OperationalError('database is locked')
+
+    with pytest.raises(DatabaseBusy):
+        always_locked()
+    assert len(calls) == 3
+    assert retry.stats()['gave_up'] == 1
+
+def test_other_errors_are_not_retried():
+    retry = BusyRetry(attempts=3, base_delay=0)
+    calls = []
+
+    @retry
+    def broken():
+        calls.append(1)
+        raise sqlite3.OperationalError('no such table: todos')
+
+    with pytest.raises(sqlite3.OperationalError):
+        broken()
+    assert len(calls) == 1
+
+def test_busy_write_answers_503(client, monkeypatch):
+    def locked():
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(main, 'write_db', locked)
+    response = client.post('/api/todos', json={'title': 'blocked'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+def test_writes_from_forked_workers_all_land(client):
+    version = main.data_version
+    # Like gunicorn's pre_fork hook: no SQLite connection crosses fork()
+    main.pool.close()
+    main.commit_watch.close()
+
+    pids = []
+    for worker in range(3):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                for i in range(10):
+                    with main.write_db() as conn:
+                        conn.execute(
+                            'INSERT INTO todos (title, completed, created_at) VALUES (?, 0, ?)',
+                            (f'worker {worker} todo {i}', f'2026-01-01T00:00:{worker}{i}')
+                        )
+            except BaseException:
+                status = 1
+            os._exit(status)
+        pids.append(pid)
+
+    for pid in pids:
+        assert os.waitpid(pid, 0)[1] == 0
+    assert len(client.get('/api/todos').get_json()) == 30
+    assert main.refresh_data_version() == version + 30
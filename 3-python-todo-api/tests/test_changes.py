@@ -0,0 +1,84 @@
+import json
+import threading
+
+import main
+
+def version_of(response):
+    return int(response.headers['ETag'].strip('"v'))
+
+def test_changes_since_a_version_are_merged_per_todo(client):
+    kept = client.post('/api/todos', json={'title': 'kept'}).get_json()
+    gone = client.post('/api/todos', json={'title': 'gone'}).get_json()
+    since = version_of(client.get('/api/todos'))
+
+    new = client.post('/api/todos', json={'title': 'new'}).get_json()
+    client.put(f"/api/todos/{new['id']}", json={'title': 'new, edited'})
+    client.put(f"/api/todos/{kept['id']}/toggle")
+    client.delete(f"/api/todos/{gone['id']}")
+
+    body = client.get(f'/api/todos/changes?since={since}').get_json()
+    assert body['version'] == main.data_version
+    changes = {change['id']: change for change in body['changes']}
+    assert changes[new['id']]['op'] == 'insert'
+    assert changes[new['id']]['todo']['title'] == 'new, edited'
+    assert changes[kept['id']]['op'] == 'update'
+    assert changes[kept['id']]['todo']['completed'] is True
+    assert changes[gone['id']] == {'op': 'delete', 'id': gone['id'], 'version': body['version']}
+    assert [change['version'] for change in body['changes']] == \
+        sorted(change['version'] for change in body['changes'])
+
+def test_no_changes_at_the_current_version(client):
+    client.post('/api/todos', json={'title': 'a'})
+    version = version_of(client.get('/api/todos'))
+    assert client.get(f'/api/todos/changes?since={version}').get_json() == \
+        {'version': version, 'changes': []}
+
+def test_invalid_since_is_rejected(client):
+    assert client.get('/api/todos/changes').status_code == 400
+    assert client.get('/api/todos/changes?since=-1').status_code == 400
+
+def test_since_older_than_the_compacted_log_is_gone(client, monkeypatch):
+    since = version_of(client.get('/api/todos'))
+    client.post('/api/todos', json={'title': 'a'})
+    # Everything is older than a negative retention window
+    monkeypatch.setattr(main, 'CHANGES_RETENTION_SECONDS', -60)
+    assert main.compact_changes() > 0
+
+    assert client.get(f'/api/todos/changes?since={since}').status_code == 410
+    assert client.get(f'/api/todos/changes?since={main.data_version}').status_code == 200
+
+def test_stream_sends_changes_as_events(client):
+    since = version_of(client.get('/api/todos'))
+    todo = client.post('/api/todos', json={'title': 'pushed'}).get_json()
+
+    response = client.get(f'/api/todos/changes/stream?since={since}', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    events = iter(response.response)
+    assert next(events) == b'retry: 3000\n\n'
+    event = next(events).decode()
+    response.close()
+
+    lines = dict(line.split(': ', 1) for line in event.strip().split('\n'))
+    assert lines['id'] == str(main.data_version)
+    assert lines['event'] == 'changes'
+    assert json.loads(lines['data'])['changes'][0]['id'] == todo['id']
+
+def test_stream_ends_after_its_maximum_lifetime(client, monkeypatch):
+    monkeypatch.setattr(main, 'SSE_MAX_SECONDS', 0.2)
+    monkeypatch.setattr(main, 'SSE_POLL_SECONDS', 0.05)
+    since = version_of(client.get('/api/todos'))
+
+    response = client.get(f'/api/todos/changes/stream?since={since}', buffered=False)
+    # Iterating to the end returns, rather than waiting for changes forever
+    assert list(response.response) == [b'retry: 3000\n\n']
+
+def test_stream_ends_on_shutdown(client, monkeypatch):
+    monkeypatch.setattr(main, 'SSE_POLL_SECONDS', 0.05)
+    monkeypatch.setattr(main, 'streams_closing', threading.Event())
+    since = version_of(client.get('/api/todos'))
+
+    response = client.get(f'/api/todos/changes/stream?since={since}', buffered=False)
+    events = iter(response.response)
+    assert next(events) == b'retry: 3000\n\n'
+    threading.Timer(0.1, main.close_streams).start()
+    assert list(events) == []
@@ -0,0 +1,51 @@
+import main
+
+def test_clear_completed_deletes_in_batches(client, monkeypatch):
+    monkeypatch.setattr(main, 'CLEAR_BATCH_SIZE', 2)
+    monkeypatch.setattr(main, 'CLEAR_BATCH_PAUSE_MS', 0)
+    client.post('/api/todos/bulk', json={'operations': [
+        {'op': 'create', 'title': f'todo {i}'} for i in range(7)
+    ]})
+    todos = client.get('/api/todos').get_json()
+    client.post('/api/todos/bulk', json={'operations': [
+        {'op': 'toggle', 'id': todo['id']} for todo in todos[:5]
+    ]})
+    version = main.data_version
+
+    assert client.delete('/api/todos/completed/clear').status_code == 204
+    remaining = client.get('/api/todos').get_json()
+    assert [todo['id'] for todo in remaining] == [todo['id'] for todo in todos[5:]]
+    # One committed version per batch of 2 (3 batches for 5 rows)
+    assert main.data_version == version + 3
+
+def test_clear_with_nothing_completed_does_not_bump_the_version(client):
+    client.post('/api/todos', json={'title': 'open'})
+    version = main.data_version
+    assert client.delete('/api/todos/completed/clear').status_code == 204
+    assert main.data_version == version
+
+def test_completed_rows_are_found_through_the_partial_index(client):
+    with main.get_db() as conn:
+        plan = ' '.join(row[3] for row in conn.execute(
+            'EXPLAIN QUERY PLAN SELECT id FROM todos WHERE completed = 1 LIMIT 10'
+        ))
+    assert 'idx_todos_completed' in plan
+
+def test_maintenance_vacuums_and_analyzes(client):
+    client.post('/api/todos/bulk', json={'operations': [
+        {'op': 'create', 'title': 'x' * 2000} for _ in range(200)
+    ]})
+    client.post('/api/todos/bulk', json={'operations': [
+        {'op': 'toggle', 'id': todo['id']} for todo in client.get('/api/todos').get_json()
+    ]})
+    client.delete('/api/todos/completed/clear')
+    with main.get_db() as conn:
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2  # INCREMENTAL
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0] > 0
+
+    analyzed = main.maintenance_stats['analyzed']
+    main.run_maintenance()
+    with main.get_db() as conn:
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
+    assert main.maintenance_stats['analyzed'] == analyzed + 1
+    assert main.maintenance_stats['pages_vacuumed'] > 0
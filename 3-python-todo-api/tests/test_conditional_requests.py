@@ -0,0 +1,37 @@
+import sqlite3
+
+import main
+
+def test_list_has_an_etag_and_answers_304_from_memory(client):
+    client.post('/api/todos', json={'title': 'Write tests'})
+    response = client.get('/api/todos')
+    etag = response.headers['ETag']
+    assert etag == f'"v{main.data_version}"'
+
+    checkouts = main.pool.stats()['checkouts']
+    for _ in range(3):
+        response = client.get('/api/todos', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+    # Nothing was committed in between: no pooled connection was used
+    assert main.pool.stats()['checkouts'] == checkouts
+
+def test_write_from_another_connection_changes_the_etag(client):
+    etag = client.get('/api/todos').headers['ETag']
+
+    # Another process: its own connection, bumping the version like write_db()
+    other = sqlite3.connect(main.DATABASE)
+    with other:
+        other.execute("INSERT INTO todos (title, completed, created_at) VALUES ('From elsewhere', 0, '2026-01-01T00:00:00')")
+        other.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+    other.close()
+
+    response = client.get('/api/todos', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert [todo['title'] for todo in response.get_json()] == ['From elsewhere']
+
+def test_local_write_changes_the_etag(client):
+    etag = client.get('/api/todos').headers['ETag']
+    client.post('/api/todos', json={'title': 'New'})
+    response = client.get('/api/todos', headers={'If-None-Match': etag})
+    assert response.status_code == 200
@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+from db import ConnectionPool, PoolTimeout
+
+def test_connections_are_tuned_and_reused(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+    for _ in range(10):
+        with pool.connection() as conn:
+            assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+            assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+    stats = pool.stats()
+    assert stats['open'] == 1
+    assert stats['checkouts'] == 10
+    assert stats['in_use'] == 0
+    pool.close()
+
+def test_full_pool_times_out(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()['timeouts'] == 1
+
+    # A connection released by another thread wakes the waiter
+    threading.Timer(0.01, pool.release, (held,)).start()
+    pool.timeout = 5
+    pool.release(pool.acquire())
+    pool.close()
+
+def test_release_rolls_back_an_open_transaction(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1)
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE t (x)')
+
+    conn = pool.acquire()
+    conn.execute('INSERT INTO t VALUES (1)')
+    assert conn.in_transaction
+    pool.release(conn)
+
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    pool.close()
+
+def test_retired_pool_closes_connections_on_release(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+    conn = pool.acquire()
+    pool.close(retire=True)
+    pool.release(conn)
+    assert pool.stats()['open'] == 0
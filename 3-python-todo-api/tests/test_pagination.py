@@ -0,0 +1,60 @@
+import json
+
+import main
+
+def add_todos(client, titles):
+    for title in titles:
+        client.post('/api/todos', json={'title': title})
+
+def fetch_pages(client, url, limit):
+    pages, after = [], None
+    while True:
+        query = f'{url}?limit={limit}' + (f'&after={after}' if after else '')
+        response = client.get(query)
+        assert response.status_code == 200
+        pages.append(response.get_json())
+        after = response.headers.get('X-Next-Cursor')
+        if not after:
+            return pages
+
+def test_cursor_pages_cover_every_todo_once_newest_first(client):
+    add_todos(client, [f'todo {i}' for i in range(6)])
+    # Same created_at for several rows: ties are broken by id
+    client.post('/api/todos/bulk', json={'operations': [
+        {'op': 'create', 'title': f'bulk {i}'} for i in range(5)
+    ]})
+
+    everything = client.get('/api/todos').get_json()
+    pages = fetch_pages(client, '/api/todos', 3)
+    assert [len(page) for page in pages] == [3, 3, 3, 2]
+    assert [todo for page in pages for todo in page] == everything
+    assert everything == sorted(everything, key=lambda todo: (todo['created_at'], todo['id']),
+                                reverse=True)
+
+def test_exact_last_page_has_no_cursor_after_an_empty_one(client):
+    add_todos(client, ['a', 'b'])
+    pages = fetch_pages(client, '/api/todos', 2)
+    # A full last page can't know it is the last; the next one is empty
+    assert [len(page) for page in pages] == [2, 0]
+
+def test_invalid_limit_and_cursor_are_rejected(client):
+    assert client.get('/api/todos?limit=0').status_code == 400
+    assert client.get('/api/todos?limit=ten').status_code == 400
+    assert client.get('/api/todos?after=not-a-cursor').status_code == 400
+
+def test_limit_is_capped(client, monkeypatch):
+    monkeypatch.setattr(main, 'MAX_PAGE_SIZE', 2)
+    add_todos(client, ['a', 'b', 'c'])
+    assert len(client.get('/api/todos?limit=100').get_json()) == 2
+
+def test_stream_matches_the_buffered_list(client, monkeypatch):
+    monkeypatch.setattr(main, 'STREAM_BATCH_SIZE', 2)
+    add_todos(client, [f'todo {i}' for i in range(5)])
+    streamed = client.get('/api/todos?stream=1')
+    assert json.loads(streamed.get_data()) == client.get('/api/todos').get_json()
+
+    assert client.get('/api/todos?stream=1&limit=2').get_json() == \
+        client.get('/api/todos?limit=2').get_json()
+
+def test_empty_stream_is_an_empty_array(client):
+    assert client.get('/api/todos?stream=1').get_json() == []
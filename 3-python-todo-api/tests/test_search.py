@@ -0,0 +1,45 @@
+import pytest
+
+import main
+
+pytestmark = pytest.mark.skipif(not main.search_enabled, reason='SQLite was built without FTS5')
+
+def titles(response):
+    return [todo['title'] for todo in response.get_json()]
+
+def test_every_word_must_match(client):
+    for title in ('Buy groceries', 'Buy a new bike', 'Write the report'):
+        client.post('/api/todos', json={'title': title})
+
+    assert sorted(titles(client.get('/api/todos/search?q=buy'))) == ['Buy a new bike', 'Buy groceries']
+    assert titles(client.get('/api/todos/search?q=buy bike')) == ['Buy a new bike']
+    assert titles(client.get('/api/todos/search?q=groc*')) == ['Buy groceries']
+    assert titles(client.get('/api/todos/search?q=groc')) == []
+
+def test_index_follows_updates_and_deletes(client):
+    todo = client.post('/api/todos', json={'title': 'Call the plumber'}).get_json()
+    client.put(f"/api/todos/{todo['id']}", json={'title': 'Call the electrician'})
+    assert titles(client.get('/api/todos/search?q=plumber')) == []
+    assert titles(client.get('/api/todos/search?q=electrician')) == ['Call the electrician']
+
+    client.delete(f"/api/todos/{todo['id']}")
+    assert titles(client.get('/api/todos/search?q=electrician')) == []
+
+def test_operators_in_input_are_searched_as_words(client):
+    client.post('/api/todos', json={'title': 'Fix NOT working login'})
+    assert titles(client.get('/api/todos/search?q="NOT" OR (login')) == []
+    assert titles(client.get('/api/todos/search?q=NOT login')) == ['Fix NOT working login']
+    assert main.build_match_query('a" OR b*') == '"a" "OR" "b"*'
+    assert client.get('/api/todos/search?q=!!!').status_code == 400
+
+def test_results_are_paged_by_offset(client):
+    for i in range(5):
+        client.post('/api/todos', json={'title': f'Report {i}'})
+
+    first = client.get('/api/todos/search?q=report&limit=3')
+    assert len(first.get_json()) == 3
+    offset = first.headers['X-Next-Offset']
+    second = client.get(f'/api/todos/search?q=report&limit=3&offset={offset}')
+    assert len(second.get_json()) == 2
+    assert 'X-Next-Offset' not in second.headers
+    assert {todo['id'] for todo in first.get_json()}.isdisjoint(todo['id'] for todo in second.get_json())
@@ -0,0 +1,41 @@
+import pytest
+
+import main
+
+TITLES = ['plain', 'with "quotes" and \\ backslash', 'ünïcödé ✓', 'tab\tand\nnewline', '</script>']
+
+@pytest.fixture
+def todos(client):
+    for title in TITLES:
+        todo = client.post('/api/todos', json={'title': title}).get_json()
+    client.put(f"/api/todos/{todo['id']}/toggle")
+    return client
+
+@pytest.mark.parametrize('query', ['', 'limit=2', 'stream=1', 'stream=1&limit=3'])
+def test_sql_serializer_produces_the_same_bytes(todos, query):
+    python = todos.get(f'/api/todos?{query}&serializer=python')
+    sql = todos.get(f'/api/todos?{query}&serializer=sql')
+    assert sql.get_data() == python.get_data()
+    assert sql.headers.get('X-Next-Cursor') == python.headers.get('X-Next-Cursor')
+
+def test_sql_cursor_pages_match(todos):
+    after = todos.get('/api/todos?limit=2&serializer=sql').headers['X-Next-Cursor']
+    assert todos.get(f'/api/todos?limit=2&after={after}&serializer=sql').get_data() == \
+        todos.get(f'/api/todos?limit=2&after={after}').get_data()
+
+def test_default_serializer_is_configurable(todos, monkeypatch):
+    monkeypatch.setattr(main, 'LIST_SERIALIZER', 'sql')
+    assert todos.get('/api/todos').get_json()[0]['completed'] is True
+
+def test_empty_list(client):
+    assert client.get('/api/todos?serializer=sql').get_data() == b'[]'
+
+def test_unknown_serializer_is_rejected(client):
+    assert client.get('/api/todos?serializer=xml').status_code == 400
+
+def test_sql_full_list_is_newest_first_with_ties_broken_by_id(client):
+    with main.write_db() as conn:
+        conn.executemany('INSERT INTO todos (title, completed, created_at) VALUES (?, 0, ?)',
+                         [(str(i), '2024-01-01T00:00:00') for i in range(20)])
+    ids = [todo['id'] for todo in client.get('/api/todos?serializer=sql').get_json()]
+    assert ids == sorted(ids, reverse=True)
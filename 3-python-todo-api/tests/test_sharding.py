@@ -0,0 +1,75 @@
+import os
+
+import main
+from db import ShardRouter
+
+def create_list(client, name):
+    return client.post('/api/lists', json={'name': name}).get_json()
+
+def test_each_list_has_its_own_database_file(client):
+    first, second = create_list(client, 'first'), create_list(client, 'second')
+    assert os.path.exists(main.shard_path(first['id']))
+
+    todo = client.post(f"/api/lists/{first['id']}/todos", json={'title': 'only in first'}).get_json()
+    assert [t['title'] for t in client.get(f"/api/lists/{first['id']}/todos").get_json()] == ['only in first']
+    assert client.get(f"/api/lists/{second['id']}/todos").get_json() == []
+    # The default list in todos.db is separate too
+    assert client.get('/api/todos').get_json() == []
+
+    assert client.put(f"/api/lists/{first['id']}/todos/{todo['id']}/toggle").status_code == 204
+    assert client.get(f"/api/lists/{first['id']}/todos").get_json()[0]['completed'] is True
+    assert client.delete(f"/api/lists/{first['id']}/todos/completed/clear").status_code == 204
+    assert client.get(f"/api/lists/{first['id']}/todos").get_json() == []
+
+def test_deleting_a_list_removes_its_file(client):
+    doomed = create_list(client, 'doomed')
+    path = main.shard_path(doomed['id'])
+    assert client.delete(f"/api/lists/{doomed['id']}").status_code == 204
+    assert not os.path.exists(path)
+    assert client.get(f"/api/lists/{doomed['id']}/todos").status_code == 404
+    assert client.delete(f"/api/lists/{doomed['id']}").status_code == 404
+
+def test_cross_list_pages_merge_newest_first(client):
+    lists = [create_list(client, f'list {i}') for i in range(3)]
+    for i in range(9):
+        list_id = lists[i % 3]['id']
+        client.post(f'/api/lists/{list_id}/todos', json={'title': f'todo {i}'})
+    ids = ','.join(str(lst['id']) for lst in lists)
+
+    everything = client.get(f'/api/lists/todos?lists={ids}').get_json()
+    assert [todo['title'] for todo in everything] == [f'todo {i}' for i in reversed(range(9))]
+    assert {todo['list_id'] for todo in everything} == {lst['id'] for lst in lists}
+
+    pages, after = [], None
+    while True:
+        url = f'/api/lists/todos?lists={ids}&limit=4' + (f'&after={after}' if after else '')
+        response = client.get(url)
+        pages.append(response.get_json())
+        after = response.headers.get('X-Next-Cursor')
+        if not after:
+            break
+    assert [todo for page in pages for todo in page] == everything
+
+def test_cross_list_rejects_unknown_lists(client):
+    assert client.get('/api/lists/todos?lists=999999').status_code == 404
+    assert client.get('/api/lists/todos?lists=a,b').status_code == 400
+
+def test_router_closes_the_least_recently_used_shard(tmp_path):
+    opened = []
+    router = ShardRouter(lambda key: str(tmp_path / f'shard-{key}.db'),
+                         init_shard=lambda conn: opened.append(conn), max_open=2, pool_size=1)
+    first = router.pool(1)
+    router.pool(2)
+    router.pool(1)
+    router.pool(3)  # evicts 2, the least recently used
+
+    stats = router.stats()
+    assert (stats['open'], stats['opens'], stats['hits'], stats['evictions']) == (2, 3, 1, 1)
+    assert router.pool(1) is first
+    router.pool(2)  # reopened
+    assert len(opened) == 4
+
+    router.discard(2)
+    assert not os.path.exists(tmp_path / 'shard-2.db')
+    router.close()
+    assert router.stats()['open'] == 0
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import main
+from db import ConnectionPool, WriteCoalescer, WriteQueueFull, WriteTimeout
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'coalesce.db'), size=2)
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL)')
+    yield pool
+    pool.close()
+
+def test_concurrent_writes_commit_in_groups(pool):
+    writer = WriteCoalescer(pool.connection, max_batch=16, max_wait=0.2)
+    ids = []
+    lock = threading.Lock()
+
+    def insert(i):
+        row_id = writer.submit('INSERT INTO items (name) VALUES (?)', (f'item {i}',)).result(5)
+        with lock:
+            ids.append(row_id)
+
+    threads = [threading.Thread(target=insert, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    assert sorted(ids) == list(range(1, 9))
+    stats = writer.stats()
+    assert stats['ops'] == 8
+    assert stats['groups'] < 8
+    with pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 8
+
+def test_failed_statement_fails_only_its_caller(pool):
+    writer = WriteCoalescer(pool.connection, max_batch=8, max_wait=0.1)
+    good = writer.submit('INSERT INTO items (name) VALUES (?)', ('good',))
+    bad = writer.submit('INSERT INTO items (name) VALUES (?)', (None,))
+    after = writer.submit('INSERT INTO items (name) VALUES (?)', ('after',))
+
+    assert good.result(5) and after.result(5)
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(5)
+    writer.close()
+    assert writer.stats()['errors'] == 1
+
+def test_full_queue_raises(pool):
+    release = threading.Event()
+
+    def blocked_transaction():
+        release.wait(5)
+        return pool.connection()
+
+    writer = WriteCoalescer(blocked_transaction, max_batch=1, max_wait=0, max_queue=1,
+                            put_timeout=0.01)
+    first = writer.submit('INSERT INTO items (name) VALUES (?)', ('first',))
+    # The writer thread holds `first`; fill the queue behind it
+    while writer.stats()['queue_depth']:
+        time.sleep(0.001)
+    writer.submit('INSERT INTO items (name) VALUES (?)', ('queued',))
+    with pytest.raises(WriteQueueFull):
+        writer.submit('INSERT INTO items (name) VALUES (?)', ('rejected',))
+    release.set()
+    assert first.result(5)
+    writer.close()
+
+def test_timed_out_write_is_withdrawn(pool):
+    release = threading.Event()
+
+    def blocked_transaction():
+        release.wait(5)
+        return pool.connection()
+
+    writer = WriteCoalescer(blocked_transaction, max_batch=1, max_wait=0)
+    first = writer.submit('INSERT INTO items (name) VALUES (?)', ('first',))
+    while writer.stats()['queue_depth']:
+        time.sleep(0.001)
+    with pytest.raises(WriteTimeout):
+        writer.write('INSERT INTO items (name) VALUES (?)', ('abandoned',), timeout=0.05)
+    release.set()
+    first.result(5)
+    writer.close()
+
+    with pool.connection() as conn:
+        names = [row[0] for row in conn.execute('SELECT name FROM items')]
+    assert names == ['first']
+    assert writer.stats()['timeouts'] == 1
+
+def test_slow_coalescer_answers_503(client, monkeypatch):
+    release = threading.Event()
+
+    def blocked_transaction():
+        release.wait(5)
+        return main.write_db()
+
+    writer = WriteCoalescer(blocked_transaction, max_batch=1, max_wait=0)
+    monkeypatch.setattr(main, 'writer', writer)
+    monkeypatch.setattr(main, 'POOL_TIMEOUT', 0.05)
+
+    response = client.post('/api/todos', json={'title': 'Too slow'})
+    release.set()
+    writer.close()
+    assert response.status_code == 503
+
+def test_create_goes_through_the_coalescer(client, monkeypatch):
+    writer = WriteCoalescer(main.write_db, max_batch=8, max_wait=0.01)
+    monkeypatch.setattr(main, 'writer', writer)
+    version = main.data_version
+
+    response = client.post('/api/todos', json={'title': 'Grouped'})
+    writer.close()
+
+    assert response.status_code == 201
+    assert writer.stats()['ops'] == 1
+    assert main.data_version > version
+    assert client.get('/api/todos').get_json()[0]['id'] == response.get_json()['id']
@@ -0,0 +1,298 @@
+"""
+Embedding and summary caches for the BertSum app
+
+Two levels, both content-addressed:
+
+- EmbeddingCache: sentence embeddings keyed by a hash of the normalized
+  sentence, lowercased for an uncased model. Hot vectors sit in an in-memory LRU; every vector is also
+  written to an EmbeddingStore, a float16 array memory-mapped from disk
+  and shared by every worker process, so evicted and restarted entries
+  are read back instead of recomputed.
+- LRUCache: whole summaries keyed by (text hash, method, num_sentences,
+  model). The hash keeps case: summaries quote or are generated from the
+  text as written.
+
+Both are bounded and count hits, misses and evictions for /health.
+"""
+
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+
+KEY_BYTES = 16
+
+def normalize(text):
+    """Whitespace-collapsed text"""
+    return ' '.join(text.split())
+
+def text_key(text):
+    """16-byte digest of the normalized text, case-sensitive"""
+    return hashlib.blake2b(normalize(text).encode('utf-8'), digest_size=KEY_BYTES).digest()
+
+class LRUCache:
+    """Bounded LRU with hit/miss/eviction counters"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+            }
+
+class EmbeddingStore:
+    """Fixed-size on-disk ring of float16 vectors, memory-mapped and shared between processes.
+
+    Four .npy files under `directory`: the vectors, the key of each slot,
+    the sequence number of the write that allocated it, and the ring's
+    next sequence number and cursor. Once the ring is full each new key
+    replaces the oldest one. Putting a key that is already stored rewrites
+    its slot in place and doesn't move the ring.
+
+    Several processes (gunicorn workers) can share one directory. Reads
+    and writes hold an fcntl lock on `directory/lock`, and the cursor
+    lives on disk rather than in memory. Each process keeps its own key
+    index, and before every access it catches up on the slots other
+    processes have allocated since its last one.
+    """
+
+    def __init__(self, directory, dim, capacity):
+        self.dim = dim
+        self.capacity = capacity
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._lock_fd = os.open(os.path.join(directory, 'lock'), os.O_RDWR | os.O_CREAT, 0o644)
+
+        files = [
+            (os.path.join(directory, 'vectors.npy'), np.float16, (capacity, dim)),
+            (os.path.join(directory, 'keys.npy'), np.uint8, (capacity, KEY_BYTES)),
+            (os.path.join(directory, 'seq.npy'), np.uint64, (capacity,)),
+        ]
+        meta_path = os.path.join(directory, 'ring.npy')
+        # Under the lock, so two workers starting at once don't both create the files
+        with self._file_lock():
+            arrays = [self._open(*spec) for spec in files]
+            if any(array is None for array in arrays):
+                # Missing, or written for another dimension or capacity: start over
+                arrays = [np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+                          for path, dtype, shape in files]
+                if os.path.exists(meta_path):
+                    os.remove(meta_path)
+            self.vectors, self.keys, self.seq = arrays
+
+            # [next sequence number, slot for the next new key]; seq is 0 for never-written slots
+            self.ring = self._open(meta_path, np.uint64, (2,))
+            if self.ring is None:
+                self.ring = np.lib.format.open_memmap(meta_path, mode='w+', dtype=np.uint64, shape=(2,))
+                used = np.flatnonzero(self.seq)
+                free = np.flatnonzero(self.seq == 0)
+                self.ring[0] = int(self.seq.max()) + 1 if len(used) else 1
+                # The first free slot, then the oldest
+                self.ring[1] = int(free[0]) if len(free) else int(np.argmin(self.seq))
+            self._rebuild()
+        self._overwrites = 0
+
+    def _open(self, path, dtype, shape):
+        """Existing array at path, or None if it is missing or does not match"""
+        if not os.path.exists(path):
+            return None
+        array = np.lib.format.open_memmap(path, mode='r+')
+        if array.dtype != dtype or array.shape != shape:
+            return None
+        return array
+
+    @contextmanager
+    def _file_lock(self, exclusive=True):
+        # lockf is per process, so threads also take the threading lock
+        with self._lock:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN)
+
+    def _rebuild(self):
+        """Index every written slot"""
+        self._slots = {}
+        self._slot_keys = {}
+        for slot in np.flatnonzero(self.seq):
+            self._index(int(slot))
+        self._seen_seq = int(self.ring[0]) - 1
+        self._seen_cursor = int(self.ring[1])
+
+    def _index(self, slot):
+        old = self._slot_keys.pop(slot, None)
+        if old is not None:
+            del self._slots[old]
+        key = self.keys[slot].tobytes()
+        self._slots[key] = slot
+        self._slot_keys[slot] = key
+
+    def _sync(self):
+        """Index the slots other processes allocated since this one last looked"""
+        allocated = int(self.ring[0]) - 1 - self._seen_seq
+        if not allocated:
+            return
+        if not 0 < allocated < self.capacity:
+            # Lapped, or the files were started over
+            self._rebuild()
+            return
+        # Allocations walk the ring in order, so they are the slots from our last cursor on
+        for i in range(allocated):
+            self._index((self._seen_cursor + i) % self.capacity)
+        self._seen_seq += allocated
+        self._seen_cursor = int(self.ring[1])
+
+    def get(self, key):
+        with self._file_lock(exclusive=False):
+            self._sync()
+            slot = self._slots.get(key)
+            if slot is None:
+                return None
+            return self.vectors[slot].astype(np.float32)
+
+    def put(self, key, vector):
+        with self._file_lock():
+            self._sync()
+            slot = self._slots.get(key)
+            if slot is not None:
+                self.vectors[slot] = vector
+                return
+
+            slot = int(self.ring[1])
+            if self.seq[slot]:
+                self._overwrites += 1
+            self.vectors[slot] = vector
+            self.keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self.seq[slot] = self.ring[0]
+            self.ring[0] += 1
+            self.ring[1] = (slot + 1) % self.capacity
+
+            self._index(slot)
+            self._seen_seq += 1
+            self._seen_cursor = int(self.ring[1])
+
+    def flush(self):
+        with self._file_lock():
+            for array in (self.vectors, self.keys, self.seq, self.ring):
+                array.flush()
+
+    def stats(self):
+        with self._file_lock(exclusive=False):
+            self._sync()
+            return {
+                'entries': len(self._slots),
+                'capacity': self.capacity,
+                'overwrites': self._overwrites,
+                'file_bytes': self.vectors.nbytes + self.keys.nbytes + self.seq.nbytes,
+            }
+
+class EmbeddingCache:
+    """In-memory LRU of sentence embeddings in front of an EmbeddingStore"""
+
+    def __init__(self, store, memory_entries, lowercase=False):
+        self.store = store
+        # An uncased model embeds "The" and "the" the same: share their entry
+        self.lowercase = lowercase
+        self.memory = LRUCache(memory_entries)
+        self._lock = threading.Lock()
+        self._disk_hits = 0
+        self._misses = 0
+
+    def lookup(self, sentences):
+        """(keys, vectors) where vectors[i] is None for sentences not cached"""
+        keys = [text_key(sentence.lower() if self.lowercase else sentence) for sentence in sentences]
+        vectors = []
+        disk_hits = misses = 0
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is None:
+                vector = self.store.get(key)
+                if vector is None:
+                    misses += 1
+                else:
+                    disk_hits += 1
+                    self.memory.set(key, vector)
+            vectors.append(vector)
+
+        with self._lock:
+            self._disk_hits += disk_hits
+            self._misses += misses
+        return keys, vectors
+
+    def embed(self, sentences, compute):
+        """Vector for every sentence; compute(sentences) is called once for the distinct uncached ones.
+
+        A sentence repeated in the document is embedded and stored once
+        and its vector shared by every position it appears at. Computed
+        vectors are rounded to float16 like the stored copies, so a result
+        doesn't change depending on whether its embeddings came from the
+        cache.
+        """
+        keys, vectors = self.lookup(sentences)
+        missing = OrderedDict()
+        for i, (key, vector) in enumerate(zip(keys, vectors)):
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            computed = compute([sentences[positions[0]] for positions in missing.values()])
+            computed = np.asarray(computed).astype(np.float16).astype(np.float32)
+            self.add(list(missing), computed)
+            for positions, vector in zip(missing.values(), computed):
+                for i in positions:
+                    vectors[i] = vector
+        return vectors
+
+    def add(self, keys, vectors):
+        for key, vector in zip(keys, vectors):
+            # A copy, so the LRU never pins the whole batch array a row came from
+            self.memory.set(key, np.array(vector, dtype=np.float32))
+            self.store.put(key, vector)
+
+    def stats(self):
+        memory = self.memory.stats()
+        with self._lock:
+            lookups = memory['hits'] + memory['misses']
+            hits = memory['hits'] + self._disk_hits
+            return {
+                'hits': hits,
+                'misses': self._misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'memory': memory,
+                'disk': {'hits': self._disk_hits, **self.store.stats()},
+            }
@@ -0,0 +1,73 @@
+"""
+Batched BERT sentence embeddings for the BertSum apps
+
+Sentences are tokenized once with the fast (Rust) tokenizer, sorted by
+token length and cut into buckets, so each forward pass pads only to the
+longest sentence in its own bucket instead of running one pass per
+sentence. A bucket holds at most `batch_size` sentences and at most
+`max_tokens` padded tokens. Token embeddings are mean-pooled over the
+attention mask, so padding never leaks into a sentence's vector.
+
+Results come back in input order: row i is always sentence i.
+"""
+
+import numpy as np
+import torch
+
+def length_buckets(lengths, batch_size, max_tokens):
+    """Split indexes into batches of similar length.
+
+    Yields lists of indexes into `lengths`, shortest sentences first. A
+    batch stops growing when adding the next sentence would exceed
+    `batch_size` rows or `max_tokens` padded tokens (rows x longest row).
+    """
+    order = np.argsort(lengths, kind='stable')
+    batch = []
+    longest = 0
+    for index in order:
+        length = int(lengths[index])
+        if batch and (len(batch) >= batch_size or max(longest, length) * (len(batch) + 1) > max_tokens):
+            yield batch
+            batch = []
+            longest = 0
+        batch.append(int(index))
+        longest = max(longest, length)
+    if batch:
+        yield batch
+
+class SentenceEncoder:
+    """Embeds lists of sentences with a BertModel in length-bucketed batches"""
+
+    def __init__(self, tokenizer, model, batch_size=32, max_tokens=8192, max_length=512):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.max_length = max_length
+        self.model.eval()
+
+    def encode(self, sentences):
+        """float32 array of shape (len(sentences), hidden_size), in input order"""
+        hidden_size = self.model.config.hidden_size
+        if not sentences:
+            return np.zeros((0, hidden_size), dtype=np.float32)
+
+        encoded = self.tokenizer(list(sentences), truncation=True, max_length=self.max_length)
+        input_ids = encoded['input_ids']
+        lengths = np.fromiter((len(ids) for ids in input_ids), dtype=np.int64, count=len(input_ids))
+
+        embeddings = np.empty((len(sentences), hidden_size), dtype=np.float32)
+        with torch.inference_mode():
+            for batch in length_buckets(lengths, self.batch_size, self.max_tokens):
+                inputs = self.tokenizer.pad(
+                    {'input_ids': [input_ids[i] for i in batch]}, return_tensors='pt'
+                )
+                outputs = self.model(**inputs)
+
+                # Mean of the real tokens only
+                mask = inputs['attention_mask'].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+                summed = (outputs.last_hidden_state * mask).sum(dim=1)
+                pooled = summed / mask.sum(dim=1).clamp(min=1)
+                embeddings[batch] = pooled.float().numpy()
+
+        return embeddings
@@ -0,0 +1,143 @@
+"""
+Map-reduce summarization for documents longer than the model's input
+
+The document is split on sentence boundaries into chunks of at most
+max_tokens tokens. Every chunk is summarized on a thread pool (map), the
+partial summaries are joined, and the result is chunked and summarized
+again (reduce) until it fits in a single chunk, which gets the final
+summary. Every sentence is read by the model once at the first level, so
+nothing is cut off, and only `window` chunks are in flight at a time, so
+memory stays bounded however long the document is.
+
+A level doesn't always shrink the text: an extractive summarizer hands
+back chunks that are already at or below its sentence count unchanged.
+When a level makes no progress, or max_levels runs out, the partial
+summaries are cut down to max_tokens instead, taking their sentences in
+turn so every part of the document keeps its leading sentences.
+"""
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+
+def chunk_sentences(sentences, lengths, max_tokens):
+    """Group consecutive sentences into chunks of at most max_tokens tokens.
+
+    A sentence longer than max_tokens gets a chunk to itself (the model
+    truncates it).
+    """
+    chunks = []
+    current = []
+    used = 0
+    for sentence, length in zip(sentences, lengths):
+        if current and used + length > max_tokens:
+            chunks.append(current)
+            current = []
+            used = 0
+        current.append(sentence)
+        used += length
+    if current:
+        chunks.append(current)
+    return chunks
+
+class Progress:
+    """Chunks done per level, readable from other threads while a job runs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.levels = []
+
+    def start_level(self, chunks):
+        with self._lock:
+            self.levels.append({'chunks': chunks, 'done': 0})
+
+    def chunk_done(self):
+        with self._lock:
+            self.levels[-1]['done'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [dict(level) for level in self.levels]
+
+def map_ordered(pool, fn, items, window, on_done=None):
+    """fn over items on `pool` with at most `window` calls in flight; results in order"""
+    results = [None] * len(items)
+    pending = {}
+    next_item = 0
+    while next_item < len(items) or pending:
+        while next_item < len(items) and len(pending) < window:
+            pending[pool.submit(fn, items[next_item])] = next_item
+            next_item += 1
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+            if on_done:
+                on_done()
+    return results
+
+def truncate_words(sentence, count_tokens, max_tokens):
+    """Longest leading run of the sentence's words that fits in max_tokens"""
+    words = sentence.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens([' '.join(words[:middle])])[0] <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return ' '.join(words[:low])
+
+def fit_sentences(groups, count_tokens, max_tokens):
+    """Text of at most max_tokens tokens from groups of sentences.
+
+    Sentences are taken in turn from each group (the first of every group,
+    then the second, ...) while they fit, and joined in document order.
+    """
+    order = [(group, index)
+             for index in range(max((len(sentences) for sentences in groups), default=0))
+             for group, sentences in enumerate(groups) if index < len(sentences)]
+    if not order:
+        return ''
+    lengths = count_tokens([groups[group][index] for group, index in order])
+
+    picked = []
+    used = 0
+    for position, length in zip(order, lengths):
+        if used + length <= max_tokens:
+            picked.append(position)
+            used += length
+    if not picked:
+        # Not even one sentence fits: cut the first one down
+        return truncate_words(groups[order[0][0]][order[0][1]], count_tokens, max_tokens) + '.'
+    return '. '.join(groups[group][index] for group, index in sorted(picked)) + '.'
+
+def map_reduce_summarize(text, split, count_tokens, summarize, pool,
+                         max_tokens=480, window=4, max_levels=8, progress=None):
+    """Summary of `text` of any length, at most max_tokens tokens long.
+
+    split(text) -> sentences, count_tokens(sentences) -> token counts and
+    summarize(chunk_text) -> summary are supplied by the app.
+    """
+    progress = progress or Progress()
+    groups = [split(text)]
+    previous_tokens = None
+
+    for _ in range(max_levels):
+        sentences = [sentence for group in groups for sentence in group]
+        if not sentences:
+            return ''
+        lengths = count_tokens(sentences)
+        tokens = sum(lengths)
+        if previous_tokens is not None and tokens >= previous_tokens:
+            # The last level came back no shorter; more levels won't either
+            break
+        previous_tokens = tokens
+
+        chunks = ['. '.join(chunk) + '.' for chunk in chunk_sentences(sentences, lengths, max_tokens)]
+        progress.start_level(len(chunks))
+
+        partials = map_ordered(pool, summarize, chunks, window, progress.chunk_done)
+        if len(chunks) == 1:
+            return partials[0]
+        groups = [split(partial) for partial in partials]
+
+    return fit_sentences(groups, count_tokens, max_tokens)
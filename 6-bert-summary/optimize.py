@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+CPU inference settings for the BertSum apps
+
+Opt-in, through environment variables read by both apps:
+
+- INFERENCE_PRECISION=int8 swaps every nn.Linear of BERT and T5/BART for
+  a dynamically quantized int8 one (weights int8, activations quantized
+  on the fly). The quantized weights are saved under OPTIMIZED_CACHE_DIR
+  the first time as a plain state_dict. Later loads build the model from
+  its config, quantize it the same way and load those tensors into it,
+  without reading the FP32 weights.
+- TORCH_THREADS / TORCH_INTEROP_THREADS set torch's intra-op and
+  inter-op thread pools for this worker process, the first time it loads
+  a model. With several workers on one machine, give each
+  cores / workers threads.
+- BERT_COMPILE=1 runs the BERT encoder through torch.compile.
+
+Before turning int8 on, compare it with FP32 on your own text:
+
+    python3 optimize.py --text article.txt
+
+This reports latency, model size, process memory and how much the int8
+embeddings, extractive picks and abstractive summaries agree with FP32.
+"""
+
+import argparse
+import copy
+import io
+import json
+import os
+import re
+import statistics
+import time
+import torch
+
+from registry import rss_bytes
+
+INFERENCE_PRECISION = os.environ.get('INFERENCE_PRECISION', 'fp32')
+TORCH_THREADS = int(os.environ.get('TORCH_THREADS', '0'))
+TORCH_INTEROP_THREADS = int(os.environ.get('TORCH_INTEROP_THREADS', '0'))
+BERT_COMPILE = os.environ.get('BERT_COMPILE') == '1'
+OPTIMIZED_CACHE_DIR = os.environ.get('OPTIMIZED_CACHE_DIR', os.path.expanduser('~/.cache/bertsum/optimized'))
+
+SAMPLE_TEXT = (
+    "The city council approved a new budget on Tuesday after months of debate. "
+    "The plan increases funding for public transport and road repairs. "
+    "Critics argue that the budget ignores rising housing costs in the city centre. "
+    "Supporters say the transport investment will reduce traffic and pollution. "
+    "The mayor said the council would review housing policy separately next year. "
+    "Local businesses welcomed the road repairs, which had been delayed twice. "
+    "A group of residents plans to challenge parts of the budget in court. "
+    "The new budget takes effect at the start of the next financial year."
+)
+
+threads_configured = False
+
+def configure_threads(intra_op=TORCH_THREADS, inter_op=TORCH_INTEROP_THREADS):
+    """Set torch's thread pools once per process (0 keeps torch's default); returns the values in effect"""
+    global threads_configured
+
+    if not threads_configured:
+        threads_configured = True
+        if intra_op:
+            torch.set_num_threads(intra_op)
+        if inter_op:
+            try:
+                torch.set_num_interop_threads(inter_op)
+            except RuntimeError as e:
+                # Only allowed once, before any inter-op parallel work has started
+                print(f"⚠️  Could not set inter-op threads: {e}")
+    return {'intra_op': torch.get_num_threads(), 'inter_op': torch.get_num_interop_threads()}
+
+def quantize(model):
+    """Copy of `model` with every nn.Linear dynamically quantized to int8"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def artifact_path(name, precision, cache_dir=OPTIMIZED_CACHE_DIR):
+    # Packed quantized weights are tied to the torch version that wrote them
+    return os.path.join(cache_dir, f"{name.replace('/', '--')}-{precision}-torch{torch.__version__}.pt")
+
+def model_label(name, precision=INFERENCE_PRECISION):
+    """Name used in cache keys, so FP32 and int8 results are never mixed"""
+    return name if precision == 'fp32' else f'{name}@{precision}'
+
+def load_cached_int8(name, model_class, path, **kwargs):
+    """int8 model rebuilt from its config with the weights cached at path, or None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        model = quantize(model_class(model_class.config_class.from_pretrained(name, **kwargs)))
+        # Tensors only: reading the cache file can't run code
+        model.load_state_dict(torch.load(path, weights_only=True))
+    except Exception as e:
+        # e.g. written for another version of the architecture
+        print(f"⚠️  Ignoring cached int8 {name} at {path}: {e}")
+        return None
+    print(f"✅ int8 {name} loaded from {path}")
+    return model
+
+def load_model(name, model_class, precision=INFERENCE_PRECISION, compile_model=False, **kwargs):
+    """model_class.from_pretrained(name, **kwargs) ready for inference, as is or in int8.
+
+    Also applies the torch thread settings, so they take effect in every
+    process that serves a model, WSGI workers included.
+    """
+    configure_threads()
+
+    if precision == 'int8':
+        path = artifact_path(name, precision)
+        model = load_cached_int8(name, model_class, path, **kwargs)
+        if model is None:
+            model = quantize(model_class.from_pretrained(name, **kwargs))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            torch.save(model.state_dict(), path + '.tmp')
+            os.replace(path + '.tmp', path)
+            print(f"✅ {name} quantized to int8 and cached at {path}")
+    elif precision == 'fp32':
+        model = model_class.from_pretrained(name, **kwargs)
+    else:
+        raise ValueError(f"Unknown INFERENCE_PRECISION '{precision}' (use fp32 or int8)")
+
+    model.eval()
+    if compile_model:
+        model = torch.compile(model)
+    return model
+
+def state_dict_bytes(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, round(statistics.median(times) * 1000, 1)
+
+def token_f1(a, b):
+    """Unigram F1 between two summaries"""
+    a, b = a.lower().split(), b.lower().split()
+    common = sum(min(a.count(word), b.count(word)) for word in set(a))
+    if not common:
+        return 0.0
+    precision, recall = common / len(a), common / len(b)
+    return round(2 * precision * recall / (precision + recall), 3)
+
+def compare(text, summarizer_name, k, repeat):
+    """int8 vs FP32 report for BERT embeddings/extraction and abstractive summaries"""
+    import numpy as np
+    from transformers import AutoTokenizer, BertModel, BertTokenizerFast, T5ForConditionalGeneration
+    from embeddings import SentenceEncoder
+    from selection import select_sentences
+
+    sentences = [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
+    report = {'threads': configure_threads(), 'sentences': len(sentences)}
+
+    # BERT: embeddings and extractive picks
+    tokenizer = BertTokenizerFast.from_pretrained('bert-base-uncased')
+    rss_before = rss_bytes()
+    fp32 = BertModel.from_pretrained('bert-base-uncased').eval()
+    rss_fp32 = rss_bytes()
+    int8 = quantize(copy.deepcopy(fp32)).eval()
+    rss_int8 = rss_bytes()
+
+    with torch.inference_mode():
+        emb_fp32, fp32_ms = timed(lambda: SentenceEncoder(tokenizer, fp32).encode(sentences), repeat)
+        emb_int8, int8_ms = timed(lambda: SentenceEncoder(tokenizer, int8).encode(sentences), repeat)
+
+    cosine = (emb_fp32 * emb_int8).sum(axis=1) / (
+        np.linalg.norm(emb_fp32, axis=1) * np.linalg.norm(emb_int8, axis=1))
+    picks = {}
+    for selector in ('kmeans', 'centroid', 'mmr', 'textrank'):
+        a = set(select_sentences(emb_fp32, k, selector).tolist())
+        b = set(select_sentences(emb_int8, k, selector).tolist())
+        picks[selector] = round(len(a & b) / len(a), 3) if a else 1.0
+
+    report['bert'] = {
+        'fp32_ms': fp32_ms,
+        'int8_ms': int8_ms,
+        'speedup': round(fp32_ms / int8_ms, 2) if int8_ms else None,
+        'fp32_bytes': state_dict_bytes(fp32),
+        'int8_bytes': state_dict_bytes(int8),
+        'fp32_rss_delta_bytes': rss_fp32 - rss_before if rss_before else None,
+        'int8_rss_delta_bytes': rss_int8 - rss_fp32 if rss_fp32 else None,
+        'embedding_cosine_mean': round(float(cosine.mean()), 4),
+        'embedding_cosine_min': round(float(cosine.min()), 4),
+        'extractive_pick_agreement': picks,
+    }
+    del fp32, int8
+
+    # T5: abstractive summaries
+    tokenizer = AutoTokenizer.from_pretrained(summarizer_name)
+    fp32 = T5ForConditionalGeneration.from_pretrained(summarizer_name).eval()
+    int8 = quantize(copy.deepcopy(fp32)).eval()
+    inputs = tokenizer("summarize: " + text, return_tensors="pt", max_length=512, truncation=True)
+
+    def generate(model):
+        with torch.inference_mode():
+            outputs = model.generate(inputs.input_ids, attention_mask=inputs.attention_mask,
+                                     max_length=150, min_length=30, num_beams=4, early_stopping=True)
+        return tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+    summary_fp32, fp32_ms = timed(lambda: generate(fp32), repeat)
+    summary_int8, int8_ms = timed(lambda: generate(int8), repeat)
+    report['summarizer'] = {
+        'model': summarizer_name,
+        'fp32_ms': fp32_ms,
+        'int8_ms': int8_ms,
+        'speedup': round(fp32_ms / int8_ms, 2) if int8_ms else None,
+        'fp32_bytes': state_dict_bytes(fp32),
+        'int8_bytes': state_dict_bytes(int8),
+        'summary_identical': summary_fp32 == summary_int8,
+        'summary_token_f1': token_f1(summary_fp32, summary_int8),
+        'fp32_summary': summary_fp32,
+        'int8_summary': summary_int8,
+    }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--text', help='file to summarize (default: a short built-in news text)')
+    parser.add_argument('--summarizer', default='t5-small')
+    parser.add_argument('--k', type=int, default=3, help='sentences per extractive summary')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per measurement')
+    parser.add_argument('-o', '--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    text = SAMPLE_TEXT
+    if args.text:
+        with open(args.text) as f:
+            text = f.read()
+
+    output = json.dumps(compare(text, args.summarizer, args.k, args.repeat), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+if __name__ == '__main__':
+    main()
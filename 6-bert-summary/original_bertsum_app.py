@@ -8,80 +8,163 @@ from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
 import torch
 from transformers import (
-    BertTokenizer, BertModel,
+    BertTokenizerFast, BertModel,
     T5Tokenizer, T5ForConditionalGeneration,
     BartTokenizer, BartForConditionalGeneration,
     pipeline
 )
 import numpy as np
-from sklearn.cluster import KMeans
+import atexit
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from embeddings import SentenceEncoder
+from optimize import (BERT_COMPILE, INFERENCE_PRECISION, configure_threads, load_model,
+                      model_label)
+from selection import DEFAULT_SELECTOR, SELECTORS, select_sentences
+from scheduler import BatchScheduler, QueueFull
+from cache import EmbeddingCache, EmbeddingStore, LRUCache, text_key
+from hierarchical import Progress, map_reduce_summarize
+from registry import ModelLoadError, ModelRegistry
 
 app = Flask(__name__)
 CORS(app)
 
-# Global variables for models
-bert_tokenizer = None
-bert_model = None
-summarizer_model = None
-summarizer_tokenizer = None
-
-def load_bert_models():
-    """Load BERT models for sentence embeddings"""
-    global bert_tokenizer, bert_model
-
+# Sentence embedding batches (see embeddings.py)
+BERT_BATCH_SIZE = int(os.environ.get('BERT_BATCH_SIZE', '32'))
+BERT_MAX_BATCH_TOKENS = int(os.environ.get('BERT_MAX_BATCH_TOKENS', '8192'))
+# Sentences shorter than this are never picked for a summary
+MIN_SENTENCE_CHARS = 10
+# Default sentence selector (see selection.py); requests may pass `selector`
+SUMMARY_SELECTOR = os.environ.get('SUMMARY_SELECTOR', DEFAULT_SELECTOR)
+
+# Cross-request batching of model calls (see scheduler.py)
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '16'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', '5'))
+BATCH_MAX_QUEUE = int(os.environ.get('BATCH_MAX_QUEUE', '64'))
+# Seconds a request waits for its batch before answering 503
+BATCH_TIMEOUT = float(os.environ.get('BATCH_TIMEOUT', '60'))
+
+# Embedding and summary caches (see cache.py)
+BERT_MODEL_NAME = 'bert-base-uncased'
+EMBEDDING_CACHE_DIR = os.environ.get('EMBEDDING_CACHE_DIR', os.path.expanduser('~/.cache/bertsum/embeddings'))
+EMBEDDING_CACHE_MEMORY = int(os.environ.get('EMBEDDING_CACHE_MEMORY', '10000'))
+EMBEDDING_CACHE_DISK = int(os.environ.get('EMBEDDING_CACHE_DISK', '100000'))
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', '1000'))
+
+# Long documents (see hierarchical.py): chunk size in model tokens, chunks
+# summarized in parallel per document, and background summary jobs
+HIERARCHICAL_CHUNK_TOKENS = int(os.environ.get('HIERARCHICAL_CHUNK_TOKENS', '480'))
+HIERARCHICAL_WORKERS = int(os.environ.get('HIERARCHICAL_WORKERS', '4'))
+HIERARCHICAL_CHUNK_SENTENCES = 3
+SUMMARY_JOB_WORKERS = int(os.environ.get('SUMMARY_JOB_WORKERS', '2'))
+SUMMARY_JOB_QUEUE = int(os.environ.get('SUMMARY_JOB_QUEUE', '8'))
+SUMMARY_JOBS_KEPT = 100
+
+# Models load on first use; past this much RAM the least recently used one
+# is dropped (see registry.py, 0 = no limit). PRELOAD_MODELS are loaded at
+# startup instead, e.g. PRELOAD_MODELS=bert-base-uncased,t5-small
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get('MODEL_MEMORY_BUDGET_MB', '4096'))
+SUMMARIZER_MODEL = os.environ.get('SUMMARIZER_MODEL', 't5-small')
+PRELOAD_MODELS = [name.strip() for name in os.environ.get('PRELOAD_MODELS', '').split(',') if name.strip()]
+
+SUMMARIZER_MODELS = list(dict.fromkeys([
+    't5-small', 't5-base', 't5-large',
+    'facebook/bart-large-cnn',
+    'google/pegasus-xsum',
+    SUMMARIZER_MODEL
+]))
+# Shorthands accepted as a request's `model_type`
+SUMMARIZER_TYPES = {
+    't5': 't5-small',
+    'bart': 'facebook/bart-large-cnn',
+    'pegasus': 'google/pegasus-xsum'
+}
+
+# Created with BERT's first load, sized from its config
+embedding_cache = None
+
+result_cache = LRUCache(RESULT_CACHE_SIZE)
+
+def load_bert():
+    """BERT for sentence embeddings, shared by the extractive and hybrid paths"""
+    global embedding_cache
+
+    cache_dir = os.path.expanduser("~/.cache/huggingface/transformers")
+    os.makedirs(cache_dir, exist_ok=True)
     try:
-        print("Loading BERT models...")
-        cache_dir = os.path.expanduser("~/.cache/huggingface/transformers")
-        os.makedirs(cache_dir, exist_ok=True)
-
-        bert_tokenizer = BertTokenizer.from_pretrained(
-            'bert-base-uncased',
+        tokenizer = BertTokenizerFast.from_pretrained(
+            BERT_MODEL_NAME,
             cache_dir=cache_dir,
             local_files_only=True
         )
-        bert_model = BertModel.from_pretrained(
-            'bert-base-uncased',
+        model = load_model(
+            BERT_MODEL_NAME, BertModel,
+            compile_model=BERT_COMPILE,
             cache_dir=cache_dir,
             local_files_only=True
         )
         print("✅ BERT models loaded from cache")
-        return True
     except Exception as e:
         print(f"❌ Error loading BERT from cache: {e}")
-        try:
-            print("Downloading BERT models...")
-            bert_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-            bert_model = BertModel.from_pretrained('bert-base-uncased')
-            print("✅ BERT models downloaded and loaded")
-            return True
-        except Exception as e2:
-            print(f"❌ Error downloading BERT models: {e2}")
-            return False
-
-def load_summarizer_model(model_name='t5-small'):
-    """Load pretrained summarization model"""
-    global summarizer_model, summarizer_tokenizer
-
-    try:
-        print(f"Loading {model_name} summarization model...")
-
+        print("Downloading BERT models...")
+        tokenizer = BertTokenizerFast.from_pretrained(BERT_MODEL_NAME)
+        model = load_model(BERT_MODEL_NAME, BertModel, compile_model=BERT_COMPILE)
+        print("✅ BERT models downloaded and loaded")
+
+    if embedding_cache is None:
+        embedding_cache = create_embedding_cache(model.config.hidden_size)
+    return model, tokenizer
+
+def create_embedding_cache(hidden_size):
+    """Embedding cache for the BERT model, on disk under EMBEDDING_CACHE_DIR"""
+    store = EmbeddingStore(
+        os.path.join(EMBEDDING_CACHE_DIR, model_label(BERT_MODEL_NAME).replace('/', '--')),
+        hidden_size, EMBEDDING_CACHE_DISK
+    )
+    # Write the memory-mapped vectors back to disk when the process exits
+    atexit.register(store.flush)
+    return EmbeddingCache(store, EMBEDDING_CACHE_MEMORY, lowercase='uncased' in BERT_MODEL_NAME)
+
+def uses_pipeline(model_name):
+    """True for summarizers other than T5/BART, served through a pipeline and never quantized"""
+    return not any(kind in model_name.lower() for kind in ('t5', 'bart'))
+
+def summarizer_label(model_name):
+    """model_label for a summarizer at the precision it is actually loaded in"""
+    return model_label(model_name, 'fp32' if uses_pipeline(model_name) else INFERENCE_PRECISION)
+
+def summarizer_loader(model_name):
+    """Loader for a pretrained summarization model"""
+    def load():
         if 't5' in model_name.lower():
-            summarizer_tokenizer = T5Tokenizer.from_pretrained(model_name)
-            summarizer_model = T5ForConditionalGeneration.from_pretrained(model_name)
-        elif 'bart' in model_name.lower():
-            summarizer_tokenizer = BartTokenizer.from_pretrained(model_name)
-            summarizer_model = BartForConditionalGeneration.from_pretrained(model_name)
-        else:
-            # Use pipeline for other models
-            summarizer_model = pipeline('summarization', model=model_name, device='cpu')
-            summarizer_tokenizer = None
-
-        print(f"✅ {model_name} model loaded successfully")
-        return True
-    except Exception as e:
-        print(f"❌ Error loading {model_name}: {e}")
-        return False
+            tokenizer = T5Tokenizer.from_pretrained(model_name)
+            return load_model(model_name, T5ForConditionalGeneration), tokenizer
+        if 'bart' in model_name.lower():
+            tokenizer = BartTokenizer.from_pretrained(model_name)
+            return load_model(model_name, BartForConditionalGeneration), tokenizer
+        # Use pipeline for other models
+        configure_threads()
+        summarizer = pipeline('summarization', model=model_name, device='cpu')
+        return summarizer, summarizer.tokenizer
+    return load
+
+def resolve_summarizer(model=None):
+    """Catalogue name for a requested model or model_type (SUMMARIZER_MODEL if none)"""
+    name = SUMMARIZER_TYPES.get(model, model) or SUMMARIZER_MODEL
+    if name not in SUMMARIZER_MODELS:
+        raise ValueError(f"Unknown model '{model}' (choose from {', '.join(SUMMARIZER_MODELS)} "
+                         f"or {', '.join(SUMMARIZER_TYPES)})")
+    return name
+
+models = ModelRegistry(
+    {BERT_MODEL_NAME: load_bert, **{name: summarizer_loader(name) for name in SUMMARIZER_MODELS}},
+    MODEL_MEMORY_BUDGET_MB * 2**20
+)
 
 def split_into_sentences(text):
     """Simple sentence splitting"""
@@ -90,31 +173,42 @@ def split_into_sentences(text):
     return [s.strip() for s in sentences if s.strip()]
 
 def get_sentence_embeddings(sentences):
-    """Get BERT embeddings for sentences"""
-    if not bert_tokenizer or not bert_model:
-        return None
+    """BERT embeddings for the sentences long enough to be summary candidates.
 
-    embeddings = []
-    bert_model.eval()
+    Returns (indexes, embeddings): row i of embeddings belongs to
+    sentences[indexes[i]], so short sentences are skipped without
+    shifting the others out of place.
+    """
+    if embedding_cache is None:
+        try:
+            # The cache is created with BERT's first load
+            with models.use(BERT_MODEL_NAME):
+                pass
+        except ModelLoadError:
+            return None
 
-    with torch.no_grad():
-        for sentence in sentences:
-            if len(sentence) < 10:  # Skip very short sentences
-                continue
+    indexes = [i for i, sentence in enumerate(sentences) if len(sentence) >= MIN_SENTENCE_CHARS]
+    candidates = [sentences[i] for i in indexes]
+    if not candidates:
+        return np.array(indexes, dtype=np.int64), np.zeros((0, embedding_cache.store.dim), dtype=np.float32)
 
-            inputs = bert_tokenizer(sentence, return_tensors='pt',
-                                   truncation=True, max_length=512,
-                                   padding=True)
+    try:
+        vectors = embedding_cache.embed(candidates, embedding_batches.run)
+    except ModelLoadError:
+        return None
 
-            outputs = bert_model(**inputs)
-            # Use [CLS] token embedding
-            embedding = outputs.last_hidden_state[:, 0, :].squeeze().numpy()
-            embeddings.append(embedding)
+    return np.array(indexes, dtype=np.int64), np.stack(vectors)
 
-    return np.array(embeddings) if embeddings else None
+def embed_batch(sentence_lists):
+    """One encoder call for the sentences of several requests, split back per request"""
+    with models.use(BERT_MODEL_NAME) as bert:
+        encoder = SentenceEncoder(bert.tokenizer, bert.model, BERT_BATCH_SIZE, BERT_MAX_BATCH_TOKENS)
+        embeddings = encoder.encode([sentence for sentences in sentence_lists for sentence in sentences])
+    offsets = np.cumsum([0] + [len(sentences) for sentences in sentence_lists])
+    return [embeddings[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
 
-def extractive_summarize(text, num_sentences=3):
-    """Extractive summarization using BERT + clustering (like simplified BertSum)"""
+def extractive_summarize(text, num_sentences=3, selector=SUMMARY_SELECTOR):
+    """Extractive summarization using BERT + sentence selection (like simplified BertSum)"""
     if not text or len(text.strip()) < 50:
         return "Text too short for summarization"
 
@@ -122,98 +216,172 @@ def extractive_summarize(text, num_sentences=3):
     if len(sentences) <= num_sentences:
         return text
 
+    key = (text_key(text), 'extractive', num_sentences, model_label(BERT_MODEL_NAME), selector)
+    summary = result_cache.get(key)
+    if summary is not None:
+        return summary
+
     # Get embeddings
-    embeddings = get_sentence_embeddings(sentences)
-    if embeddings is None or len(embeddings) == 0:
+    embedded = get_sentence_embeddings(sentences)
+    if embedded is None or len(embedded[0]) == 0:
         return '. '.join(sentences[:num_sentences]) + '.'
 
-    # Use clustering to find representative sentences
-    try:
-        n_clusters = min(num_sentences, len(embeddings))
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        cluster_labels = kmeans.fit_predict(embeddings)
-
-        # Find sentences closest to cluster centers
-        selected_sentences = []
-        for i in range(n_clusters):
-            cluster_points = embeddings[cluster_labels == i]
-            center = kmeans.cluster_centers_[i]
-
-            distances = np.linalg.norm(cluster_points - center, axis=1)
-            closest_idx = np.argmin(distances)
-
-            cluster_indices = np.where(cluster_labels == i)[0]
-            original_idx = cluster_indices[closest_idx]
+    indexes, embeddings = embedded
 
-            selected_sentences.append((original_idx, sentences[original_idx]))
-
-        # Sort by original order
-        selected_sentences.sort(key=lambda x: x[0])
-        summary = '. '.join([s[1] for s in selected_sentences]) + '.'
+    # Pick representative sentences
+    try:
+        picks = select_sentences(embeddings, num_sentences, selector)
+        # picks are in document order, so the summary keeps the original order
+        summary = '. '.join(sentences[indexes[i]] for i in picks) + '.'
 
+        result_cache.set(key, summary)
         return summary
 
     except Exception as e:
-        print(f"Clustering error: {e}")
+        print(f"Sentence selection error: {e}")
         return '. '.join(sentences[:num_sentences]) + '.'
 
-def abstractive_summarize(text, model_type='t5'):
-    """Abstractive summarization using pretrained models"""
-    if not summarizer_model:
-        return "Summarization model not loaded"
+def generate_summaries(model_name, texts):
+    """Abstractive summaries for several texts in one generate() call"""
+    with models.use(model_name) as loaded:
+        summarizer, tokenizer = loaded.model, loaded.tokenizer
 
-    try:
         # Check if using pipeline (has __class__.__name__ attribute)
-        if hasattr(summarizer_model, '__class__') and 'Pipeline' in summarizer_model.__class__.__name__:
-            # Using pipeline
-            result = summarizer_model(text, max_length=150, min_length=30, do_sample=False)
-            return result[0]['summary_text']
-        else:
-            # Using direct model
-            inputs = summarizer_tokenizer("summarize: " + text, return_tensors="pt", max_length=512, truncation=True)
-
-            with torch.no_grad():
-                if 't5' in model_type.lower():
-                    outputs = summarizer_model.generate(
-                        inputs.input_ids,
-                        max_length=150,
-                        min_length=30,
-                        num_beams=4,
-                        early_stopping=True
-                    )
-                else:  # BART
-                    outputs = summarizer_model.generate(
-                        inputs.input_ids,
-                        max_length=150,
-                        min_length=30,
-                        num_beams=4,
-                        early_stopping=True
-                    )
-
-            summary = summarizer_tokenizer.decode(outputs[0], skip_special_tokens=True)
-            return summary
-
+        if hasattr(summarizer, '__class__') and 'Pipeline' in summarizer.__class__.__name__:
+            results = summarizer(texts, max_length=150, min_length=30, do_sample=False)
+            return [result['summary_text'] for result in results]
+
+        # T5 is told the task in its input; BART is a summarizer only
+        prefix = "summarize: " if 't5' in model_name.lower() else ""
+        inputs = tokenizer([prefix + text for text in texts], return_tensors="pt",
+                           max_length=512, truncation=True, padding=True)
+        with torch.inference_mode():
+            outputs = summarizer.generate(
+                inputs.input_ids,
+                attention_mask=inputs.attention_mask,
+                max_length=150,
+                min_length=30,
+                num_beams=4,
+                early_stopping=True
+            )
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+def generate_batch(items):
+    """(model name, text) items from concurrent requests: one generate() per model, results in order"""
+    positions = OrderedDict()
+    for i, (model_name, _) in enumerate(items):
+        positions.setdefault(model_name, []).append(i)
+
+    results = [None] * len(items)
+    for model_name, indexes in positions.items():
+        try:
+            summaries = generate_summaries(model_name, [items[i][1] for i in indexes])
+        except Exception as e:
+            # Fails only the requests for this model
+            summaries = [e] * len(indexes)
+        for i, summary in zip(indexes, summaries):
+            results[i] = summary
+    return results
+
+def cached_generate(text, model_name=SUMMARIZER_MODEL):
+    """Abstractive summary of one text, from the result cache when possible; raises on failure"""
+    key = (text_key(text), 'abstractive', None, summarizer_label(model_name), None)
+    summary = result_cache.get(key)
+    if summary is None:
+        summary = generation_batches.run((model_name, text))
+        result_cache.set(key, summary)
+    return summary
+
+def abstractive_summarize(text, model_type=None):
+    """Abstractive summarization using pretrained models"""
+    try:
+        model_name = resolve_summarizer(model_type)
+        if count_tokens([text], model_name)[0] > HIERARCHICAL_CHUNK_TOKENS:
+            # Longer than one model input: summarize in chunks instead of truncating
+            return hierarchical_summarize(text, model_name=model_name)
+        return cached_generate(text, model_name)
+    except QueueFull:
+        raise
+    except ModelLoadError as e:
+        print(f"Summarization error: {e}")
+        return "Summarization model not loaded"
     except Exception as e:
         print(f"Summarization error: {e}")
         return f"Error generating summary: {str(e)}"
 
-def hybrid_summarize(text, num_sentences=2, use_abstractive=True):
+def hybrid_summarize(text, num_sentences=2, use_abstractive=True, selector=SUMMARY_SELECTOR, model_type=None):
     """Hybrid approach: Extractive selection + Abstractive generation"""
     try:
-        # First, do extractive summarization to get key sentences
-        extractive_summary = extractive_summarize(text, num_sentences)
+        if not use_abstractive:
+            return extractive_summarize(text, num_sentences, selector)
 
-        if not use_abstractive or not summarizer_model:
-            return extractive_summary
+        model_name = resolve_summarizer(model_type)
+        key = (text_key(text), 'hybrid', num_sentences, summarizer_label(model_name), selector)
+        refined_summary = result_cache.get(key)
+        if refined_summary is None:
+            # First, do extractive summarization to get key sentences
+            extractive_summary = extractive_summarize(text, num_sentences, selector)
 
-        # Then use abstractive model to refine/improve the summary
-        refined_summary = abstractive_summarize(extractive_summary, 't5')
+            # Then use abstractive model to refine/improve the summary
+            refined_summary = cached_generate(extractive_summary, model_name)
+            result_cache.set(key, refined_summary)
 
         return refined_summary
 
+    except QueueFull:
+        raise
     except Exception as e:
         print(f"Hybrid summarization error: {e}")
-        return extractive_summarize(text, num_sentences)
+        return extractive_summarize(text, num_sentences, selector)
+
+def count_tokens(sentences, model_name=None):
+    """Model tokens in each sentence, counted with model_name's tokenizer (BERT's if None)"""
+    if not sentences:
+        return []
+    with models.use(model_name or BERT_MODEL_NAME) as loaded:
+        return [len(ids) for ids in loaded.tokenizer(sentences, add_special_tokens=False)['input_ids']]
+
+def summarize_chunk(chunk, model_name=None):
+    """Summary of one chunk of a long document: abstractive with model_name, else extractive"""
+    if len(chunk) < 50:
+        return chunk
+    if model_name:
+        return cached_generate(chunk, model_name)
+    return extractive_summarize(chunk, HIERARCHICAL_CHUNK_SENTENCES)
+
+def map_reduce(text, model_name, progress):
+    return map_reduce_summarize(
+        text, split_into_sentences, partial(count_tokens, model_name=model_name),
+        partial(summarize_chunk, model_name=model_name), chunk_pool,
+        max_tokens=HIERARCHICAL_CHUNK_TOKENS, window=HIERARCHICAL_WORKERS, progress=progress
+    )
+
+def hierarchical_summarize(text, progress=None, model_name=SUMMARIZER_MODEL):
+    """Map-reduce summary of a document of any length"""
+    key = (text_key(text), 'hierarchical', None, summarizer_label(model_name), None)
+    summary = result_cache.get(key)
+    if summary is None:
+        try:
+            # Held for the whole document, so it isn't evicted between chunks
+            with models.use(model_name):
+                summary = map_reduce(text, model_name, progress)
+        except ModelLoadError as e:
+            print(f"⚠️  {e}; summarizing the chunks extractively")
+            return map_reduce(text, None, progress)
+        result_cache.set(key, summary)
+    return summary
+
+embedding_batches = BatchScheduler(embed_batch, 'embedding', BATCH_MAX_SIZE,
+                                   BATCH_MAX_WAIT_MS / 1000, BATCH_MAX_QUEUE, BATCH_TIMEOUT)
+generation_batches = BatchScheduler(generate_batch, 'generation', BATCH_MAX_SIZE,
+                                    BATCH_MAX_WAIT_MS / 1000, BATCH_MAX_QUEUE, BATCH_TIMEOUT)
+chunk_pool = ThreadPoolExecutor(max_workers=HIERARCHICAL_WORKERS, thread_name_prefix='chunk')
+
+# Background summary jobs by id, oldest first; finished ones are dropped
+# beyond SUMMARY_JOBS_KEPT
+summary_jobs = OrderedDict()
+summary_jobs_lock = threading.Lock()
+job_pool = ThreadPoolExecutor(max_workers=SUMMARY_JOB_WORKERS, thread_name_prefix='summary-job')
 
 @app.route('/')
 def home():
@@ -225,7 +393,10 @@ def summarize():
         data = request.get_json()
         text = data.get('text', '').strip()
         num_sentences = data.get('num_sentences', 2)
-        method = data.get('method', 'extractive')  # extractive, abstractive, hybrid
+        selector = data.get('selector', SUMMARY_SELECTOR)
+        method = data.get('method', 'extractive')  # extractive, abstractive, hybrid, hierarchical
+        # Summarizer for abstractive, hybrid and hierarchical: a name from /models or t5, bart, pegasus
+        model = data.get('model') or data.get('model_type')
 
         if not text:
             return jsonify({'error': 'No text provided'})
@@ -233,30 +404,129 @@ def summarize():
         if len(text) < 50:
             return jsonify({'error': 'Text too short (minimum 50 characters)'})
 
+        if selector not in SELECTORS:
+            return jsonify({'error': f"Unknown selector '{selector}' (choose from {', '.join(SELECTORS)})"})
+
+        model_name = resolve_summarizer(model)
+        progress = Progress()
+
         # Choose summarization method
         if method == 'abstractive':
-            summary = abstractive_summarize(text, 't5')
+            summary = abstractive_summarize(text, model_name)
+        elif method == 'hierarchical':
+            summary = hierarchical_summarize(text, progress, model_name)
         elif method == 'hybrid':
-            summary = hybrid_summarize(text, num_sentences, use_abstractive=True)
+            summary = hybrid_summarize(text, num_sentences, use_abstractive=True, selector=selector,
+                                       model_type=model_name)
         else:  # extractive (default)
-            summary = extractive_summarize(text, num_sentences)
+            summary = extractive_summarize(text, num_sentences, selector)
 
         return jsonify({
             'summary': summary,
             'method': method,
+            'selector': selector if method in ('extractive', 'hybrid') else None,
+            'model': model_name if method != 'extractive' else BERT_MODEL_NAME,
+            'levels': progress.snapshot() if method == 'hierarchical' else None,
             'original_length': len(text),
             'summary_length': len(summary)
         })
 
+    except QueueFull:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)})
 
+def job_view(job):
+    levels = job['progress'].snapshot()
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'model': job['model'],
+        'levels': levels,
+        'chunks_done': sum(level['done'] for level in levels),
+        'chunks_total': sum(level['chunks'] for level in levels),
+        'summary': job['summary'],
+        'error': job['error'],
+        'seconds': round((job['finished_at'] or time.time()) - job['created_at'], 3),
+    }
+
+def run_summary_job(job, text, model_name):
+    job['status'] = 'running'
+    try:
+        job['summary'] = hierarchical_summarize(text, job['progress'], model_name)
+        job['status'] = 'done'
+    except Exception as e:
+        print(f"Summary job {job['id']} failed: {e}")
+        job['error'] = str(e)
+        job['status'] = 'failed'
+    job['finished_at'] = time.time()
+
+@app.route('/summarize/jobs', methods=['POST'])
+def create_summary_job():
+    """Start a hierarchical summary in the background; poll the returned URL for per-chunk progress"""
+    data = request.get_json()
+    text = data.get('text', '').strip()
+    if len(text) < 50:
+        return jsonify({'error': 'Text too short (minimum 50 characters)'}), 400
+    try:
+        model_name = resolve_summarizer(data.get('model') or data.get('model_type'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    job = {
+        'id': uuid.uuid4().hex,
+        'status': 'queued',
+        'model': model_name,
+        'progress': Progress(),
+        'summary': None,
+        'error': None,
+        'created_at': time.time(),
+        'finished_at': None,
+    }
+    with summary_jobs_lock:
+        if sum(1 for other in summary_jobs.values() if other['status'] in ('queued', 'running')) >= SUMMARY_JOB_QUEUE:
+            raise QueueFull('Too many summary jobs running, try again later')
+        summary_jobs[job['id']] = job
+        finished = [job_id for job_id, other in summary_jobs.items() if other['status'] in ('done', 'failed')]
+        for job_id in finished[:max(len(summary_jobs) - SUMMARY_JOBS_KEPT, 0)]:
+            del summary_jobs[job_id]
+
+    job_pool.submit(run_summary_job, job, text, model_name)
+    return jsonify(job_view(job)), 202, {'Location': f"/summarize/jobs/{job['id']}"}
+
+@app.route('/summarize/jobs/<job_id>')
+def get_summary_job(job_id):
+    with summary_jobs_lock:
+        job = summary_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_view(job))
+
+@app.errorhandler(QueueFull)
+def handle_queue_full(error):
+    """Model batches are not keeping up with incoming requests"""
+    return jsonify({'error': str(error)}), 503, {'Retry-After': '1'}
+
 @app.route('/health')
 def health():
     return jsonify({
         'status': 'healthy',
-        'bert_loaded': bert_tokenizer is not None and bert_model is not None,
-        'summarizer_loaded': summarizer_model is not None
+        'bert_loaded': BERT_MODEL_NAME in models,
+        'summarizer_loaded': any(name in models for name in SUMMARIZER_MODELS),
+        'models': models.stats(),
+        'inference': {
+            'precision': INFERENCE_PRECISION,
+            'threads': {'intra_op': torch.get_num_threads(), 'inter_op': torch.get_num_interop_threads()},
+            'bert_compiled': BERT_COMPILE
+        },
+        'cache': {
+            'embeddings': embedding_cache.stats() if embedding_cache else None,
+            'results': result_cache.stats()
+        },
+        'batching': {
+            'embedding': embedding_batches.stats(),
+            'generation': generation_batches.stats()
+        }
     })
 
 @app.route('/models')
@@ -264,12 +534,13 @@ def get_available_models():
     """Get list of available pretrained models"""
     return jsonify({
         'extractive': ['bert-clustering (no training required)'],
-        'abstractive': [
-            't5-small', 't5-base', 't5-large',
-            'facebook/bart-large-cnn',
-            'google/pegasus-xsum'
-        ],
-        'hybrid': ['bert-selection + t5-refinement']
+        'selectors': list(SELECTORS),
+        'abstractive': SUMMARIZER_MODELS,
+        'default_summarizer': SUMMARIZER_MODEL,
+        'model_types': SUMMARIZER_TYPES,
+        'memory_budget_mb': MODEL_MEMORY_BUDGET_MB or None,
+        'hybrid': ['bert-selection + abstractive refinement (any abstractive model)'],
+        'hierarchical': ['chunked map-reduce with the abstractive model (any length)']
     })
 
 if __name__ == '__main__':
@@ -278,21 +549,23 @@ if __name__ == '__main__':
     print("This version uses pretrained models without training!")
     print()
 
-    # Load BERT for extractive summarization
-    if not load_bert_models():
-        print("❌ Failed to load BERT models")
-        exit(1)
+    threads = configure_threads()
+    print(f"🧵 torch threads: {threads['intra_op']} intra-op, {threads['inter_op']} inter-op ({INFERENCE_PRECISION})")
 
-    # Load T5 for abstractive summarization
-    if not load_summarizer_model('t5-small'):
-        print("⚠️  T5 model failed to load, but BERT extractive will still work")
+    # Models load on first use; PRELOAD_MODELS are warmed up now instead
+    print(f"🧠 Model memory budget: {MODEL_MEMORY_BUDGET_MB or 'unlimited'} MB, default summarizer: {SUMMARIZER_MODEL}")
+    for name in PRELOAD_MODELS:
+        try:
+            with models.use(name):
+                pass
+        except ModelLoadError:
+            print(f"⚠️  {name} failed to load, it will be retried on first use")
 
-    print("✅ Models loaded successfully!")
     print("🌐 Starting server on http://localhost:5001")
     print()
     print("📝 Available summarization methods:")
     print("   • Extractive: BERT + clustering (like simplified BertSum)")
-    print("   • Abstractive: T5/BART pretrained models")
+    print("   • Abstractive: T5/BART/Pegasus pretrained models (pick one per request)")
     print("   • Hybrid: Extractive selection + Abstractive refinement")
     print()
     print("🎯 Open your browser and start summarizing!")
@@ -0,0 +1,181 @@
+"""
+Lazily loaded models under a RAM budget
+
+Every model the app can serve is registered by name with a loader, but
+nothing is loaded until a request first needs it. Each load is measured
+(growth of the process's resident memory, or the size of the model's
+tensors if that is larger), and when the loaded models add up to more
+than the budget, the least recently used ones are dropped until they
+fit again. A model that a request is still using is never dropped; it
+is evicted on a later load instead.
+
+Use a model with `with registry.use(name) as loaded:` so it counts as in
+use for the duration of the block.
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class ModelLoadError(Exception):
+    """Raised when a registered model can't be loaded"""
+
+class LoadedModel:
+    """A model, its tokenizer and what it costs to keep it in memory"""
+
+    def __init__(self, name, model, tokenizer, size_bytes, load_seconds):
+        self.name = name
+        self.model = model
+        self.tokenizer = tokenizer
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.last_used = time.time()
+        self.uses = 0
+        self.in_use = 0
+
+def rss_bytes():
+    """Resident memory of this process (Linux), or None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return None
+
+def tensor_bytes(model):
+    """Bytes held by a torch module's parameters and buffers (a pipeline's .model)"""
+    module = model if hasattr(model, 'parameters') else model.model
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+class ModelRegistry:
+    """Loads models by name on first use and evicts the least recently used over budget_bytes.
+
+    loaders maps a name to a function returning (model, tokenizer). A
+    budget of 0 means no limit.
+    """
+
+    def __init__(self, loaders, budget_bytes=0):
+        self.loaders = dict(loaders)
+        self.budget_bytes = budget_bytes
+
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        # One load at a time, so each memory measurement is of one model only
+        self._load_lock = threading.Lock()
+        # Sizes seen before, to make room before reloading an evicted model
+        self._known_sizes = {}
+        self._loads = 0
+        self._evictions = 0
+        self._failures = 0
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._models
+
+    @contextmanager
+    def use(self, name):
+        """The loaded model for `name`, loading it first if needed"""
+        loaded = self._acquire(name)
+        try:
+            yield loaded
+        finally:
+            with self._lock:
+                loaded.in_use -= 1
+
+    def _acquire(self, name):
+        if name not in self.loaders:
+            raise ModelLoadError(f"Unknown model '{name}' (choose from {', '.join(self.loaders)})")
+
+        with self._lock:
+            loaded = self._checkout(name)
+        if loaded:
+            return loaded
+
+        with self._load_lock:
+            # Another request may have loaded it while this one waited
+            with self._lock:
+                loaded = self._checkout(name)
+                if loaded:
+                    return loaded
+                evicted = self._evict(self._known_sizes.get(name, 0))
+            if evicted:
+                # Free evicted weights (HF models hold reference cycles) before loading more
+                gc.collect()
+
+            print(f"Loading {name}...")
+            start = time.perf_counter()
+            rss_before = rss_bytes()
+            try:
+                model, tokenizer = self.loaders[name]()
+            except Exception as e:
+                with self._lock:
+                    self._failures += 1
+                print(f"❌ Error loading {name}: {e}")
+                raise ModelLoadError(f"Could not load {name}: {e}") from e
+            rss_after = rss_bytes()
+
+            size = tensor_bytes(model)
+            if rss_before is not None and rss_after is not None:
+                size = max(size, rss_after - rss_before)
+            loaded = LoadedModel(name, model, tokenizer, size, time.perf_counter() - start)
+            print(f"✅ {name} loaded ({size / 2**20:.0f} MB in {loaded.load_seconds:.1f}s)")
+
+            with self._lock:
+                self._known_sizes[name] = size
+                self._loads += 1
+                self._models[name] = loaded
+                loaded = self._checkout(name)
+                self._evict(0)
+            return loaded
+
+    def _checkout(self, name):
+        loaded = self._models.get(name)
+        if loaded:
+            self._models.move_to_end(name)
+            loaded.last_used = time.time()
+            loaded.uses += 1
+            loaded.in_use += 1
+        return loaded
+
+    def _evict(self, incoming_bytes):
+        """Drop least recently used idle models until incoming_bytes more fit the budget; returns how many"""
+        if not self.budget_bytes:
+            return 0
+        evicted = 0
+        resident = sum(loaded.size_bytes for loaded in self._models.values())
+        for name in list(self._models):
+            if resident + incoming_bytes <= self.budget_bytes:
+                break
+            loaded = self._models[name]
+            if loaded.in_use:
+                continue
+            del self._models[name]
+            resident -= loaded.size_bytes
+            self._evictions += 1
+            evicted += 1
+            print(f"♻️  Evicted {name} ({loaded.size_bytes / 2**20:.0f} MB) to stay within the model memory budget")
+        return evicted
+
+    def stats(self):
+        """Loaded models (least recently used first) and load/eviction counters"""
+        with self._lock:
+            models = [{
+                'name': loaded.name,
+                'size_mb': round(loaded.size_bytes / 2**20, 1),
+                'load_seconds': round(loaded.load_seconds, 2),
+                'uses': loaded.uses,
+                'in_use': loaded.in_use,
+                'idle_seconds': round(time.time() - loaded.last_used, 1),
+            } for loaded in self._models.values()]
+            return {
+                'budget_mb': round(self.budget_bytes / 2**20, 1) if self.budget_bytes else None,
+                'resident_mb': round(sum(loaded.size_bytes for loaded in self._models.values()) / 2**20, 1),
+                'loaded': models,
+                'available': list(self.loaders),
+                'loads': self._loads,
+                'evictions': self._evictions,
+                'failures': self._failures,
+            }
@@ -0,0 +1,163 @@
+"""
+Cross-request micro-batching for model inference
+
+Concurrent /summarize requests each submit their piece of work (a list of
+sentences to embed, a text to summarize) to a BatchScheduler. One worker
+thread per scheduler takes the first queued item, waits at most max_wait
+seconds for up to max_batch - 1 more, and runs them through the model in
+a single call. Each request blocks on its own Future until its batch is
+done. Running the model from one thread also stops concurrent requests
+from fighting over torch's CPU threads.
+
+When max_queue items are already waiting, submit() raises QueueFull
+straight away so the app can answer 503 instead of piling up requests.
+A caller that waits longer than the scheduler's timeout gets BatchTimeout
+(a QueueFull, so it is answered with 503 too); if its item had not been
+picked up yet, it is dropped from the queue without running.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+class QueueFull(Exception):
+    """Raised when a scheduler already has max_queue items waiting"""
+
+class BatchTimeout(QueueFull):
+    """Raised when an item's result took longer than the scheduler's timeout"""
+
+class BatchScheduler:
+    """Groups items from concurrent callers into batches for run_batch.
+
+    run_batch(items) must return one result per item, in order. If it
+    raises, every caller in that batch gets the exception; an exception
+    returned in place of a result fails only that item's caller. run()
+    gives up after timeout seconds (None waits forever).
+    """
+
+    def __init__(self, run_batch, name, max_batch=16, max_wait=0.005, max_queue=64, timeout=None):
+        self.run_batch = run_batch
+        self.name = name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._max_batch_seen = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seen = 0.0
+        self._run_seconds = 0.0
+        # Batch sizes bucketed by upper bound (1, 2, 4, ... max_batch)
+        self._batch_sizes = {}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f'{self.name}-batches', daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, item):
+        """Queue one item; returns a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFull(f'Too many {self.name} requests queued, try again later')
+        return future
+
+    def run(self, item, timeout=None):
+        """Queue one item and wait for its result, at most timeout (or self.timeout) seconds"""
+        future = self.submit(item)
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            # Only succeeds while the item is still queued; a running batch finishes anyway
+            future.cancel()
+            with self._lock:
+                self._timeouts += 1
+            raise BatchTimeout(f'{self.name} request timed out, try again later') from None
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.perf_counter(), 0)))
+                except queue.Empty:
+                    break
+
+            self._process(batch)
+
+    def _process(self, batch):
+        # Drop items whose callers already gave up
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        waits = [start - queued_at for _, _, queued_at in batch]
+
+        try:
+            results = self.run_batch([item for item, _, _ in batch])
+            error = None
+        except Exception as e:
+            results = [None] * len(batch)
+            error = e
+
+        for (_, future, _), result in zip(batch, results):
+            if error is not None:
+                future.set_exception(error)
+            elif isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+        bucket = 1
+        while bucket < len(batch):
+            bucket *= 2
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._errors += error is not None
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._wait_seconds += sum(waits)
+            self._max_wait_seen = max(self._max_wait_seen, max(waits))
+            self._run_seconds += time.perf_counter() - start
+            self._batch_sizes[bucket] = self._batch_sizes.get(bucket, 0) + 1
+
+    def stats(self):
+        """Snapshot of queue depth, batch sizes and queueing delay"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_batch': self.max_batch,
+                'max_wait_seconds': self.max_wait,
+                'batches': self._batches,
+                'items': self._items,
+                'errors': self._errors,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'batch_size_avg': round(self._items / self._batches, 2) if self._batches else 0.0,
+                'batch_size_max': self._max_batch_seen,
+                'batch_sizes': {f'le_{size}': count for size, count
+                                in sorted(self._batch_sizes.items())},
+                'wait_seconds_avg': round(self._wait_seconds / self._items, 6) if self._items else 0.0,
+                'wait_seconds_max': round(self._max_wait_seen, 6),
+                'run_seconds_total': round(self._run_seconds, 6),
+            }
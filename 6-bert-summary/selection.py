@@ -0,0 +1,139 @@
+"""
+Sentence selection strategies for extractive summaries
+
+Each selector takes an (n, d) array of sentence embeddings and k, and
+returns the row indexes of the chosen sentences in document order. All
+of them except sklearn-kmeans are plain NumPy and deterministic, and
+work on row-normalized embeddings (cosine similarity):
+
+- centroid:       the k sentences most similar to the document centroid
+- mmr:            maximal marginal relevance; centroid similarity traded
+                  off against similarity to the sentences already picked
+- textrank:       PageRank over the cosine-similarity graph
+- kmeans:         k-means++ with a single seeded init, then the sentence
+                  nearest each centre (the apps' default)
+- sklearn-kmeans: scikit-learn KMeans(n_init=10), the original selector,
+                  kept for comparison
+"""
+
+import numpy as np
+
+DEFAULT_SELECTOR = 'kmeans'
+SEED = 42
+MMR_LAMBDA = 0.7
+TEXTRANK_DAMPING = 0.85
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-6
+
+def normalize_rows(embeddings):
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+def centroid_scores(unit):
+    """Cosine similarity of every (unit-length) sentence to the document centroid"""
+    return unit @ normalize_rows(unit.mean(axis=0, keepdims=True))[0]
+
+def select_centroid(embeddings, k):
+    scores = centroid_scores(normalize_rows(embeddings))
+    return np.sort(np.argsort(-scores, kind='stable')[:k])
+
+def select_mmr(embeddings, k, diversity=1 - MMR_LAMBDA):
+    unit = normalize_rows(embeddings)
+    relevance = centroid_scores(unit)
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of each sentence to anything selected so far. Only
+    # the k rows of the similarity matrix that are needed get computed.
+    redundancy = unit @ unit[selected[0]]
+    while len(selected) < k:
+        scores = (1 - diversity) * relevance - diversity * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(redundancy, unit @ unit[best], out=redundancy)
+    return np.sort(selected)
+
+def select_textrank(embeddings, k):
+    unit = normalize_rows(embeddings)
+    n = len(unit)
+    weights = np.clip(unit @ unit.T, 0, None)
+    np.fill_diagonal(weights, 0)
+
+    # Row-stochastic transition matrix; sentences with no edges jump anywhere
+    totals = weights.sum(axis=1, keepdims=True)
+    transition = np.where(totals > 0, weights / np.where(totals > 0, totals, 1), 1 / n)
+
+    scores = np.full(n, 1 / n)
+    for _ in range(MAX_ITERATIONS):
+        updated = (1 - TEXTRANK_DAMPING) / n + TEXTRANK_DAMPING * (scores @ transition)
+        converged = np.abs(updated - scores).sum() < TOLERANCE
+        scores = updated
+        if converged:
+            break
+    return np.sort(np.argsort(-scores, kind='stable')[:k])
+
+def kmeans_plus_plus(points, k, rng):
+    """k-means++ seeding: each new centre drawn in proportion to squared distance"""
+    centres = [points[rng.integers(len(points))]]
+    distances = ((points - centres[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = distances.sum()
+        if total <= 0:
+            break
+        centres.append(points[rng.choice(len(points), p=distances / total)])
+        distances = np.minimum(distances, ((points - centres[-1]) ** 2).sum(axis=1))
+    return np.array(centres)
+
+def select_kmeans(embeddings, k):
+    points = np.asarray(embeddings, dtype=np.float64)
+    centres = kmeans_plus_plus(points, k, np.random.default_rng(SEED))
+    squared_norms = (points ** 2).sum(axis=1)
+
+    labels = None
+    for _ in range(MAX_ITERATIONS):
+        # Squared distances of every point to every centre, without an (n, k, d) temporary
+        distances = squared_norms[:, None] - 2 * points @ centres.T + (centres ** 2).sum(axis=1)
+        new_labels = distances.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for cluster in range(len(centres)):
+            members = points[labels == cluster]
+            if len(members):
+                centres[cluster] = members.mean(axis=0)
+
+    # The member nearest each final centre
+    distances = squared_norms[:, None] - 2 * points @ centres.T + (centres ** 2).sum(axis=1)
+    picks = []
+    for cluster in range(len(centres)):
+        members = np.flatnonzero(labels == cluster)
+        if len(members):
+            picks.append(int(members[np.argmin(distances[members, cluster])]))
+    return np.sort(np.array(picks, dtype=np.int64))
+
+def select_sklearn_kmeans(embeddings, k):
+    from sklearn.cluster import KMeans
+
+    kmeans = KMeans(n_clusters=k, random_state=SEED, n_init=10)
+    labels = kmeans.fit_predict(embeddings)
+    picks = []
+    for cluster in range(k):
+        members = np.flatnonzero(labels == cluster)
+        distances = np.linalg.norm(embeddings[members] - kmeans.cluster_centers_[cluster], axis=1)
+        picks.append(int(members[np.argmin(distances)]))
+    return np.sort(picks)
+
+SELECTORS = {
+    'centroid': select_centroid,
+    'mmr': select_mmr,
+    'textrank': select_textrank,
+    'kmeans': select_kmeans,
+    'sklearn-kmeans': select_sklearn_kmeans,
+}
+
+def select_sentences(embeddings, k, selector=DEFAULT_SELECTOR):
+    """Row indexes of the k sentences `selector` picks, in document order"""
+    k = min(k, len(embeddings))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    return SELECTORS[selector](embeddings, k)
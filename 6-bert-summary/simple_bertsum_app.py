@@ -7,21 +7,39 @@ Uses pre-trained BERT for extractive text summarization
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
 import torch
-from transformers import BertTokenizer, BertModel
+from transformers import BertTokenizerFast, BertModel
 import numpy as np
-from sklearn.cluster import KMeans
 import os
+from embeddings import SentenceEncoder
+from optimize import BERT_COMPILE, INFERENCE_PRECISION, configure_threads, load_model
+from scheduler import BatchScheduler, QueueFull
+from selection import DEFAULT_SELECTOR, SELECTORS, select_sentences
 
 app = Flask(__name__)
 CORS(app)
 
+# Sentence embedding batches (see embeddings.py)
+BERT_BATCH_SIZE = int(os.environ.get('BERT_BATCH_SIZE', '32'))
+BERT_MAX_BATCH_TOKENS = int(os.environ.get('BERT_MAX_BATCH_TOKENS', '8192'))
+# Sentences shorter than this are never picked for a summary
+MIN_SENTENCE_CHARS = 10
+# Default sentence selector (see selection.py); requests may pass `selector`
+SUMMARY_SELECTOR = os.environ.get('SUMMARY_SELECTOR', DEFAULT_SELECTOR)
+
+# Cross-request batching of BERT calls (see scheduler.py)
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '16'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', '5'))
+BATCH_MAX_QUEUE = int(os.environ.get('BATCH_MAX_QUEUE', '64'))
+BATCH_TIMEOUT = float(os.environ.get('BATCH_TIMEOUT', '60'))
+
 # Global variables for models
 tokenizer = None
 model = None
+encoder = None
 
 def load_models():
     """Load BERT models (with caching)"""
-    global tokenizer, model
+    global tokenizer, model, encoder
 
     try:
         print("Loading BERT models...")
@@ -29,24 +47,27 @@ def load_models():
         cache_dir = os.path.expanduser("~/.cache/huggingface/transformers")
         os.makedirs(cache_dir, exist_ok=True)
 
-        tokenizer = BertTokenizer.from_pretrained(
+        tokenizer = BertTokenizerFast.from_pretrained(
             'bert-base-uncased',
             cache_dir=cache_dir,
             local_files_only=True  # Use only local files
         )
-        model = BertModel.from_pretrained(
-            'bert-base-uncased',
+        model = load_model(
+            'bert-base-uncased', BertModel,
+            compile_model=BERT_COMPILE,
             cache_dir=cache_dir,
             local_files_only=True  # Use only local files
         )
+        encoder = SentenceEncoder(tokenizer, model, BERT_BATCH_SIZE, BERT_MAX_BATCH_TOKENS)
         print("✅ Models loaded from cache")
         return True
     except Exception as e:
         print(f"❌ Error loading from cache: {e}")
         try:
             print("Trying to download models...")
-            tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-            model = BertModel.from_pretrained('bert-base-uncased')
+            tokenizer = BertTokenizerFast.from_pretrained('bert-base-uncased')
+            model = load_model('bert-base-uncased', BertModel, compile_model=BERT_COMPILE)
+            encoder = SentenceEncoder(tokenizer, model, BERT_BATCH_SIZE, BERT_MAX_BATCH_TOKENS)
             print("✅ Models downloaded and loaded")
             return True
         except Exception as e2:
@@ -60,31 +81,29 @@ def split_into_sentences(text):
     return [s.strip() for s in sentences if s.strip()]
 
 def get_sentence_embeddings(sentences):
-    """Get BERT embeddings for sentences"""
-    if not tokenizer or not model:
-        return None
+    """BERT embeddings for the sentences long enough to be summary candidates.
 
-    embeddings = []
-    model.eval()
-
-    with torch.no_grad():
-        for sentence in sentences:
-            if len(sentence) < 10:  # Skip very short sentences
-                continue
+    Returns (indexes, embeddings): row i of embeddings belongs to
+    sentences[indexes[i]], so short sentences are skipped without
+    shifting the others out of place.
+    """
+    if not encoder:
+        return None
 
-            inputs = tokenizer(sentence, return_tensors='pt',
-                             truncation=True, max_length=512,
-                             padding=True)
+    indexes = [i for i, sentence in enumerate(sentences) if len(sentence) >= MIN_SENTENCE_CHARS]
+    return np.array(indexes, dtype=np.int64), embedding_batches.run([sentences[i] for i in indexes])
 
-            outputs = model(**inputs)
-            # Use [CLS] token embedding
-            embedding = outputs.last_hidden_state[:, 0, :].squeeze().numpy()
-            embeddings.append(embedding)
+def embed_batch(sentence_lists):
+    """One encoder call for the sentences of several requests, split back per request"""
+    embeddings = encoder.encode([sentence for sentences in sentence_lists for sentence in sentences])
+    offsets = np.cumsum([0] + [len(sentences) for sentences in sentence_lists])
+    return [embeddings[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
 
-    return np.array(embeddings) if embeddings else None
+embedding_batches = BatchScheduler(embed_batch, 'embedding', BATCH_MAX_SIZE,
+                                   BATCH_MAX_WAIT_MS / 1000, BATCH_MAX_QUEUE, BATCH_TIMEOUT)
 
-def summarize_text(text, num_sentences=3):
-    """Summarize text using BERT embeddings and clustering"""
+def summarize_text(text, num_sentences=3, selector=SUMMARY_SELECTOR):
+    """Summarize text by picking representative sentences from their BERT embeddings"""
     if not text or len(text.strip()) < 50:
         return "Text too short for summarization"
 
@@ -93,43 +112,23 @@ def summarize_text(text, num_sentences=3):
         return text  # Return original if already short
 
     # Get embeddings
-    embeddings = get_sentence_embeddings(sentences)
-    if embeddings is None or len(embeddings) == 0:
+    embedded = get_sentence_embeddings(sentences)
+    if embedded is None or len(embedded[0]) == 0:
         # Fallback: return first few sentences
         return '. '.join(sentences[:num_sentences]) + '.'
 
-    # Use clustering to find representative sentences
-    try:
-        # Determine number of clusters (sentences to select)
-        n_clusters = min(num_sentences, len(embeddings))
-
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        cluster_labels = kmeans.fit_predict(embeddings)
+    indexes, embeddings = embedded
 
-        # Find sentences closest to cluster centers
-        selected_sentences = []
-        for i in range(n_clusters):
-            cluster_points = embeddings[cluster_labels == i]
-            center = kmeans.cluster_centers_[i]
-
-            # Find closest point to center
-            distances = np.linalg.norm(cluster_points - center, axis=1)
-            closest_idx = np.argmin(distances)
-
-            # Get original sentence index
-            cluster_indices = np.where(cluster_labels == i)[0]
-            original_idx = cluster_indices[closest_idx]
-
-            selected_sentences.append((original_idx, sentences[original_idx]))
-
-        # Sort by original order
-        selected_sentences.sort(key=lambda x: x[0])
-        summary = '. '.join([s[1] for s in selected_sentences]) + '.'
+    # Pick representative sentences
+    try:
+        picks = select_sentences(embeddings, num_sentences, selector)
+        # picks are in document order, so the summary keeps the original order
+        summary = '. '.join(sentences[indexes[i]] for i in picks) + '.'
 
         return summary
 
     except Exception as e:
-        print(f"Clustering error: {e}")
+        print(f"Sentence selection error: {e}")
         # Fallback: return first few sentences
         return '. '.join(sentences[:num_sentences]) + '.'
 
@@ -145,6 +144,7 @@ def summarize():
         data = request.get_json()
         text = data.get('text', '').strip()
         num_sentences = data.get('num_sentences', 2)
+        selector = data.get('selector', SUMMARY_SELECTOR)
 
         if not text:
             return jsonify({'error': 'No text provided'})
@@ -152,26 +152,41 @@ def summarize():
         if len(text) < 50:
             return jsonify({'error': 'Text too short (minimum 50 characters)'})
 
-        summary = summarize_text(text, num_sentences)
+        if selector not in SELECTORS:
+            return jsonify({'error': f"Unknown selector '{selector}' (choose from {', '.join(SELECTORS)})"})
+
+        summary = summarize_text(text, num_sentences, selector)
 
         return jsonify({
             'summary': summary,
+            'selector': selector,
             'original_length': len(text),
             'summary_length': len(summary)
         })
 
+    except QueueFull:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.errorhandler(QueueFull)
+def handle_queue_full(error):
+    """BERT batches are not keeping up with incoming requests"""
+    return jsonify({'error': str(error)}), 503, {'Retry-After': '1'}
+
 @app.route('/health')
 def health():
     return jsonify({
         'status': 'healthy',
-        'models_loaded': tokenizer is not None and model is not None
+        'models_loaded': tokenizer is not None and model is not None,
+        'precision': INFERENCE_PRECISION,
+        'batching': {'embedding': embedding_batches.stats()}
     })
 
 if __name__ == '__main__':
     print("🚀 Starting BertSum Simplified Web App...")
+    threads = configure_threads()
+    print(f"🧵 torch threads: {threads['intra_op']} intra-op, {threads['inter_op']} inter-op ({INFERENCE_PRECISION})")
     print("📥 Loading models...")
 
     if load_models():
@@ -0,0 +1,157 @@
+import multiprocessing
+
+import numpy as np
+
+from cache import EmbeddingCache, EmbeddingStore, LRUCache, text_key
+
+DIM = 4
+
+def vector(value):
+    return np.full(DIM, value, dtype=np.float32)
+
+def key(value):
+    return text_key(f'sentence {value}')
+
+def test_store_round_trip(tmp_path):
+    store = EmbeddingStore(tmp_path, DIM, 3)
+    store.put(key(1), vector(1))
+    assert np.array_equal(store.get(key(1)), vector(1))
+    assert store.get(key(2)) is None
+
+def test_store_overwrites_oldest_when_full(tmp_path):
+    store = EmbeddingStore(tmp_path, DIM, 3)
+    for value in (1, 2, 3, 4):
+        store.put(key(value), vector(value))
+    assert store.get(key(1)) is None
+    assert [store.get(key(value))[0] for value in (2, 3, 4)] == [2, 3, 4]
+    assert store.stats()['overwrites'] == 1
+
+def test_store_re_put_does_not_move_the_ring(tmp_path):
+    store = EmbeddingStore(tmp_path, DIM, 3)
+    for value in (1, 2, 1, 3):
+        store.put(key(value), vector(value))
+    # Three distinct keys fit in three slots: nothing was evicted
+    assert all(store.get(key(value)) is not None for value in (1, 2, 3))
+    assert store.stats()['entries'] == 3
+    assert store.stats()['overwrites'] == 0
+
+    store.put(key(4), vector(4))
+    assert store.get(key(1)) is None
+    assert store.get(key(4)) is not None
+
+def test_store_reopens_and_continues_the_ring(tmp_path):
+    store = EmbeddingStore(tmp_path, DIM, 3)
+    for value in (1, 2, 3, 4):
+        store.put(key(value), vector(value))
+    store.flush()
+
+    reopened = EmbeddingStore(tmp_path, DIM, 3)
+    assert [reopened.get(key(value))[0] for value in (2, 3, 4)] == [2, 3, 4]
+    reopened.put(key(5), vector(5))
+    # The oldest survivor goes next, not the key written last
+    assert reopened.get(key(2)) is None
+    assert reopened.get(key(4)) is not None
+
+def test_store_starts_over_when_dimension_changes(tmp_path):
+    store = EmbeddingStore(tmp_path, DIM, 3)
+    store.put(key(1), vector(1))
+    store.flush()
+
+    reopened = EmbeddingStore(tmp_path, DIM * 2, 3)
+    assert reopened.get(key(1)) is None
+    assert reopened.stats()['entries'] == 0
+
+def test_stores_sharing_a_directory_see_each_others_slots(tmp_path):
+    first = EmbeddingStore(tmp_path, DIM, 3)
+    second = EmbeddingStore(tmp_path, DIM, 3)
+    first.put(key(1), vector(1))
+    second.put(key(2), vector(2))
+    assert first.get(key(2))[0] == 2
+
+    # second takes the next slot, not the one first already used
+    for value in (3, 4):
+        second.put(key(value), vector(value))
+    assert first.get(key(1)) is None
+    assert [first.get(key(value))[0] for value in (2, 3, 4)] == [2, 3, 4]
+    assert first.stats()['entries'] == 3
+
+def fill_store(directory, start):
+    store = EmbeddingStore(directory, DIM, 16)
+    for value in range(start, start + 200):
+        store.put(key(value), vector(value))
+        store.get(key(value - 1))
+
+def test_worker_processes_never_read_another_keys_vector(tmp_path):
+    context = multiprocessing.get_context('fork')
+    EmbeddingStore(tmp_path, DIM, 16)
+    workers = [context.Process(target=fill_store, args=(tmp_path, start)) for start in (0, 1000)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    store = EmbeddingStore(tmp_path, DIM, 16)
+    stored = {value: store.get(key(value)) for value in (*range(200), *range(1000, 1200))}
+    found = {value: found[0] for value, found in stored.items() if found is not None}
+    assert len(found) == 16
+    assert all(value == stored_value for value, stored_value in found.items())
+
+def test_embedding_cache_reads_back_from_disk(tmp_path):
+    cache = EmbeddingCache(EmbeddingStore(tmp_path, DIM, 10), memory_entries=1)
+    keys, vectors = cache.lookup(['first sentence', 'second sentence'])
+    assert vectors == [None, None]
+    cache.add(keys, [vector(1), vector(2)])
+
+    _, vectors = cache.lookup(['first sentence', 'second sentence'])
+    assert [v[0] for v in vectors] == [1, 2]
+    stats = cache.stats()
+    assert stats['misses'] == 2
+    assert stats['disk']['hits'] >= 1
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
+
+def test_embed_computes_each_distinct_sentence_once(tmp_path):
+    cache = EmbeddingCache(EmbeddingStore(tmp_path, DIM, 10), memory_entries=10)
+    calls = []
+
+    def compute(sentences):
+        calls.append(list(sentences))
+        return np.stack([vector(len(sentence)) for sentence in sentences])
+
+    sentences = ['a repeated sentence', 'another one', 'a repeated sentence']
+    vectors = cache.embed(sentences, compute)
+    assert calls == [['a repeated sentence', 'another one']]
+    assert [v[0] for v in vectors] == [19, 11, 19]
+    assert cache.store.stats()['entries'] == 2
+
+    # Everything is cached now, compute is not called again
+    cache.embed(sentences, compute)
+    assert len(calls) == 1
+
+def test_embed_rounds_computed_vectors_like_stored_ones(tmp_path):
+    cache = EmbeddingCache(EmbeddingStore(tmp_path, DIM, 10), memory_entries=10)
+    value = np.float32(0.1)
+    computed = cache.embed(['a sentence'], lambda sentences: np.full((1, DIM), value, dtype=np.float32))
+    assert computed[0][0] == np.float32(np.float16(value))
+
+def test_text_key_keeps_case_but_not_whitespace():
+    assert text_key('The  cat sat.') == text_key('The cat sat.')
+    assert text_key('The cat sat.') != text_key('the cat sat.')
+
+def test_embedding_cache_lowercases_only_when_asked(tmp_path):
+    uncased = EmbeddingCache(EmbeddingStore(tmp_path / 'uncased', DIM, 10), 10, lowercase=True)
+    keys, _ = uncased.lookup(['The cat sat', 'the cat sat'])
+    assert keys[0] == keys[1]
+
+    cased = EmbeddingCache(EmbeddingStore(tmp_path / 'cased', DIM, 10), 10)
+    keys, _ = cased.lookup(['The cat sat', 'the cat sat'])
+    assert keys[0] != keys[1]
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+
+from embeddings import SentenceEncoder, length_buckets  # noqa: E402
+
+def test_buckets_cover_every_index_once_shortest_first():
+    lengths = np.array([9, 3, 7, 3, 12, 1, 5])
+    batches = list(length_buckets(lengths, batch_size=3, max_tokens=1000))
+    flat = [i for batch in batches for i in batch]
+    assert sorted(flat) == list(range(len(lengths)))
+    assert [lengths[i] for i in flat] == sorted(lengths)
+    assert all(len(batch) <= 3 for batch in batches)
+
+def test_buckets_respect_the_padded_token_budget():
+    lengths = np.array([10, 10, 10, 40, 40, 100])
+    for batch in length_buckets(lengths, batch_size=32, max_tokens=80):
+        assert len(batch) * max(lengths[i] for i in batch) <= 80 or len(batch) == 1
+    # A sentence longer than the budget still gets a batch of its own
+    assert [5] in list(length_buckets(lengths, batch_size=32, max_tokens=80))
+
+class WordTokenizer:
+    """Whitespace tokenizer with the two methods SentenceEncoder uses"""
+
+    def __call__(self, sentences, truncation=True, max_length=512):
+        return {'input_ids': [[1 + sum(map(ord, word)) % 97 for word in s.split()][:max_length]
+                              for s in sentences]}
+
+    def pad(self, encoded, return_tensors='pt'):
+        rows = encoded['input_ids']
+        width = max(len(row) for row in rows)
+        return {
+            'input_ids': torch.tensor([row + [0] * (width - len(row)) for row in rows]),
+            'attention_mask': torch.tensor([[1] * len(row) + [0] * (width - len(row)) for row in rows]),
+        }
+
+class EmbeddingModel(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.config = SimpleNamespace(hidden_size=4)
+        self.embedding = torch.nn.Embedding(100, 4)
+        self.calls = 0
+
+    def forward(self, input_ids, attention_mask):
+        self.calls += 1
+        return SimpleNamespace(last_hidden_state=self.embedding(input_ids))
+
+def test_batched_vectors_match_one_at_a_time():
+    torch.manual_seed(0)
+    model = EmbeddingModel()
+    sentences = ['a short one', 'this sentence is quite a bit longer than the others', 'mid length here',
+                 'x', 'another mid length one']
+    batched = SentenceEncoder(WordTokenizer(), model, batch_size=2).encode(sentences)
+    calls = model.calls
+    single = np.vstack([SentenceEncoder(WordTokenizer(), model, batch_size=1).encode([s]) for s in sentences])
+
+    # Padding never leaks into a vector, and rows stay in input order
+    np.testing.assert_allclose(batched, single, rtol=1e-5, atol=1e-6)
+    assert calls == 3
+
+def test_no_sentences():
+    assert SentenceEncoder(WordTokenizer(), EmbeddingModel()).encode([]).shape == (0, 4)
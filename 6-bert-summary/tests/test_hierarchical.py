@@ -0,0 +1,80 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hierarchical import Progress, chunk_sentences, fit_sentences, map_ordered, map_reduce_summarize
+
+def split(text):
+    return [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
+
+def count_tokens(sentences):
+    return [len(sentence.split()) for sentence in sentences]
+
+def document(sentences, words=10):
+    return ' '.join(f'Sentence {i} ' + ' '.join(['word'] * (words - 2)) + '.' for i in range(sentences))
+
+def total_tokens(text):
+    return sum(count_tokens(split(text)))
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+def test_chunk_sentences_respects_max_tokens():
+    chunks = chunk_sentences(['a'] * 5, [3, 3, 3, 3, 3], 7)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+def test_chunk_sentences_gives_a_long_sentence_its_own_chunk():
+    assert chunk_sentences(['a', 'b', 'c'], [2, 50, 2], 10) == [['a'], ['b'], ['c']]
+
+def test_map_ordered_keeps_input_order(pool):
+    done = []
+    results = map_ordered(pool, lambda x: x * 2, list(range(20)), window=3, on_done=lambda: done.append(1))
+    assert results == [x * 2 for x in range(20)]
+    assert len(done) == 20
+
+def test_reduces_until_one_chunk(pool):
+    def first_sentence(chunk):
+        return split(chunk)[0] + '.'
+
+    progress = Progress()
+    summary = map_reduce_summarize(document(100), split, count_tokens, first_sentence, pool,
+                                   max_tokens=40, progress=progress)
+    levels = progress.snapshot()
+    assert len(levels) > 1
+    assert all(level['done'] == level['chunks'] for level in levels)
+    assert levels[-1]['chunks'] == 1
+    assert total_tokens(summary) <= 40
+
+def test_stops_when_a_level_does_not_shrink_and_still_fits(pool):
+    calls = []
+
+    def unchanged(chunk):
+        calls.append(chunk)
+        return chunk
+
+    progress = Progress()
+    summary = map_reduce_summarize(document(50), split, count_tokens, unchanged, pool,
+                                   max_tokens=40, progress=progress)
+    # Stops after the first level that made no progress, not after max_levels
+    assert len(progress.snapshot()) == 1
+    assert total_tokens(summary) <= 40
+    # Sentences from across the document survive, not just the first chunk
+    assert 'Sentence 0 ' in summary and 'Sentence 4 ' in summary
+
+def test_fits_when_levels_run_out(pool):
+    def drop_one_word(chunk):
+        return '. '.join(' '.join(sentence.split()[:-1]) for sentence in split(chunk)) + '.'
+
+    summary = map_reduce_summarize(document(50), split, count_tokens, drop_one_word, pool,
+                                   max_tokens=40, max_levels=2)
+    assert total_tokens(summary) <= 40
+
+def test_fit_sentences_cuts_a_sentence_longer_than_the_limit():
+    text = fit_sentences([['one two three four five six']], count_tokens, 4)
+    assert text == 'one two three four.'
+
+def test_empty_text(pool):
+    assert map_reduce_summarize('', split, count_tokens, lambda chunk: chunk, pool) == ''
@@ -0,0 +1,63 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+
+import optimize  # noqa: E402
+
+class TinyConfig:
+    @classmethod
+    def from_pretrained(cls, name, **kwargs):
+        return cls()
+
+class Tiny(torch.nn.Module):
+    """Stands in for a transformers model class: from_pretrained and config_class"""
+    config_class = TinyConfig
+    pretrained_loads = 0
+
+    def __init__(self, config):
+        super().__init__()
+        self.linear = torch.nn.Linear(8, 4)
+
+    @classmethod
+    def from_pretrained(cls, name, **kwargs):
+        cls.pretrained_loads += 1
+        torch.manual_seed(0)
+        return cls(TinyConfig())
+
+    def forward(self, x):
+        return self.linear(x)
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(optimize, 'artifact_path',
+                        lambda name, precision: str(tmp_path / f'{name}-{precision}.pt'))
+    Tiny.pretrained_loads = 0
+    return tmp_path
+
+def test_int8_is_cached_as_tensors_and_rebuilt_without_fp32_weights(cache_dir):
+    x = torch.randn(2, 8)
+    first = optimize.load_model('tiny', Tiny, precision='int8')
+    assert Tiny.pretrained_loads == 1
+    # A plain state_dict: loadable with weights_only=True
+    torch.load(cache_dir / 'tiny-int8.pt', weights_only=True)
+
+    second = optimize.load_model('tiny', Tiny, precision='int8')
+    assert Tiny.pretrained_loads == 1
+    assert torch.equal(first(x), second(x))
+
+def test_mismatched_cache_is_ignored_and_rewritten(cache_dir):
+    torch.save({'unrelated': torch.zeros(1)}, cache_dir / 'tiny-int8.pt')
+    optimize.load_model('tiny', Tiny, precision='int8')
+    assert Tiny.pretrained_loads == 1
+    assert 'unrelated' not in torch.load(cache_dir / 'tiny-int8.pt', weights_only=True)
+
+def test_fp32_and_unknown_precision(cache_dir):
+    assert isinstance(optimize.load_model('tiny', Tiny, precision='fp32').linear, torch.nn.Linear)
+    with pytest.raises(ValueError):
+        optimize.load_model('tiny', Tiny, precision='fp16')
+
+def test_model_label_and_token_f1():
+    assert optimize.model_label('t5-small', 'fp32') == 't5-small'
+    assert optimize.model_label('t5-small', 'int8') == 't5-small@int8'
+    assert optimize.token_f1('the cat sat', 'the cat sat') == 1.0
+    assert optimize.token_f1('the cat', 'a dog') == 0.0
@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from registry import ModelLoadError, ModelRegistry, tensor_bytes
+
+MB = 2 ** 20
+
+class Tensor:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+    def numel(self):
+        return self.nbytes // 4
+
+    def element_size(self):
+        return 4
+
+class Model:
+    """Just enough of a torch module for tensor_bytes()"""
+
+    def __init__(self, size):
+        self.size = size
+
+    def parameters(self):
+        return [Tensor(self.size)]
+
+    def buffers(self):
+        return []
+
+def loaders(sizes, loads):
+    def loader(name):
+        def load():
+            loads.append(name)
+            return Model(sizes[name]), f'{name} tokenizer'
+        return load
+    return {name: loader(name) for name in sizes}
+
+def test_models_load_once_on_first_use():
+    loads = []
+    registry = ModelRegistry(loaders({'a': MB, 'b': MB}, loads))
+    assert 'a' not in registry
+    with registry.use('a') as loaded:
+        assert loaded.tokenizer == 'a tokenizer'
+    with registry.use('a'):
+        pass
+    assert loads == ['a']
+    assert registry.stats()['loaded'][0]['uses'] == 2
+
+def test_least_recently_used_model_is_evicted_over_budget():
+    loads = []
+    registry = ModelRegistry(loaders({'a': 100 * MB, 'b': 100 * MB, 'c': 100 * MB}, loads),
+                             budget_bytes=250 * MB)
+    for name in ('a', 'b', 'a', 'c'):
+        with registry.use(name):
+            pass
+
+    assert 'b' not in registry
+    assert 'a' in registry and 'c' in registry
+    assert registry.stats()['evictions'] == 1
+
+    # Reloading b makes room first, using the size measured last time
+    with registry.use('b'):
+        pass
+    assert loads == ['a', 'b', 'c', 'b']
+    assert [model['name'] for model in registry.stats()['loaded']] == ['c', 'b']
+
+def test_model_in_use_is_not_evicted():
+    registry = ModelRegistry(loaders({'a': 100 * MB, 'b': 100 * MB, 'c': 100 * MB}, []),
+                             budget_bytes=150 * MB)
+    with registry.use('a'):
+        with registry.use('b'):
+            # Over budget, but both are in use
+            assert 'a' in registry and 'b' in registry
+    assert registry.stats()['evictions'] == 0
+
+    # Once idle, they are evicted on the next load
+    with registry.use('c'):
+        pass
+    assert 'a' not in registry and 'b' not in registry and 'c' in registry
+    assert registry.stats()['resident_mb'] == 100
+
+def test_concurrent_first_uses_load_once():
+    loads = []
+    registry = ModelRegistry(loaders({'a': MB}, loads))
+    threads = [threading.Thread(target=lambda: registry.use('a').__enter__()) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ['a']
+
+def test_load_failures_raise_model_load_error():
+    def broken():
+        raise OSError('weights not found')
+
+    registry = ModelRegistry({'broken': broken})
+    with pytest.raises(ModelLoadError):
+        with registry.use('broken'):
+            pass
+    with pytest.raises(ModelLoadError):
+        with registry.use('unknown'):
+            pass
+    assert registry.stats()['failures'] == 1
+
+def test_tensor_bytes_of_a_pipeline_uses_its_model():
+    class Pipeline:
+        model = Model(8 * MB)
+
+    assert tensor_bytes(Pipeline()) == tensor_bytes(Model(8 * MB)) == 8 * MB
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import BatchScheduler, BatchTimeout, QueueFull
+
+def test_concurrent_items_share_a_batch():
+    batches = []
+
+    def run_batch(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    scheduler = BatchScheduler(run_batch, 'test', max_batch=8, max_wait=0.2)
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, scheduler.run(i)))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {0: 0, 1: 2, 2: 4, 3: 6}
+    assert len(batches) == 1
+    assert scheduler.stats()['batch_size_max'] == 4
+
+def test_returned_exception_fails_only_its_item():
+    def run_batch(items):
+        return [ValueError(item) if item == 'bad' else item for item in items]
+
+    scheduler = BatchScheduler(run_batch, 'test', max_wait=0.05)
+    good, bad = scheduler.submit('good'), scheduler.submit('bad')
+    assert good.result(timeout=5) == 'good'
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+
+def test_raised_exception_fails_the_whole_batch():
+    def run_batch(items):
+        raise RuntimeError('model failed')
+
+    scheduler = BatchScheduler(run_batch, 'test')
+    with pytest.raises(RuntimeError):
+        scheduler.run('item', timeout=5)
+    assert scheduler.stats()['errors'] == 1
+
+def test_full_queue_rejects_straight_away():
+    release = threading.Event()
+
+    def run_batch(items):
+        release.wait(5)
+        return items
+
+    scheduler = BatchScheduler(run_batch, 'test', max_batch=1, max_wait=0, max_queue=1)
+    running = scheduler.submit('running')
+    # Wait until the worker has taken the first item off the queue
+    while scheduler.stats()['queue_depth']:
+        time.sleep(0.001)
+    time.sleep(0.01)
+    queued = scheduler.submit('queued')
+    with pytest.raises(QueueFull):
+        scheduler.submit('rejected')
+    release.set()
+    assert running.result(timeout=5) == 'running'
+    assert queued.result(timeout=5) == 'queued'
+    assert scheduler.stats()['rejected'] == 1
+
+def test_timeout_raises_and_drops_the_queued_item():
+    release = threading.Event()
+    ran = []
+
+    def run_batch(items):
+        ran.extend(items)
+        release.wait(5)
+        return items
+
+    scheduler = BatchScheduler(run_batch, 'test', max_batch=1, max_wait=0, timeout=0.05)
+    blocking = scheduler.submit('blocking')
+    with pytest.raises(BatchTimeout):
+        scheduler.run('late')
+    release.set()
+    assert blocking.result(timeout=5) == 'blocking'
+
+    # The worker moves on without running the abandoned item
+    assert scheduler.run('next', timeout=5) == 'next'
+    assert ran == ['blocking', 'next']
+    assert scheduler.stats()['timeouts'] == 1
+
+def test_timeout_is_a_queue_full():
+    # So the apps' QueueFull handler answers 503 for it too
+    assert issubclass(BatchTimeout, QueueFull)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from selection import SELECTORS, select_mmr, select_sentences
+
+NUMPY_SELECTORS = ['centroid', 'mmr', 'textrank', 'kmeans']
+
+def clustered(seed=0):
+    """Three tight, well separated groups of 5 sentences each (rows 0-4, 5-9, 10-14)"""
+    rng = np.random.default_rng(seed)
+    centres = np.eye(3, 16) * 10
+    return np.vstack([centre + rng.normal(scale=0.1, size=(5, 16)) for centre in centres])
+
+@pytest.mark.parametrize('selector', NUMPY_SELECTORS)
+def test_picks_are_sorted_distinct_and_deterministic(selector):
+    embeddings = np.random.default_rng(1).normal(size=(20, 8))
+    picks = select_sentences(embeddings, 4, selector)
+    assert len(picks) == 4
+    assert list(picks) == sorted(set(picks.tolist()))
+    assert np.array_equal(picks, select_sentences(embeddings, 4, selector))
+
+@pytest.mark.parametrize('selector', NUMPY_SELECTORS)
+def test_k_is_capped_at_the_number_of_sentences(selector):
+    embeddings = np.random.default_rng(2).normal(size=(3, 8))
+    assert list(select_sentences(embeddings, 10, selector)) == [0, 1, 2]
+    assert len(select_sentences(embeddings, 0, selector)) == 0
+
+def test_kmeans_picks_one_sentence_per_group():
+    picks = select_sentences(clustered(), 3, 'kmeans')
+    assert sorted(pick // 5 for pick in picks) == [0, 1, 2]
+
+def test_mmr_trades_relevance_for_diversity():
+    embeddings = clustered()
+    # One group is far larger, so pure centroid similarity favours it
+    embeddings = np.vstack([embeddings, embeddings[:5] + 0.01])
+    assert len({pick // 5 % 3 for pick in select_sentences(embeddings, 3, 'centroid')}) == 1
+    assert len({pick // 5 % 3 for pick in select_mmr(embeddings, 3, diversity=0.7)}) == 3
+
+def test_identical_sentences_do_not_break_kmeans():
+    picks = select_sentences(np.ones((6, 8)), 3, 'kmeans')
+    assert 1 <= len(picks) <= 3
+
+def test_sklearn_kmeans_still_available():
+    pytest.importorskip('sklearn')
+    picks = SELECTORS['sklearn-kmeans'](clustered(), 3)
+    assert sorted(pick // 5 for pick in picks) == [0, 1, 2]
@@ -0,0 +1,16 @@
+import pytest
+
+pytest.importorskip('transformers')
+
+import original_bertsum_app as bertsum  # noqa: E402
+
+def test_only_quantized_summarizers_are_labelled_int8(monkeypatch):
+    monkeypatch.setattr(bertsum, 'INFERENCE_PRECISION', 'int8')
+    assert bertsum.summarizer_label('t5-small') == 't5-small@int8'
+    assert bertsum.summarizer_label('facebook/bart-large-cnn') == 'facebook/bart-large-cnn@int8'
+    # Built with pipeline() and never quantized
+    assert bertsum.summarizer_label('google/pegasus-xsum') == 'google/pegasus-xsum'
+
+def test_fp32_summarizers_are_unlabelled(monkeypatch):
+    monkeypatch.setattr(bertsum, 'INFERENCE_PRECISION', 'fp32')
+    assert bertsum.summarizer_label('t5-small') == 't5-small'
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the GET /api/todos serializers in 3-python-todo-api
+- python: sqlite3.Row -> dict -> bool() -> json.dumps
+- sql:    SQLite's json_object() encodes every row; Python only joins strings
+
+Runs in-process (no HTTP) against freshly seeded databases of several
+sizes and reports, per size and list shape, the median time, the peak
+Python memory and whether both serializers produced the same bytes.
+
+Example:
+    python3 benchmarks/bench_list_serialization.py --rows 1000,10000,100000,1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, '3-python-todo-api'))
+
+SERIALIZERS = ('python', 'sql')
+
+def import_app(tmp):
+    """Import main.py against a scratch database so it never touches todos.db"""
+    os.environ['TODO_DB_PATH'] = os.path.join(tmp, 'app.db')
+    import main
+    return main
+
+def seed(path, rows, seed):
+    """Create the todos table and its list index, then insert `rows` todos"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE todos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            completed BOOLEAN NOT NULL DEFAULT FALSE,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_todos_created_at_id ON todos (created_at DESC, id DESC)')
+
+    rng = random.Random(seed)
+    words = ['buy', 'milk', 'write', 'report', 'café', 'fix', 'bug', 'plan', 'sprint', 'docs']
+    conn.executemany(
+        'INSERT INTO todos (title, completed, created_at) VALUES (?, ?, ?)',
+        ((' '.join(rng.choice(words) for _ in range(4)), rng.random() < 0.3,
+          f'2024-01-01T00:00:00.{i:06d}') for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+
+def shapes(main, page_size):
+    """List shapes to measure: each takes (conn, serializer) and returns the body"""
+    return {
+        'full': lambda conn, serializer: main.render_todo_list(conn, serializer=serializer)[0],
+        'page': lambda conn, serializer: main.render_todo_list(conn, limit=page_size, serializer=serializer)[0],
+        'stream': lambda conn, serializer: '[' + ','.join(main.iter_todo_chunks(conn, serializer=serializer)) + ']',
+    }
+
+def measure(fn, conn, serializer, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(conn, serializer)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(conn, serializer)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return body, {
+        'median_ms': round(statistics.median(times) * 1000, 3),
+        'min_ms': round(min(times) * 1000, 3),
+        'peak_python_mb': round(peak / 1024 / 1024, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000,10000,100000',
+                        help='comma-separated table sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per measurement')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-o', '--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='todo-serializer-bench-') as tmp:
+        app = import_app(tmp)
+
+        for rows in [int(value) for value in args.rows.split(',')]:
+            print(f'⏱️  {rows} rows', file=sys.stderr)
+            path = os.path.join(tmp, f'todos-{rows}.db')
+            seed(path, rows, args.seed)
+
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+
+            for shape, fn in shapes(app, args.page_size).items():
+                bodies, timings = {}, {}
+                for serializer in SERIALIZERS:
+                    bodies[serializer], timings[serializer] = measure(fn, conn, serializer, args.repeat)
+
+                python_ms = timings['python']['median_ms']
+                sql_ms = timings['sql']['median_ms']
+                results.append({
+                    'rows': rows,
+                    'shape': shape,
+                    'bytes': len(bodies['python'].encode()),
+                    'identical_output': bodies['python'] == bodies['sql'],
+                    'speedup': round(python_ms / sql_ms, 2) if sql_ms else None,
+                    **{serializer: timings[serializer] for serializer in SERIALIZERS},
+                })
+
+            conn.close()
+
+    output = json.dumps({'python': sys.version.split()[0], 'sqlite': sqlite3.sqlite_version,
+                         'repeat': args.repeat, 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+if __name__ == '__main__':
+    main()
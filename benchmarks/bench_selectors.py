@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the sentence selectors in 6-bert-summary/selection.py
+
+For every document size it times each selector on the same embeddings
+(median of --repeat runs) and reports how many of its picks match the
+reference selector, sklearn-kmeans (the apps' original KMeans(n_init=10)
+output) when scikit-learn is installed.
+
+Embeddings are synthetic by default: --sentences documents of 768-d
+vectors drawn around a few topic centres, like BERT sentence embeddings
+of an article. With --text FILE, the file is split into sentences and
+embedded with bert-base-uncased instead (needs torch and transformers),
+and the report shows the selected sentences.
+
+Example:
+    python3 benchmarks/bench_selectors.py --sentences 20,100,500,2000 --k 3
+    python3 benchmarks/bench_selectors.py --text article.txt --k 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, '6-bert-summary'))
+
+from selection import SELECTORS, select_sentences
+
+REFERENCE = 'sklearn-kmeans'
+
+def synthetic_embeddings(sentences, topics, dim, seed):
+    """Sentence vectors scattered around `topics` random topic centres"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(topics, dim))
+    labels = rng.integers(topics, size=sentences)
+    return (centres[labels] + 0.5 * rng.normal(size=(sentences, dim))).astype(np.float32)
+
+def bert_embeddings(path):
+    """Sentences of the file at `path` and their bert-base-uncased embeddings"""
+    from transformers import BertModel, BertTokenizerFast
+    from embeddings import SentenceEncoder
+    from simple_bertsum_app import split_into_sentences
+
+    with open(path) as f:
+        sentences = split_into_sentences(f.read())
+    encoder = SentenceEncoder(BertTokenizerFast.from_pretrained('bert-base-uncased'),
+                              BertModel.from_pretrained('bert-base-uncased'))
+    return sentences, encoder.encode(sentences)
+
+def available_selectors():
+    try:
+        import sklearn  # noqa: F401
+        return list(SELECTORS)
+    except ImportError:
+        print(f'⚠️  scikit-learn not installed: skipping {REFERENCE}, no overlap reported',
+              file=sys.stderr)
+        return [name for name in SELECTORS if name != REFERENCE]
+
+def measure(embeddings, k, selector, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        picks = select_sentences(embeddings, k, selector)
+        times.append(time.perf_counter() - start)
+    return picks, {
+        'median_ms': round(statistics.median(times) * 1000, 3),
+        'min_ms': round(min(times) * 1000, 3),
+    }
+
+def compare(embeddings, k, selectors, repeat, sentences=None):
+    picks, timings = {}, {}
+    for selector in selectors:
+        picks[selector], timings[selector] = measure(embeddings, k, selector, repeat)
+
+    report = {}
+    for selector in selectors:
+        entry = {**timings[selector], 'picks': picks[selector].tolist()}
+        if REFERENCE in picks:
+            reference = set(picks[REFERENCE].tolist())
+            entry['overlap'] = round(len(reference & set(entry['picks'])) / len(reference), 3)
+            reference_ms = timings[REFERENCE]['median_ms']
+            entry['speedup'] = round(reference_ms / entry['median_ms'], 1) if entry['median_ms'] else None
+        if sentences is not None:
+            entry['summary'] = [sentences[i] for i in entry['picks']]
+        report[selector] = entry
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sentences', default='20,100,500',
+                        help='comma-separated document sizes (synthetic embeddings)')
+    parser.add_argument('--text', help='embed this file with BERT instead of synthetic embeddings')
+    parser.add_argument('--k', type=int, default=3, help='sentences per summary')
+    parser.add_argument('--topics', type=int, default=5, help='topic centres in synthetic documents')
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per measurement')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-o', '--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    selectors = available_selectors()
+    results = []
+    if args.text:
+        sentences, embeddings = bert_embeddings(args.text)
+        results.append({'sentences': len(sentences), 'source': args.text,
+                        'selectors': compare(embeddings, args.k, selectors, args.repeat, sentences)})
+    else:
+        for size in [int(value) for value in args.sentences.split(',')]:
+            print(f'⏱️  {size} sentences', file=sys.stderr)
+            embeddings = synthetic_embeddings(size, args.topics, args.dim, args.seed)
+            results.append({'sentences': size, 'source': 'synthetic',
+                            'selectors': compare(embeddings, args.k, selectors, args.repeat)})
+
+    output = json.dumps({'python': sys.version.split()[0], 'numpy': np.__version__,
+                         'k': args.k, 'repeat': args.repeat, 'reference': REFERENCE,
+                         'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+if __name__ == '__main__':
+    main()
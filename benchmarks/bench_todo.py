@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Load-test and benchmark harness for the Flask todo services
+- api: 3-python-todo-api/main.py
+- web: 1-python-web/app.py
+
+Seeds a throwaway SQLite database, starts the app on the dev server or
+on a multi-worker production server, runs a mixed read/write workload
+at a fixed concurrency and prints throughput plus p50/p95/p99 latency
+per route as JSON. Everything runs locally with the standard library;
+only the app itself (and gunicorn for --server prod) need installing.
+
+Examples:
+    python3 benchmarks/bench_todo.py --app api --rows 1000,100000 --concurrency 16
+    python3 benchmarks/bench_todo.py --app web --server prod --workers 4 -o web.json
+    python3 benchmarks/bench_todo.py compare before.json after.json
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = [
+    'buy', 'groceries', 'milk', 'write', 'report', 'call', 'mom', 'fix', 'bug',
+    'review', 'pull', 'request', 'deploy', 'server', 'clean', 'kitchen', 'book',
+    'flight', 'pay', 'bills', 'read', 'paper', 'plan', 'sprint', 'update', 'docs',
+]
+
+# ---------------------------------------------------------------------------
+# Workloads: each route builds (method, path, body, headers) for one request
+# ---------------------------------------------------------------------------
+
+def random_title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5)))
+
+def random_id(rng, ctx):
+    return rng.randint(1, max(ctx['rows'], 1))
+
+def json_request(method, path, payload=None):
+    if payload is None:
+        return method, path, None, {}
+    return method, path, json.dumps(payload), {'Content-Type': 'application/json'}
+
+def form_request(path, fields):
+    return 'POST', path, urlencode(fields), {'Content-Type': 'application/x-www-form-urlencoded'}
+
+def api_list_poll(rng, ctx, state):
+    # Like a polling frontend: revalidate with the last ETag we saw
+    headers = {'If-None-Match': state['etag']} if state.get('etag') else {}
+    return 'GET', '/api/todos?limit=50', None, headers
+
+API_ROUTES = {
+    'list_page': lambda rng, ctx, state: json_request('GET', '/api/todos?limit=50'),
+    'list_poll': api_list_poll,
+    'list_all': lambda rng, ctx, state: json_request('GET', '/api/todos'),
+    'list_stream': lambda rng, ctx, state: json_request('GET', '/api/todos?stream=1'),
+    'list_page_sql': lambda rng, ctx, state: json_request('GET', '/api/todos?limit=50&serializer=sql'),
+    'list_all_sql': lambda rng, ctx, state: json_request('GET', '/api/todos?serializer=sql'),
+    'list_stream_sql': lambda rng, ctx, state: json_request('GET', '/api/todos?stream=1&serializer=sql'),
+    'search': lambda rng, ctx, state: json_request('GET', f'/api/todos/search?q={rng.choice(WORDS)}'),
+    'create': lambda rng, ctx, state: json_request('POST', '/api/todos', {'title': random_title(rng)}),
+    'update': lambda rng, ctx, state: json_request(
+        'PUT', f'/api/todos/{random_id(rng, ctx)}',
+        {'title': random_title(rng), 'completed': rng.random() < 0.5}),
+    'toggle': lambda rng, ctx, state: json_request('PUT', f'/api/todos/{random_id(rng, ctx)}/toggle'),
+    'delete': lambda rng, ctx, state: json_request('DELETE', f'/api/todos/{random_id(rng, ctx)}'),
+    'bulk_create': lambda rng, ctx, state: json_request('POST', '/api/todos/bulk', {
+        'operations': [{'op': 'create', 'title': random_title(rng)} for _ in range(50)]}),
+}
+
+WEB_ROUTES = {
+    'index': lambda rng, ctx, state: json_request('GET', '/'),
+    'add': lambda rng, ctx, state: form_request('/add', {'title': random_title(rng)}),
+    'toggle': lambda rng, ctx, state: json_request('GET', f'/toggle/{random_id(rng, ctx)}'),
+    'delete': lambda rng, ctx, state: json_request('GET', f'/delete/{random_id(rng, ctx)}'),
+}
+
+APPS = {
+    'api': {
+        'dir': '3-python-todo-api',
+        'module': 'main',
+        'ready_path': '/api/stats',
+        'routes': API_ROUTES,
+        'mix': 'list_page=55,list_poll=15,search=5,create=12,update=5,toggle=6,delete=2',
+    },
+    'web': {
+        'dir': '1-python-web',
+        'module': 'app',
+        'ready_path': '/',
+        'routes': WEB_ROUTES,
+        'mix': 'index=80,add=10,toggle=8,delete=2',
+    },
+}
+
+# ---------------------------------------------------------------------------
+# Seeding
+# ---------------------------------------------------------------------------
+
+def app_env(app_name, db_path):
+    """Environment pointing the app at the benchmark database"""
+    env = dict(os.environ)
+    if app_name == 'api':
+        env['TODO_DB_PATH'] = db_path
+    else:
+        env['DATABASE_URL'] = f'sqlite:///{db_path}'
+    return env
+
+def seed_database(app_name, db_path, rows, seed):
+    """Create the app's schema and fill it with `rows` todos"""
+    app = APPS[app_name]
+    app_dir = os.path.join(ROOT, app['dir'])
+    env = app_env(app_name, db_path)
+
+    # Both apps create their schema on import, so the benchmark never drifts from it
+    subprocess.run([sys.executable, '-c', f'import {app["module"]}'], cwd=app_dir, env=env, check=True)
+
+    table = 'todos' if app_name == 'api' else 'todo'
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+
+    conn = sqlite3.connect(db_path)
+    batch = []
+    for i in range(rows):
+        created_at = start + timedelta(seconds=i)
+        created_at = created_at.isoformat() if app_name == 'api' else created_at.strftime('%Y-%m-%d %H:%M:%S')
+        batch.append((random_title(rng), rng.random() < 0.3, created_at))
+        if len(batch) == 10000:
+            conn.executemany(f'INSERT INTO {table} (title, completed, created_at) VALUES (?, ?, ?)', batch)
+            batch = []
+    if batch:
+        conn.executemany(f'INSERT INTO {table} (title, completed, created_at) VALUES (?, ?, ?)', batch)
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+    if app_name == 'api':
+        # Merge the search index segments left behind by the bulk load
+        subprocess.run([sys.executable, 'main.py', 'rebuild-search'],
+                       cwd=app_dir, env=env, check=True, stdout=subprocess.DEVNULL)
+
+# ---------------------------------------------------------------------------
+# Servers
+# ---------------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def server_command(app_name, server, port, workers, threads):
+    """Command line for the dev server or a pre-forking production server"""
+    module = APPS[app_name]['module']
+    if server == 'dev':
+        return [sys.executable, '-m', 'flask', '--app', module, 'run',
+                '--host', '127.0.0.1', '--port', str(port),
+                '--no-reload', '--no-debugger', '--with-threads']
+    return [sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+            '--threads', str(threads), '--bind', f'127.0.0.1:{port}',
+            '--log-level', 'warning', f'{module}:app']
+
+def wait_until_ready(base_url, path, proc, timeout=120):
+    parts = urlsplit(base_url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f'Server exited with code {proc.returncode}')
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            conn.request('GET', path)
+            if conn.getresponse().status < 500:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'Server did not become ready within {timeout}s')
+
+def start_server(app_name, server, db_path, workers, threads):
+    app = APPS[app_name]
+    port = free_port()
+    # Server output goes to a file next to the database: an unread pipe
+    # would fill up with access-log lines and stall the server
+    log_path = os.path.join(os.path.dirname(db_path), 'server.log')
+    with open(log_path, 'wb') as log:
+        proc = subprocess.Popen(
+            server_command(app_name, server, port, workers, threads),
+            cwd=os.path.join(ROOT, app['dir']),
+            env=app_env(app_name, db_path),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_ready(base_url, app['ready_path'], proc)
+    except RuntimeError:
+        stop_server(proc)
+        with open(log_path, errors='replace') as log:
+            sys.stderr.write(log.read())
+        raise
+    return proc, base_url
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+def parse_mix(mix, routes):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in routes:
+            raise SystemExit(f'Unknown route {name!r}; choose from: {", ".join(routes)}')
+        weights[name] = float(weight or 1)
+    return weights
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+def summarize(latencies, errors, statuses, elapsed):
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': dict(sorted(statuses.items())),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1]) if latencies else None,
+    }
+
+def run_workload(base_url, routes, weights, ctx, concurrency, duration, warmup, seed):
+    """Run the weighted route mix from `concurrency` threads for `duration` seconds"""
+    parts = urlsplit(base_url)
+    names = list(weights)
+    cumulative = list(weights.values())
+    results = {name: {'latencies': [], 'errors': 0, 'statuses': {}} for name in names}
+    lock = threading.Lock()
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        state = {}
+        local = {name: {'latencies': [], 'errors': 0, 'statuses': {}} for name in names}
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                break
+
+            name = rng.choices(names, cumulative)[0]
+            method, path, body, headers = routes[name](rng, ctx, state)
+            begin = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if name == 'list_poll' and response.getheader('ETag'):
+                    state['etag'] = response.getheader('ETag')
+                if response.will_close:
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                status = None
+            latency = time.perf_counter() - begin
+
+            if begin < start_at:
+                continue  # still warming up
+
+            bucket = local[name]
+            if status is None or status >= 500:
+                bucket['errors'] += 1
+            else:
+                bucket['latencies'].append(latency)
+            key = str(status) if status else 'error'
+            bucket['statuses'][key] = bucket['statuses'].get(key, 0) + 1
+
+        conn.close()
+        with lock:
+            for name, bucket in local.items():
+                results[name]['latencies'].extend(bucket['latencies'])
+                results[name]['errors'] += bucket['errors']
+                for code, count in bucket['statuses'].items():
+                    statuses = results[name]['statuses']
+                    statuses[code] = statuses.get(code, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_latencies, all_errors, all_statuses = [], 0, {}
+    routes_summary = {}
+    for name, bucket in results.items():
+        all_latencies.extend(bucket['latencies'])
+        all_errors += bucket['errors']
+        for code, count in bucket['statuses'].items():
+            all_statuses[code] = all_statuses.get(code, 0) + count
+        routes_summary[name] = summarize(bucket['latencies'], bucket['errors'], bucket['statuses'], duration)
+
+    return summarize(all_latencies, all_errors, all_statuses, duration), routes_summary
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    app = APPS[args.app]
+    routes = app['routes']
+    weights = parse_mix(args.mix or app['mix'], routes)
+    runs = []
+
+    for rows in [int(value) for value in args.rows.split(',')]:
+        print(f'⏱️  {args.app}: {rows} rows, {args.server} server, '
+              f'concurrency {args.concurrency}, {args.duration}s', file=sys.stderr)
+
+        proc = None
+        with tempfile.TemporaryDirectory(prefix='todo-bench-') as tmp:
+            if args.url:
+                base_url = args.url.rstrip('/')
+            else:
+                db_path = os.path.join(tmp, 'todos.db')
+                seed_database(args.app, db_path, rows, args.seed)
+                proc, base_url = start_server(args.app, args.server, db_path, args.workers, args.threads)
+
+            try:
+                ctx = {'rows': rows}
+                total, per_route = run_workload(base_url, routes, weights, ctx, args.concurrency,
+                                                args.duration, args.warmup, args.seed)
+            finally:
+                if proc is not None:
+                    stop_server(proc)
+
+        runs.append({'rows': rows, 'total': total, 'routes': per_route})
+
+    report = {
+        'app': args.app,
+        'server': 'external' if args.url else args.server,
+        'workers': args.workers if args.server == 'prod' else 1,
+        'threads': args.threads if args.server == 'prod' else None,
+        'concurrency': args.concurrency,
+        'duration_seconds': args.duration,
+        'warmup_seconds': args.warmup,
+        'mix': weights,
+        'seed': args.seed,
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'runs': runs,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+def compare(args):
+    """Print per-route throughput and latency changes between two reports"""
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        if not old or new is None:
+            return None
+        return round((new - old) / old * 100, 1)
+
+    comparison = []
+    old_runs = {run['rows']: run for run in before['runs']}
+    for run_after in after['runs']:
+        run_before = old_runs.get(run_after['rows'])
+        if run_before is None:
+            continue
+        routes = {}
+        for name, new in [('total', run_after['total'])] + list(run_after['routes'].items()):
+            old = run_before['total'] if name == 'total' else run_before['routes'].get(name)
+            if old is None:
+                continue
+            routes[name] = {
+                metric: {'before': old[metric], 'after': new[metric],
+                         'change_pct': change(old[metric], new[metric])}
+                for metric in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')
+            }
+        comparison.append({'rows': run_after['rows'], 'routes': routes})
+
+    print(json.dumps({'before': before.get('commit'), 'after': after.get('commit'),
+                      'runs': comparison}, indent=2))
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        parser = argparse.ArgumentParser(prog='bench_todo.py compare')
+        parser.add_argument('before')
+        parser.add_argument('after')
+        compare(parser.parse_args(sys.argv[2:]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', choices=sorted(APPS), default='api')
+    parser.add_argument('--rows', default='1000',
+                        help='comma-separated dataset sizes, e.g. 1000,100000,1000000')
+    parser.add_argument('--mix', help='route weights, e.g. list_page=80,create=20 (default depends on --app)')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent client threads')
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds per dataset size')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured seconds before measuring')
+    parser.add_argument('--server', choices=['dev', 'prod'], default='dev',
+                        help='dev: flask run (threaded); prod: gunicorn with --workers/--threads')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--url', help='benchmark an already running server instead of starting one')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-o', '--output', help='also write the JSON report to this file')
+    run(parser.parse_args())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import bench_todo
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench_todo.py')
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert bench_todo.percentile(values, 50) == 50
+    assert bench_todo.percentile(values, 99) == 99
+    assert bench_todo.percentile([7], 95) == 7
+    assert bench_todo.percentile([], 50) is None
+
+def test_summarize_reports_milliseconds():
+    summary = bench_todo.summarize([0.003, 0.001, 0.002], 1, {'200': 3, 'error': 1}, 2.0)
+    assert summary['requests'] == 3
+    assert summary['throughput_rps'] == 1.5
+    assert (summary['p50_ms'], summary['max_ms']) == (2.0, 3.0)
+
+def test_parse_mix():
+    routes = bench_todo.API_ROUTES
+    assert bench_todo.parse_mix('list_page=80,create', routes) == {'list_page': 80.0, 'create': 1.0}
+    with pytest.raises(SystemExit):
+        bench_todo.parse_mix('no_such_route=1', routes)
+
+def test_every_route_builds_a_request():
+    import random
+    rng, ctx = random.Random(0), {'rows': 10}
+    for routes in (bench_todo.API_ROUTES, bench_todo.WEB_ROUTES):
+        for name, route in routes.items():
+            method, path, body, headers = route(rng, ctx, {})
+            assert method in ('GET', 'POST', 'PUT', 'DELETE') and path.startswith('/'), name
+
+@pytest.mark.parametrize('app', ['api', 'web'])
+def test_short_run_against_a_seeded_dev_server(app, tmp_path):
+    env = dict(os.environ, TODO_VERSION_FILE=str(tmp_path / 'todos.version'))
+    output = subprocess.run(
+        [sys.executable, SCRIPT, '--app', app, '--rows', '50', '--concurrency', '2',
+         '--duration', '0.5', '--warmup', '0.1', '-o', str(tmp_path / 'report.json')],
+        capture_output=True, text=True, check=True, timeout=120, env=env
+    ).stdout
+    report = json.loads(output)
+
+    total = report['runs'][0]['total']
+    assert report['app'] == app and report['runs'][0]['rows'] == 50
+    assert total['requests'] > 0
+    assert total['errors'] == 0
+    assert json.loads((tmp_path / 'report.json').read_text()) == report